@@ -0,0 +1,197 @@
+# Compares sustained req/s of the frontend task path on a single uvicorn worker
+# when it talks to redis through the threaded (sync) queue clients vs the asyncio
+# ones. Each request pushes a payload to the server's own topic and waits for it
+# to come back, which is what /v2/tasks/benchmarks/redis does on a real frontend.
+#
+#   python benchmarks/frontend_queue_bench.py --job_redis_queue_address localhost
+#
+# Requires a reachable redis server plus fastapi, uvicorn and aiohttp.
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from threading import Thread
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from nxs_libs.queue import NxsQueueType
+from nxs_utils.common import generate_uuid
+from nxs_utils.nxs_helper import (
+    create_queue_pusher_from_args,
+    create_queue_puller_from_args,
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Nxs frontend queue benchmark")
+    parser.add_argument("--job_redis_queue_address", type=str, default="localhost")
+    parser.add_argument("--job_redis_queue_port", type=int, default=6379)
+    parser.add_argument("--job_redis_queue_password", type=str, default="")
+    parser.add_argument(
+        "--job_redis_queue_use_ssl",
+        default=False,
+        type=lambda x: (str(x).lower() == "true"),
+    )
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--modes", type=str, default="sync,async")
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--duration_secs", type=float, default=20)
+    parser.add_argument("--warmup_secs", type=float, default=3)
+    parser.add_argument("--payload_size", type=int, default=1024)
+    return parser.parse_args()
+
+
+def create_app(mode: str, args):
+    from fastapi import FastAPI
+
+    app = FastAPI()
+    topic = f"bench_frontend_{generate_uuid()}"
+    futures: Dict[str, asyncio.Future] = {}
+    payload = os.urandom(args.payload_size)
+
+    def _set_result(future: asyncio.Future, result):
+        if not future.done():
+            future.set_result(result)
+
+    if mode == "sync":
+        pusher = create_queue_pusher_from_args(args, NxsQueueType.REDIS)
+
+        def recv_thread():
+            puller = create_queue_puller_from_args(args, NxsQueueType.REDIS, topic)
+            puller.set_buf_size(1024)
+            while True:
+                msgs = puller.pull()
+                for task_uuid, _ in msgs:
+                    future = futures.pop(task_uuid, None)
+                    if future is not None:
+                        future.get_loop().call_soon_threadsafe(
+                            _set_result, future, task_uuid
+                        )
+                if not msgs:
+                    time.sleep(0.002)
+
+        Thread(target=recv_thread, daemon=True).start()
+
+        async def push(data):
+            pusher.push(topic, data)
+
+    else:
+        pusher = create_queue_pusher_from_args(args, NxsQueueType.REDIS_ASYNC)
+
+        async def recv_loop():
+            puller = create_queue_puller_from_args(
+                args, NxsQueueType.REDIS_ASYNC, topic
+            )
+            while True:
+                for task_uuid, _ in await puller.pull():
+                    future = futures.pop(task_uuid, None)
+                    if future is not None and not future.done():
+                        future.set_result(task_uuid)
+
+        @app.on_event("startup")
+        async def start_recv_loop():
+            asyncio.create_task(recv_loop())
+
+        async def push(data):
+            await pusher.push(topic, data)
+
+    @app.post("/task")
+    async def task():
+        task_uuid = generate_uuid()
+        future = asyncio.get_running_loop().create_future()
+        futures[task_uuid] = future
+        await push((task_uuid, payload))
+        try:
+            await asyncio.wait_for(future, timeout=10)
+        finally:
+            futures.pop(task_uuid, None)
+        return {"status": "COMPLETED"}
+
+    return app
+
+
+def run_server(mode: str, args):
+    import uvicorn
+
+    uvicorn.run(
+        create_app(mode, args),
+        host="127.0.0.1",
+        port=args.port,
+        workers=1,
+        log_level="warning",
+    )
+
+
+async def run_client(args) -> List[float]:
+    import aiohttp
+
+    url = f"http://127.0.0.1:{args.port}/task"
+    latencies: List[float] = []
+
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=args.concurrency)
+    ) as session:
+        # wait for the server to come up
+        for _ in range(100):
+            try:
+                async with session.post(url) as resp:
+                    await resp.read()
+                break
+            except:
+                await asyncio.sleep(0.1)
+
+        async def worker(t_start, t_end, record):
+            while time.time() < t_end:
+                t0 = time.time()
+                async with session.post(url) as resp:
+                    await resp.read()
+                    ok = resp.status == 200
+                if record and ok and t0 >= t_start:
+                    latencies.append(time.time() - t0)
+
+        t_start = time.time() + args.warmup_secs
+        t_end = t_start + args.duration_secs
+        await asyncio.gather(
+            *[worker(t_start, t_end, True) for _ in range(args.concurrency)]
+        )
+
+    return latencies
+
+
+def main():
+    args = parse_args()
+
+    rows = []
+    for mode in args.modes.split(","):
+        p = multiprocessing.Process(target=run_server, args=(mode, args))
+        p.start()
+        try:
+            latencies = asyncio.run(run_client(args))
+        finally:
+            p.terminate()
+            p.join()
+
+        lat_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+        rows.append(
+            (
+                mode,
+                len(latencies) / args.duration_secs,
+                np.percentile(lat_ms, 50),
+                np.percentile(lat_ms, 99),
+            )
+        )
+
+    print(f"concurrency={args.concurrency} payload={args.payload_size}B")
+    print(f"{'mode':<8}{'req/s':>12}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+    for mode, rps, p50, p99 in rows:
+        print(f"{mode:<8}{rps:>12.1f}{p50:>12.2f}{p99:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
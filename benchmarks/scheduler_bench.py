@@ -0,0 +1,206 @@
+# Measures how long one scheduling epoch takes with many sessions and backends. A
+# synthetic workload (pipelines over a shared pool of cmodels, sessions with random
+# fps) goes through a few epochs: everything arrives, fps changes, some sessions are
+# replaced, some backends leave, then a steady epoch.
+#
+#   python benchmarks/scheduler_bench.py --num_sessions 10000 --num_backends 500
+#
+# Runs in-process, no redis or backends are needed.
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from nxs_libs.interface.scheduling_policy import (
+    NxsSchedulingPolicyFactory,
+    NxsSchedulingPolicyType,
+)
+from nxs_types.backend import BackendInfo, BackendStat, GpuInfo
+from nxs_types.model import (
+    Framework,
+    LatencyMeasurement,
+    ModelDescription,
+    ModelInput,
+    ModelOutput,
+    NxsCompositoryModel,
+    NxsModel,
+    NxsPipelineInfo,
+    ProfileUnit,
+)
+from nxs_types.scheduling_data import NxsSchedulingRequest
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Nxs scheduler benchmark")
+    parser.add_argument("--num_sessions", type=int, default=10000)
+    parser.add_argument("--num_backends", type=int, default=500)
+    parser.add_argument("--num_pipelines", type=int, default=200)
+    parser.add_argument("--num_cmodels", type=int, default=100)
+    parser.add_argument("--gpu_backend_ratio", type=float, default=0.5)
+    parser.add_argument("--churn_ratio", type=float, default=0.1)
+    parser.add_argument("--backend_churn_ratio", type=float, default=0.05)
+    parser.add_argument(
+        "--scheduling_policy",
+        type=str,
+        default="simple",
+        choices=[policy_type.value for policy_type in NxsSchedulingPolicyType],
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def create_cmodel(idx: int, use_gpu: bool) -> NxsCompositoryModel:
+    profile = []
+    for batch_size in [1, 2, 4, 8]:
+        latency_ms = 5 + batch_size * random.uniform(1, 10)
+        profile.append(
+            ProfileUnit(
+                batch_size=batch_size,
+                fps=batch_size * 1000 / latency_ms,
+                latency_e2e=LatencyMeasurement(
+                    mean=latency_ms, std=0, min=latency_ms, max=latency_ms
+                ),
+                gpu_mem_usage=random.uniform(500, 2000) if use_gpu else 0,
+            )
+        )
+
+    model = NxsModel(
+        user_name="bench",
+        model_name=f"model_{idx}",
+        model_uuid=f"cmodel{idx}",
+        framework=Framework.ONNX,
+        model_desc=ModelDescription(
+            inputs=[ModelInput(name="input", shape=[-1, 3, 224, 224])],
+            outputs=[ModelOutput(name="output")],
+            preprocessing_name="none",
+            postprocessing_name="none",
+        ),
+        profile=profile,
+        use_gpu=use_gpu,
+    )
+
+    return NxsCompositoryModel(main_model=model, component_models=[model])
+
+
+def create_backend(idx: int, use_gpu: bool) -> BackendInfo:
+    gpu_info = None
+    if use_gpu:
+        gpu_info = GpuInfo(
+            gpu_name="bench", gpu_total_mem=16000, gpu_available_mem=16000
+        )
+    return BackendInfo(
+        backend_name=f"backend{idx}", state=BackendStat(gpu_info=gpu_info)
+    )
+
+
+def create_requests(sessions: List, pipelines: List) -> List[NxsSchedulingRequest]:
+    # the policy rewrites session uuids in place, every epoch gets fresh requests
+    return [
+        NxsSchedulingRequest(
+            pipeline_info=pipelines[pipeline_idx],
+            session_uuid=session_uuid,
+            requested_fps=fps,
+        )
+        for session_uuid, pipeline_idx, fps in sessions
+    ]
+
+
+def create_backends(backend_ids: List[int], args) -> List[BackendInfo]:
+    num_gpu_backends = int(args.num_backends * args.gpu_backend_ratio)
+    return [create_backend(idx, idx < num_gpu_backends) for idx in backend_ids]
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+
+    num_gpu_cmodels = int(args.num_cmodels * args.gpu_backend_ratio)
+    cmodels = [
+        create_cmodel(idx, idx < num_gpu_cmodels) for idx in range(args.num_cmodels)
+    ]
+    pipelines = [
+        NxsPipelineInfo(
+            user_name="bench",
+            pipeline_uuid=f"pipeline{idx}",
+            pipeline=[cmodels[idx % args.num_cmodels].main_model.model_uuid],
+            models=[cmodels[idx % args.num_cmodels]],
+        )
+        for idx in range(args.num_pipelines)
+    ]
+
+    next_session_idx = 0
+
+    def new_session():
+        nonlocal next_session_idx
+        next_session_idx += 1
+        return (
+            f"session{next_session_idx}",
+            random.randrange(args.num_pipelines),
+            random.uniform(1, 20),
+        )
+
+    sessions = [new_session() for _ in range(args.num_sessions)]
+    backend_ids = list(range(args.num_backends))
+
+    policy = NxsSchedulingPolicyFactory.create_scheduling_policy(
+        NxsSchedulingPolicyType(args.scheduling_policy)
+    )
+
+    def run_epoch(name: str):
+        requests = create_requests(sessions, pipelines)
+        backends = create_backends(backend_ids, args)
+
+        t0 = time.time()
+        plan = policy.schedule(requests, backends)
+        secs = time.time() - t0
+
+        num_deployments = sum(
+            len(backend_plan.compository_model_plans)
+            for backend_plan in plan.scheduling
+        )
+        num_removals = sum(
+            len(backend_plan.compository_model_plans)
+            for backend_plan in plan.unscheduling
+        )
+        print(
+            f"{name:<16} {secs:8.3f} secs - {len(plan.scheduling)} backends, "
+            f"{num_deployments} cmodel deployments, {num_removals} removals"
+        )
+        return secs
+
+    print(
+        f"{args.scheduling_policy} policy - {args.num_sessions} sessions, "
+        f"{args.num_backends} backends, {args.num_pipelines} pipelines, "
+        f"{args.num_cmodels} cmodels"
+    )
+
+    total_secs = run_epoch("initial")
+
+    sessions = [
+        (session_uuid, pipeline_idx, random.uniform(1, 20))
+        for session_uuid, pipeline_idx, _ in sessions
+    ]
+    total_secs += run_epoch("fps change")
+
+    num_replaced = int(len(sessions) * args.churn_ratio)
+    random.shuffle(sessions)
+    sessions = sessions[num_replaced:] + [new_session() for _ in range(num_replaced)]
+    total_secs += run_epoch("session churn")
+
+    num_removed = int(len(backend_ids) * args.backend_churn_ratio)
+    random.shuffle(backend_ids)
+    backend_ids = sorted(backend_ids[num_removed:])
+    total_secs += run_epoch("backend churn")
+
+    total_secs += run_epoch("steady")
+
+    print(f"total            {total_secs:8.3f} secs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# Compares how backend stages wait for work: polling their inputs with fixed sleeps
+# (what every stage did before BackendStageWaiter) vs blocking on queue readiness. A
+# chain of stage processes forwards timestamped items over multiprocessing queues,
+# like input -> preprocessing -> batcher -> compute -> output, and we report per-item
+# latency percentiles through the chain at a low request rate, plus the cpu time the
+# stages burn while no request arrives at all.
+#
+#   python benchmarks/stage_runtime_bench.py --num_stages 5 --fps 100
+#
+# Runs locally, no redis, gpu or models are needed.
+
+import argparse
+import os
+import sys
+import time
+from multiprocessing import Process, Queue, Value
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main_processes.backend.stage_runtime import BackendStageWaiter
+from nxs_libs.interface.backend.input import BackendInputFromMultiprocessingQueue
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Nxs backend stage runtime benchmark")
+    parser.add_argument("--num_stages", type=int, default=5)
+    parser.add_argument("--fps", type=float, default=100)
+    parser.add_argument("--duration_secs", type=float, default=10)
+    parser.add_argument("--idle_secs", type=float, default=5)
+    parser.add_argument(
+        "--poll_secs",
+        type=float,
+        default=0.0025,
+        help="sleep between polls of the polling stages",
+    )
+    return parser.parse_args()
+
+
+def run_stage(
+    mode: str,
+    poll_secs: float,
+    input_queue,
+    output_queue,
+    stop_flag,
+    next_stop_flag,
+    stats_queue,
+):
+    input = BackendInputFromMultiprocessingQueue(input_queue)
+    waiter = BackendStageWaiter([input])
+
+    cpu_t0 = time.process_time()
+    while True:
+        to_exit = stop_flag.value
+        if to_exit:
+            items = input.close_and_get_remains()
+        else:
+            items = input.get_batch()
+
+        for item in items:
+            output_queue.put(item)
+
+        if to_exit:
+            break
+
+        if not items:
+            if mode == "polling":
+                time.sleep(poll_secs)
+            else:
+                waiter.wait()
+
+    stats_queue.put(time.process_time() - cpu_t0)
+
+    # stages stop in order, as in the backend
+    next_stop_flag.value = 1
+
+
+def run_chain(args, mode: str, fps: float, duration_secs: float) -> Dict:
+    queues = [Queue() for _ in range(args.num_stages + 1)]
+    stop_flags = [Value("i", 0) for _ in range(args.num_stages + 1)]
+    stats_queue = Queue()
+
+    processes: List[Process] = []
+    for idx in range(args.num_stages):
+        p = Process(
+            target=run_stage,
+            args=(
+                mode,
+                args.poll_secs,
+                queues[idx],
+                queues[idx + 1],
+                stop_flags[idx],
+                stop_flags[idx + 1],
+                stats_queue,
+            ),
+        )
+        p.start()
+        processes.append(p)
+
+    # let all stages settle into their loops
+    time.sleep(0.5)
+
+    latencies = []
+    num_sent = 0
+    t0 = time.time()
+    while time.time() - t0 < duration_secs:
+        if fps > 0 and num_sent < (time.time() - t0) * fps:
+            queues[0].put(time.time())
+            num_sent += 1
+
+        try:
+            sent_ts = queues[-1].get(timeout=0.001)
+            latencies.append(time.time() - sent_ts)
+        except:
+            pass
+
+    stop_flags[0].value = 1
+    while len(latencies) < num_sent:
+        latencies.append(time.time() - queues[-1].get())
+
+    cpu_secs = sum(stats_queue.get() for _ in processes)
+    for p in processes:
+        p.join()
+
+    return {"latencies": latencies, "cpu_secs": cpu_secs}
+
+
+def main():
+    args = parse_args()
+
+    print(
+        f"{args.num_stages} stages - {args.fps} fps for {args.duration_secs} secs, "
+        f"idle for {args.idle_secs} secs"
+    )
+    for mode in ["polling", "event"]:
+        idle = run_chain(args, mode, 0, args.idle_secs)
+        loaded = run_chain(args, mode, args.fps, args.duration_secs)
+
+        latencies_ms = np.array(loaded["latencies"]) * 1000
+        idle_cpu = idle["cpu_secs"] / args.idle_secs / args.num_stages
+        print(
+            f"{mode:<8} p50 {np.percentile(latencies_ms, 50):7.3f} ms - "
+            f"p99 {np.percentile(latencies_ms, 99):7.3f} ms - "
+            f"idle cpu {idle_cpu * 100:5.2f}% of a core per stage"
+        )
+
+
+if __name__ == "__main__":
+    main()
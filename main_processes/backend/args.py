@@ -9,6 +9,36 @@ def parse_args():
     parser.add_argument(
         "--force_cpu", default=False, type=lambda x: (str(x).lower() == "true")
     )
+    parser.add_argument("--model_cache_dir", type=str, default="./tmp/model_cache")
+    parser.add_argument("--model_cache_size_gb", type=float, default=20)
+    parser.add_argument("--num_warm_models", type=int, default=8)
+    parser.add_argument(
+        "--process_start_method",
+        type=str,
+        default="forkserver",
+        choices=["forkserver", "spawn", "fork"],
+    )
+    parser.add_argument(
+        "--forkserver_preload", type=str, default="numpy,cv2,onnxruntime"
+    )
+    parser.add_argument(
+        "--enable_self_profiling",
+        default=True,
+        type=lambda x: (str(x).lower() == "true"),
+    )
+    parser.add_argument(
+        "--enable_gpu_time_slicing",
+        default=True,
+        type=lambda x: (str(x).lower() == "true"),
+    )
+    parser.add_argument("--gpu_time_slice_period_ms", type=float, default=100)
+    # requests a cmodel may have in flight, in ms of its throughput (0 = unbounded)
+    parser.add_argument("--in_flight_budget_ms", type=float, default=1000)
+    parser.add_argument(
+        "--enable_local_short_circuit",
+        default=True,
+        type=lambda x: (str(x).lower() == "true"),
+    )
     _args = parser.parse_args()
 
     args = NxsBackendArgs(**(vars(_args)))
@@ -1,22 +1,22 @@
-import copy
-import json
 import logging
-import os
-import pickle
 import time
-from abc import ABC, abstractmethod
-from typing import Dict
-
-import cv2
-import numpy as np
-from configs import NXS_CONFIG
-from nxs_libs.interface.backend.input import BackendInputInterfaceFactory
-from nxs_libs.interface.backend.output import BackendOutputInterfaceFactory
-from nxs_types.infer_result import NxsInferStatus
+from typing import Dict, List
+
+from main_processes.backend.batching import BackendDeadlineBatcher
+from main_processes.backend.stage_runtime import BackendStageWaiter
+from nxs_libs.interface.backend.input import (
+    BackendInputInterface,
+    BackendInputInterfaceFactory,
+)
+from nxs_libs.interface.backend.output import (
+    BackendOutputInterfaceFactory,
+    BackendOutputToLeastLoaded,
+    BackendOutputToSharedMemory,
+)
 from nxs_types.model import NxsModel
 from nxs_types.nxs_args import NxsBackendArgs
 from nxs_types.scheduling_data import NxsSchedulingPerComponentModelPlan
-from nxs_utils.logging import NxsLogLevel, setup_logger, write_log
+from nxs_utils.logging import setup_logger
 
 
 class BackendBatcherProcess:
@@ -25,40 +25,34 @@ class BackendBatcherProcess:
         args: NxsBackendArgs,
         component_model: NxsModel,
         component_model_plan: NxsSchedulingPerComponentModelPlan,
-        input_interface_args: Dict,
+        input_interface_args_list: List[Dict],
         output_interface_args: Dict,
-        stop_flag,
+        stop_flags: List,
         next_process_stop_flag,
         extra_params: Dict = {},
     ) -> None:
         self.component_model = component_model
         self.component_model_plan = component_model_plan
-        self.input_interface_args = input_interface_args
+        self.input_interface_args_list = input_interface_args_list
         self.output_interface_args = output_interface_args
-        self.stop_flag = stop_flag
+        self.stop_flags = stop_flags
         self.next_process_stop_flag = next_process_stop_flag
         self.extra_params = extra_params
 
         self.p = None
-        self.preproc_fn = None
-        self.preproc_extra_params = {}
 
-        try:
-            self.preproc_extra_params = json.loads(
-                self.component_model.model_desc.extra_preprocessing_metadata
-            )
-        except:
-            pass
+        self.input_tensor_names = [
+            input.name for input in self.component_model.model_desc.inputs
+        ]
 
         self.log_prefix = "{}_BATCHER".format(component_model.model_uuid)
-        self.log_level = os.environ.get(NXS_CONFIG.LOG_LEVEL, NxsLogLevel.INFO)
 
         self.next_topic_name = "{}_COMPUTE".format(component_model.model_uuid)
 
-        setup_logger()
+        # upper bound on how long we block on the input queues without new data
+        self.max_idle_wait_secs = 0.1
 
-    # def _log(self, message):
-    #     write_log(self.log_prefix, message, self.log_level)
+        setup_logger()
 
     def _log(self, message, log_level=logging.INFO):
         logging.log(log_level, f"{self.log_prefix} - {message}")
@@ -70,117 +64,107 @@ class BackendBatcherProcess:
         self.p.start()
 
     def _run(self):
-        cross_requests_batching = self.component_model.cross_requests_batching
-
-        max_latency = 1  # in secs
-
-        max_batch_size = self.component_model_plan.batch_size
-        for profile_unit in self.component_model.profile:
-            if profile_unit.batch_size == max_batch_size:
-                max_latency = profile_unit.latency_e2e.max / 1000.0  # in secs
-                break
-
-        self.input = BackendInputInterfaceFactory.create_input_interface(
-            **self.input_interface_args
-        )
+        self.inputs: List[BackendInputInterface] = []
+        for input_interface_args in self.input_interface_args_list:
+            self.inputs.append(
+                BackendInputInterfaceFactory.create_input_interface(
+                    **input_interface_args
+                )
+            )
         self.output = BackendOutputInterfaceFactory.create_input_interface(
             **self.output_interface_args
         )
 
-        current_batch = []
-        current_metadata_batch = []
+        self.batcher = BackendDeadlineBatcher(
+            self.component_model,
+            self.component_model_plan,
+            self.input_tensor_names,
+            max_wait_secs=self.component_model_plan.batcher_max_wait_ms / 1000.0,
+        )
 
-        waiting_t0 = time.time()
-        to_exit = False
-        tt0 = time.time()
+        waiter = BackendStageWaiter(self.inputs, max_wait_secs=self.max_idle_wait_secs)
 
+        # inputs whose producers have exited and been drained
+        closed_inputs = set()
+
+        tt0 = time.time()
         requests_count = 0
 
         while True:
-            items = []
-            if not self.stop_flag.value:
-                items = self.input.get_batch()
-            else:
-                items = self.input.close_and_get_remains()
-                to_exit = True
-
-            for item in items:
-                preprocessed_data, metadata = item
-
-                current_batch.append(preprocessed_data)
-                current_metadata_batch.append(metadata)
+            # sleep until new data arrives or the oldest batch has to go out
+            waiter.wait(self.batcher.get_next_flush_ts() - time.time(), closed_inputs)
 
-                if len(current_batch) == 1:
-                    waiting_t0 = time.time()
+            for idx, input in enumerate(self.inputs):
+                if idx in closed_inputs:
+                    continue
 
-                if not cross_requests_batching or len(current_batch) >= max_batch_size:
-                    requests_count += len(current_batch)
+                if self.stop_flags[idx].value:
+                    items = input.close_and_get_remains()
+                    closed_inputs.add(idx)
+                else:
+                    items = input.get_batch()
 
-                    # transform batch to {key -> []}
-                    transformed_batch = {}
+                for batch, batch_metadata in items:
+                    for metadata in batch_metadata:
+                        self.request_entering(metadata["extra"])
+                    self.batcher.add(batch, batch_metadata)
 
-                    for item in current_batch:
-                        for tensor_name in item:
-                            if not tensor_name in transformed_batch.keys():
-                                transformed_batch[tensor_name] = []
-                            transformed_batch[tensor_name].extend(item[tensor_name])
+            to_exit = len(closed_inputs) == len(self.inputs)
 
-                    # for metadata in current_metadata_batch:
-                    #     self.request_exiting(metadata["extra"])
-
-                    self.output.put_batch(
-                        self.next_topic_name,
-                        [(transformed_batch, current_metadata_batch)],
-                    )
-
-                    current_batch = []
-                    current_metadata_batch = []
-
-            if current_batch and cross_requests_batching:
-                # wait for a bit if the batch is not full
-                if time.time() - waiting_t0 > max_latency / 2:
-                    requests_count += len(current_batch)
-
-                    # transform [{key -> item}] into {key -> [items]}
-                    transformed_batch = {}
-
-                    for item in current_batch:
-                        for tensor_name in item:
-                            if not tensor_name in transformed_batch.keys():
-                                transformed_batch[tensor_name] = []
-                            transformed_batch[tensor_name].extend(item[tensor_name])
-
-                    for metadata in current_metadata_batch:
-                        self.request_exiting(metadata["extra"])
-
-                    self.output.put_batch(
-                        self.next_topic_name,
-                        [(transformed_batch, current_metadata_batch)],
-                    )
-
-                    current_batch = []
-                    current_metadata_batch = []
+            for samples in self.batcher.pop_ready_batches(flush_all=to_exit):
+                self._send_batch(samples)
+                requests_count += len(samples)
 
             if time.time() - tt0 > 5:
                 if requests_count > 0:
                     fps = requests_count / (time.time() - tt0)
-                    print("batcher", "fps", fps)
+                    hist = dict(sorted(self.batcher.pop_batch_size_hist().items()))
+                    self._log(f"FPS: {fps} - BatchSizeHist: {hist}")
                 requests_count = 0
                 tt0 = time.time()
 
             if to_exit:
                 break
 
-            if not items:
-                time.sleep(0.01)
-
         # trigger next process to stop
         self.next_process_stop_flag.value = True
 
         self._log("Exiting...")
 
+    def _send_batch(self, samples: List):
+        item = None
+
+        output = self.output
+        if isinstance(output, BackendOutputToLeastLoaded):
+            # one queue per compute instance
+            output = output.select_output(self.next_topic_name)
+
+        if isinstance(output, BackendOutputToSharedMemory):
+            # assemble the batch directly inside a slot of the compute arena
+            arena = output.arena
+            allocation = arena.allocate(self.batcher.get_tensor_specs(samples))
+            if allocation is not None:
+                slot, layout, views = allocation
+                _, batch_metadata = self.batcher.gather(
+                    samples, out=views, allow_views=False
+                )
+                item = (arena.send(slot, layout), batch_metadata)
+
+        if item is None:
+            # input slots are released below while the queue may still be pickling
+            item = self.batcher.gather(samples, allow_views=False)
+
+        for metadata in item[1]:
+            self.request_exiting(metadata["extra"])
+
+        output.put_batch(self.next_topic_name, [item])
+
+        # samples are copied into the batch, input slots can be reused
+        self.batcher.release(samples)
+
     def stop(self):
-        self.stop_flag.value = True
+        for stop_flag in self.stop_flags:
+            stop_flag.value = True
         self.p.join()
 
     def terminate(self):
@@ -189,10 +173,11 @@ class BackendBatcherProcess:
         except:
             pass
 
+    def request_entering(self, extra_metadata: Dict):
+        extra_metadata[self.component_model.model_uuid]["batcher_t0"] = time.time()
+
     def request_exiting(self, extra_metadata: Dict):
-        preprocessing_t0 = extra_metadata[self.component_model.model_uuid].pop(
-            "preprocessing_t0"
-        )
-        extra_metadata[self.component_model.model_uuid]["preprocessing_lat"] = (
-            time.time() - preprocessing_t0
+        batcher_t0 = extra_metadata[self.component_model.model_uuid].pop("batcher_t0")
+        extra_metadata[self.component_model.model_uuid]["batcher_lat"] = (
+            time.time() - batcher_t0
         )
@@ -0,0 +1,321 @@
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+from nxs_libs.shared_memory import release_if_shared
+from nxs_types.model import NxsModel
+from nxs_types.scheduling_data import NxsSchedulingPerComponentModelPlan
+
+# key set in carry_over_extras by the input process, absolute timestamp (secs) by which
+# the request should have left the backend
+REQUEST_DEADLINE_KEY = "deadline"
+
+
+# Assembles per-request preprocessed tensors into contiguous batches. Each request
+# holds tensor_name -> rows (usually an array of shape (1, *shape)), rows of all
+# requests are written next to each other into a single (num_rows, *shape) array,
+# either into caller-provided buffers (e.g. shared memory views) or into a fresh one.
+# Tensors that cannot be stacked (dynamic shapes, python objects...) are kept as
+# lists, as before. For consumers that run synchronously, get_buffers() returns views
+# over one (max_batch_size, *shape) buffer per model input that is reused every batch.
+class BackendBatchBuilder:
+    def __init__(self, component_model: NxsModel, max_batch_size: int) -> None:
+        self.max_batch_size = max_batch_size
+
+        # input name -> (dtype, per-sample shape) for inputs with static shapes
+        self.input_specs: Dict[str, Tuple[np.dtype, Tuple]] = {}
+        for input in component_model.model_desc.inputs:
+            if all(dim > 0 for dim in input.shape[1:]):
+                self.input_specs[input.name] = (
+                    np.dtype(input.dtype.value),
+                    tuple(input.shape[1:]),
+                )
+
+        self.buffers: Dict[str, np.ndarray] = {}
+
+    def get_buffers(self, batch_size: int) -> Dict[str, np.ndarray]:
+        # contents are overwritten by the next batch, callers must be done with them
+        if batch_size > self.max_batch_size:
+            return {}
+
+        if not self.buffers:
+            for name, (dtype, shape) in self.input_specs.items():
+                self.buffers[name] = np.empty((self.max_batch_size,) + shape, dtype)
+
+        return {name: buffer[:batch_size] for name, buffer in self.buffers.items()}
+
+    def _get_stackable_rows(self, items: List[Dict], tensor_name: str) -> List:
+        # returns the per-request row arrays if they can be stacked, None otherwise
+        rows = []
+        for item in items:
+            value = item.get(tensor_name)
+            if not isinstance(value, np.ndarray) or value.ndim == 0:
+                return None
+            rows.append(value)
+
+        first = rows[0]
+        if first.dtype.hasobject:
+            return None
+        for value in rows:
+            if value.shape[1:] != first.shape[1:] or value.dtype != first.dtype:
+                return None
+
+        return rows
+
+    def _get_tensor_names(self, items: List[Dict]) -> List[str]:
+        tensor_names = []
+        for item in items:
+            for tensor_name in item:
+                if tensor_name not in tensor_names:
+                    tensor_names.append(tensor_name)
+        return tensor_names
+
+    def get_tensor_specs(self, items: List[Dict]) -> Dict[str, Tuple[str, Tuple]]:
+        # tensor_name -> (dtype, shape) of every tensor assemble() can stack
+        specs = {}
+        for tensor_name in self._get_tensor_names(items):
+            rows = self._get_stackable_rows(items, tensor_name)
+            if rows is None:
+                continue
+            num_rows = sum(len(value) for value in rows)
+            specs[tensor_name] = (rows[0].dtype.str, (num_rows,) + rows[0].shape[1:])
+        return specs
+
+    def assemble(self, items: List[Dict], out: Dict = None) -> Dict:
+        batch = {}
+        for tensor_name in self._get_tensor_names(items):
+            rows = self._get_stackable_rows(items, tensor_name)
+            if rows is None:
+                batch[tensor_name] = []
+                for item in items:
+                    if tensor_name in item:
+                        batch[tensor_name].extend(item[tensor_name])
+                continue
+
+            num_rows = sum(len(value) for value in rows)
+            shape = (num_rows,) + rows[0].shape[1:]
+
+            dst = out.get(tensor_name) if out is not None else None
+            if dst is None or dst.shape != shape or dst.dtype != rows[0].dtype:
+                dst = np.empty(shape, dtype=rows[0].dtype)
+
+            pos = 0
+            for value in rows:
+                dst[pos : pos + len(value)] = value
+                pos += len(value)
+
+            batch[tensor_name] = dst
+
+        return batch
+
+
+class _SourceBatch:
+    # a batch as sent by one preprocessor, kept alive until all its samples are consumed
+    def __init__(self, batch: Dict, size: int) -> None:
+        self.batch = batch
+        self.size = size
+        self.remaining = size
+
+
+class _PendingSample:
+    __slots__ = ["source", "idx", "metadata", "arrival_ts", "deadline", "has_sla"]
+
+    def __init__(self, source, idx, metadata, arrival_ts, deadline, has_sla) -> None:
+        self.source = source
+        self.idx = idx
+        self.metadata = metadata
+        self.arrival_ts = arrival_ts
+        self.deadline = deadline
+        self.has_sla = has_sla
+
+
+# Merges samples from all preprocessor queues into batches for the compute step.
+# A flush runs everything pending (up to the planned batch size) as one batch, its
+# latency is estimated from the smallest profiled batch size that can hold it. Requests
+# carrying a deadline are flushed as soon as waiting for the next larger profiled batch
+# would make them miss it, requests without one wait at most half of the max batch
+# size latency.
+class BackendDeadlineBatcher:
+    def __init__(
+        self,
+        component_model: NxsModel,
+        component_model_plan: NxsSchedulingPerComponentModelPlan,
+        input_tensor_names: List[str],
+        max_wait_secs: float = 0,
+        batch_builder: BackendBatchBuilder = None,
+    ) -> None:
+        self.component_model = component_model
+        self.input_tensor_names = input_tensor_names
+        self.max_batch_size = component_model_plan.batch_size
+        self.batch_builder = batch_builder
+
+        # batch_size -> latency in secs
+        self.batch_latencies: Dict[int, float] = {}
+        for profile_unit in component_model.profile:
+            if profile_unit.batch_size <= self.max_batch_size:
+                self.batch_latencies[profile_unit.batch_size] = (
+                    profile_unit.latency_e2e.mean / 1000.0
+                )
+        self.supported_batch_sizes = sorted(self.batch_latencies.keys())
+        if not self.supported_batch_sizes:
+            self.supported_batch_sizes = [self.max_batch_size]
+            self.batch_latencies[self.max_batch_size] = 0
+
+        self.max_wait_secs = max_wait_secs
+        if self.max_wait_secs <= 0:
+            self.max_wait_secs = self._get_latency(self.max_batch_size) / 2
+        self.safety_margin_secs = 0.001
+
+        self.pending: List[_PendingSample] = []
+        self.batch_size_hist: Dict[int, int] = {}
+
+    def _get_latency(self, batch_size: int) -> float:
+        # latency of the smallest profiled batch size that can hold batch_size samples
+        for bs in self.supported_batch_sizes:
+            if bs >= batch_size:
+                return self.batch_latencies[bs]
+        return self.batch_latencies[self.supported_batch_sizes[-1]]
+
+    def add(self, batch: Dict, batch_metadata: List[Dict]):
+        cur_ts = time.time()
+        source = _SourceBatch(batch, len(batch_metadata))
+
+        for idx, metadata in enumerate(batch_metadata):
+            deadline = metadata["extra"].get(REQUEST_DEADLINE_KEY)
+            has_sla = deadline is not None
+            if not has_sla:
+                # soft deadline so best-effort requests still age under EDF ordering
+                deadline = (
+                    cur_ts + self.max_wait_secs + self._get_latency(self.max_batch_size)
+                )
+
+            self.pending.append(
+                _PendingSample(source, idx, metadata, cur_ts, deadline, has_sla)
+            )
+
+    def get_num_pending(self) -> int:
+        return len(self.pending)
+
+    def get_next_flush_ts(self) -> float:
+        if not self.pending:
+            return float("inf")
+
+        # waiting more only makes sense if a larger batch can still meet the deadlines
+        next_bs = self.max_batch_size
+        for bs in self.supported_batch_sizes:
+            if bs > len(self.pending):
+                next_bs = bs
+                break
+        next_latency = self._get_latency(next_bs)
+
+        flush_ts = float("inf")
+        for sample in self.pending:
+            if sample.has_sla:
+                ts = sample.deadline - next_latency - self.safety_margin_secs
+            else:
+                ts = sample.arrival_ts + self.max_wait_secs
+            flush_ts = min(flush_ts, ts)
+
+        return flush_ts
+
+    def pop_ready_batches(self, flush_all: bool = False) -> List[List]:
+        # returns the samples of each batch that should run now
+        batches = []
+
+        while self.pending:
+            num_pending = len(self.pending)
+            if (
+                num_pending < self.max_batch_size
+                and not flush_all
+                and time.time() < self.get_next_flush_ts()
+            ):
+                break
+
+            # a sparse profile must not split the backlog into many small runs
+            chosen_bs = min(num_pending, self.max_batch_size)
+
+            # earliest deadlines first
+            self.pending.sort(key=lambda sample: sample.deadline)
+            samples = self.pending[:chosen_bs]
+            self.pending = self.pending[chosen_bs:]
+
+            batches.append(samples)
+
+            self.batch_size_hist[chosen_bs] = self.batch_size_hist.get(chosen_bs, 0) + 1
+            for sample in samples:
+                sample.metadata["extra"][self.component_model.model_uuid][
+                    "batch_size"
+                ] = chosen_bs
+
+        return batches
+
+    def get_batches(self, flush_all: bool = False):
+        # yields (feed_dict, batch_metadata, samples) ready to run. With a batch_builder
+        # feed_dict reuses the buffers of the previous batch, so each batch has to be
+        # processed before asking for the next one
+        for samples in self.pop_ready_batches(flush_all):
+            out = None
+            if self.batch_builder is not None:
+                out = self.batch_builder.get_buffers(len(samples))
+            feed_dict, batch_metadata = self.gather(samples, out=out)
+            yield feed_dict, batch_metadata, samples
+
+    def get_tensor_specs(self, samples: List[_PendingSample]) -> Dict[str, Tuple]:
+        # tensor_name -> (dtype, shape) of the batch assembled from samples
+        specs = {}
+        for tensor_name in self.input_tensor_names:
+            first = np.asarray(samples[0].source.batch[tensor_name][samples[0].idx])
+            specs[tensor_name] = (first.dtype.str, (len(samples),) + first.shape)
+        return specs
+
+    def gather(
+        self, samples: List[_PendingSample], out: Dict = None, allow_views: bool = True
+    ) -> Tuple:
+        # stacks samples into contiguous tensors, into out[tensor_name] if given and
+        # compatible. A batch made of exactly one incoming batch is passed through as-is
+        # unless allow_views is False (the result must not reference the source batch)
+        source = samples[0].source
+        is_whole_source = (
+            allow_views
+            and len(samples) == source.size
+            and all(
+                sample.source is source and sample.idx == idx
+                for idx, sample in enumerate(samples)
+            )
+        )
+
+        feed_dict = {}
+        for tensor_name in self.input_tensor_names:
+            if is_whole_source:
+                feed_dict[tensor_name] = np.asarray(source.batch[tensor_name])
+                continue
+
+            tensors = [
+                np.asarray(sample.source.batch[tensor_name][sample.idx])
+                for sample in samples
+            ]
+
+            dst = out.get(tensor_name) if out is not None else None
+            if dst is not None and (
+                dst.shape[1:] != tensors[0].shape or dst.dtype != tensors[0].dtype
+            ):
+                dst = None
+
+            feed_dict[tensor_name] = np.stack(tensors, out=dst)
+
+        batch_metadata = [sample.metadata for sample in samples]
+
+        return feed_dict, batch_metadata
+
+    def release(self, samples: List[_PendingSample]):
+        # called once the batch's outputs have been sent, frees source batches (e.g.
+        # shared memory slots) whose samples have all been processed
+        for sample in samples:
+            sample.source.remaining -= 1
+            if sample.source.remaining == 0:
+                release_if_shared(sample.source.batch)
+
+    def pop_batch_size_hist(self) -> Dict[int, int]:
+        hist = self.batch_size_hist
+        self.batch_size_hist = {}
+        return hist
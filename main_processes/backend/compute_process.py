@@ -8,13 +8,19 @@ from typing import Dict, List
 
 import numpy as np
 from configs import BACKEND_INTERNAL_CONFIG, NXS_BACKEND_CONFIG, NXS_CONFIG
+from main_processes.backend.batching import BackendBatchBuilder, BackendDeadlineBatcher
+from main_processes.backend.stage_runtime import BackendStageWaiter
 from nxs_libs.interface.backend.input import (
     BackendInputInterface,
     BackendInputInterfaceFactory,
 )
-from nxs_libs.interface.backend.output import BackendOutputInterfaceFactory
+from nxs_libs.interface.backend.output import (
+    BackendOutputInterfaceFactory,
+    BackendOutputToSharedMemory,
+)
+from nxs_libs.shared_memory import release_if_shared
 from nxs_types.infer import NxsInferRequestMetadata
-from nxs_types.model import NxsModel
+from nxs_types.model import LatencyMeasurement, NxsModel, ProfileUnit
 from nxs_types.nxs_args import NxsBackendArgs
 from nxs_types.scheduling_data import NxsSchedulingPerComponentModelPlan
 from nxs_utils.logging import NxsLogLevel, setup_logger, write_log
@@ -49,7 +55,28 @@ class BackendComputeProcess(ABC):
         self.extra_params = extra_params
         self.transforming_fn_path = transforming_fn_path
 
+        # set when the model runs several compute instances side by side
+        self.instance_id = extra_params.get("instance_id", 0)
+        self.cpu_affinity: List[int] = extra_params.get("cpu_affinity", [])
+        self.instance_countdown = extra_params.get("instance_countdown", None)
+
+        # time.time() at which the backend started deploying this model, 0 if unknown
+        self.deploy_t0: float = extra_params.get("deploy_t0", 0)
+        self.is_first_output_sent = False
+
+        # measured profiles are pushed here if set, see _profile_model
+        self.profile_queue = extra_params.get("profile_queue", None)
+
+        # shared with the other instances and the backend's gpu arbiter if set
+        self.compute_stats = extra_params.get("compute_stats", None)
+        self.reported_num_pending = 0
+        self.num_warmup_iters = 3
+        self.num_profiling_iters = 10
+        self.max_profiling_secs_per_batch_size = 2.0
+
         self.log_prefix = "{}_COMPUTE".format(component_model.model_uuid)
+        if self.instance_countdown is not None:
+            self.log_prefix = f"{self.log_prefix}_{self.instance_id}"
         # self.log_level = os.environ.get(NXS_CONFIG.LOG_LEVEL, NxsLogLevel.INFO)
         self.next_topic_name = "{}_OUTPUT".format(component_model.model_uuid)
 
@@ -72,6 +99,8 @@ class BackendComputeProcess(ABC):
 
         self.p = None
         self.transform_fn = None
+        self.batcher: BackendDeadlineBatcher = None
+        self.can_reuse_output_buffers = False
         self.transform_extra_params = {
             "max_batch_size": self.max_batch_size,
             "supported_batch_sizes": self.supported_batch_sizes,
@@ -91,23 +120,25 @@ class BackendComputeProcess(ABC):
         self.p = Process(target=self._run, args=())
         self.p.start()
 
-    def read_queue_thr(
-        self, tid: int, queue: BackendInputInterface, stop_flag, buffer: List
-    ):
-        while not self.local_stop_flags[tid]:
-            batch = queue.get_batch()
-            if not batch:
-                time.sleep(0.001)
-                continue
-            buffer.extend(batch)
-
-        # read all remaining
-        while queue.get_num_buffered_items() > 0:
-            buffer.extend(queue.get_batch())
-
     def _run(self):
+        self._apply_cpu_affinity()
+
+        gpu_mem_used_t0 = self._get_gpu_mem_used()
         self._load_model()
 
+        if self.deploy_t0 > 0:
+            load_secs = time.time() - self.deploy_t0
+            self._log(f"Model loaded {load_secs:.2f} secs after deployment started")
+
+        self._warm_up()
+        if self.profile_queue is not None:
+            profile = self._profile_model()
+            self._set_measured_gpu_mem_usage(profile, gpu_mem_used_t0)
+            if profile:
+                self.profile_queue.put((self.component_model.model_uuid, profile))
+                # deadline batching below should rely on this hardware's latencies
+                self.component_model.profile = profile
+
         self.inputs: List[BackendInputInterface] = []
         for input_interface_args in self.input_interface_args_list:
             input = BackendInputInterfaceFactory.create_input_interface(
@@ -126,65 +157,68 @@ class BackendComputeProcess(ABC):
         ]:
             self._load_transforming_fn()
 
+        # _infer may hand back buffers it overwrites on the next call if results are
+        # copied out before that, i.e. into the output arena by _send_outputs
+        self.can_reuse_output_buffers = self.transform_fn is None and isinstance(
+            self.output, BackendOutputToSharedMemory
+        )
+
+        if (
+            self.batching
+            and self.cross_requests_batching
+            and self.transform_fn is None
+            and not self.component_model_plan.enable_batcher
+        ):
+            # merge requests coming from all preprocessors into deadline-aware batches
+            self.batcher = BackendDeadlineBatcher(
+                self.component_model,
+                self.component_model_plan,
+                self.input_tensor_names,
+                batch_builder=BackendBatchBuilder(
+                    self.component_model, self.component_model_plan.batch_size
+                ),
+            )
+
         tt0 = time.time()
         normal_batching_infer_count = 0
         time_to_sleep = 0
 
-        import threading
+        waiter = BackendStageWaiter(self.inputs)
 
-        self.local_stop_flags = [False for _ in range(len(self.stop_flags))]
+        # inputs whose producers have exited and been drained
+        closed_inputs = set()
 
         queue_buffer = []
-        read_data_threads: List[threading.Thread] = []
-        for tid in range(len(self.stop_flags)):
-            read_data_thr = threading.Thread(
-                target=self.read_queue_thr,
-                args=(
-                    tid,
-                    self.inputs[tid],
-                    self.stop_flags[tid],
-                    queue_buffer,
-                ),
-            )
-            read_data_thr.start()
-            read_data_threads.append(read_data_thr)
-
         to_exit = False
         while True:
-            if self.allow_infer_flag is not None:
-                stop_flag_enabled = True
-                for stop_flag in self.stop_flags:
-                    if not stop_flag.value:
-                        stop_flag_enabled = False
-                        break
-                if not stop_flag_enabled and not self.allow_infer_flag.value:
-                    # if stop_flag was triggered, need to execute all batched requests and exit
-                    # time.sleep(0.001)
-                    print("pausing inference")
-                    time.sleep(1)
+            # inputs are read even while paused, the gpu arbiter needs to see demand
+            for idx, input in enumerate(self.inputs):
+                if idx in closed_inputs:
                     continue
 
-            # if not self.stop_flag.value:
-            #     batches = self.input.get_batch()
-            # else:
-            #     batches = self.input.close_and_get_remains()
-            #     to_exit = True
+                if self.stop_flags[idx].value:
+                    queue_buffer.extend(input.close_and_get_remains())
+                    closed_inputs.add(idx)
+                else:
+                    queue_buffer.extend(input.get_batch())
+
+            all_stop_flags_set = len(closed_inputs) == len(self.inputs)
 
-            all_stop_flags_set = True
+            self._update_num_pending(queue_buffer)
 
-            for stop_flag_idx, stop_flag in enumerate(self.stop_flags):
-                if stop_flag.value:
-                    self.local_stop_flags[stop_flag_idx] = True
-                    read_data_threads[stop_flag_idx].join()
-                else:
-                    all_stop_flags_set = False
-                    break
+            if self.allow_infer_flag is not None:
+                if not all_stop_flags_set and not self.allow_infer_flag.value:
+                    # if stop_flag was triggered, need to execute all batched requests and exit
+                    # paused for another model's time slice, see BackendGpuArbiter
+                    time.sleep(0.001)
+                    continue
 
             if all_stop_flags_set:
                 to_exit = True
 
             # for batch_data in batches:
             has_data = False
+            busy_t0 = time.time()
             for _ in range(len(queue_buffer)):
                 batch_data = queue_buffer.pop(0)
                 batch, batch_metadata = batch_data
@@ -192,6 +226,10 @@ class BackendComputeProcess(ABC):
                 for metadata in batch_metadata:
                     self.request_entering(metadata["extra"])
 
+                if self.batcher is not None:
+                    self.batcher.add(batch, batch_metadata)
+                    continue
+
                 # final results will be stored in output_dict
                 # output_dict = {}
                 output_list = []
@@ -213,13 +251,29 @@ class BackendComputeProcess(ABC):
                 # for key in batch_metadata[0].get(NXS_BACKEND_CONFIG.FORWARD_INPUTS, []):
                 #    output_dict[key] = batch[key]
 
-                for metadata in batch_metadata:
-                    self.request_exiting(metadata["extra"])
-
+                self._send_outputs(batch_metadata, output_list)
                 normal_batching_infer_count += len(output_list)
 
-                for item in output_list:
-                    self.output.put_batch(self.next_topic_name, [item])
+                # outputs are copied out by now, hand the input slot back to preprocessors
+                release_if_shared(batch)
+
+            if self.batcher is not None:
+                for feed_dict, batch_metadata, samples in self.batcher.get_batches(
+                    flush_all=to_exit
+                ):
+                    output_list = []
+                    self._process_normal_batchable(
+                        feed_dict, batch_metadata, output_list
+                    )
+                    has_data = True
+
+                    self._send_outputs(batch_metadata, output_list)
+                    normal_batching_infer_count += len(output_list)
+
+                    self.batcher.release(samples)
+
+            if has_data and self.compute_stats is not None:
+                self.compute_stats.add_busy_secs(time.time() - busy_t0)
 
             if time.time() - tt0 > 5:
                 if normal_batching_infer_count > 0:
@@ -228,6 +282,9 @@ class BackendComputeProcess(ABC):
                     #     "compute", "fps", fps, "time_to_sleep", time_to_sleep
                     # )
                     self._log(f"FPS: {fps} - NumberOfSleepTimes: {time_to_sleep}")
+                    if self.batcher is not None:
+                        hist = self.batcher.pop_batch_size_hist()
+                        self._log(f"BatchSizeHist: {dict(sorted(hist.items()))}")
 
                 normal_batching_infer_count = 0
                 time_to_sleep = 0
@@ -237,17 +294,181 @@ class BackendComputeProcess(ABC):
                 break
 
             if not has_data:
+                # sleep until new batches arrive or pending requests have to go out
                 time_to_sleep += 1
-                time.sleep(0.001)
+                timeout = None
+                if self.batcher is not None:
+                    timeout = self.batcher.get_next_flush_ts() - time.time()
+                waiter.wait(timeout, closed_inputs)
+
+        if self.compute_stats is not None:
+            self.compute_stats.update_num_pending(-self.reported_num_pending)
+
+        is_last_instance = True
+        if self.instance_countdown is not None:
+            # output processes are shared, only the last instance to exit stops them
+            with self.instance_countdown.get_lock():
+                self.instance_countdown.value -= 1
+                is_last_instance = self.instance_countdown.value == 0
 
-        self.next_process_stop_flag.value = True
+        if is_last_instance:
+            self.next_process_stop_flag.value = True
 
         self._log("Exiting...")
 
+    def _update_num_pending(self, queue_buffer: List):
+        if self.compute_stats is None:
+            return
+
+        num_pending = len(queue_buffer)
+        if self.batcher is not None:
+            num_pending += self.batcher.get_num_pending()
+
+        self.compute_stats.update_num_pending(num_pending - self.reported_num_pending)
+        self.reported_num_pending = num_pending
+
+    def _get_dummy_inputs(self, batch_size: int) -> Dict[str, np.ndarray]:
+        # returns None if some input has a dynamic non-batch dimension
+        feed_dict = {}
+        for input in self.component_model.model_desc.inputs:
+            if any(dim <= 0 for dim in input.shape[1:]):
+                return None
+            shape = [batch_size] + list(input.shape[1:])
+            feed_dict[input.name] = np.zeros(shape, dtype=input.dtype.value)
+        return feed_dict
+
+    def _warm_up(self):
+        # first runs pay for lazy initialization (allocations, kernel selection...)
+        feed_dict = self._get_dummy_inputs(self.max_batch_size)
+        if feed_dict is None:
+            return
+
+        t0 = time.time()
+        try:
+            for _ in range(self.num_warmup_iters):
+                self._infer(feed_dict, self.output_tensor_names)
+        except Exception as e:
+            self._log(f"Failed to warm up model: {e}", logging.WARNING)
+            return
+
+        self._log(f"Warmed up model in {time.time() - t0:.2f} secs")
+
+    def _get_gpu_mem_used(self) -> float:
+        # MB in use on this backend's gpu, None if unknown
+        if not self.use_gpu:
+            return None
+        try:
+            import GPUtil
+
+            return GPUtil.getGPUs()[0].memoryUsed
+        except:
+            return None
+
+    def _set_measured_gpu_mem_usage(
+        self, profile: List[ProfileUnit], gpu_mem_used_t0: float
+    ):
+        # the model's footprint is what the gpu gained since before it was loaded,
+        # after running its largest batches. Models loaded concurrently on the same
+        # gpu inflate it, which errs on the safe side for the scheduler
+        gpu_mem_used = self._get_gpu_mem_used()
+        if gpu_mem_used is None or gpu_mem_used_t0 is None:
+            return
+
+        footprint = gpu_mem_used - gpu_mem_used_t0
+        if footprint <= 0:
+            return
+
+        self._log(f"Measured gpu memory footprint: {footprint:.0f} MB")
+        for profile_unit in profile:
+            profile_unit.gpu_mem_usage = footprint
+
+    def _profile_model(self) -> List[ProfileUnit]:
+        # measures every profiled batch size on this backend's hardware, gpu memory
+        # usage is kept from the registered profile until measured after profiling
+        measured_profile = []
+        for profile_unit in sorted(
+            self.component_model.profile, key=lambda unit: unit.batch_size
+        ):
+            batch_size = profile_unit.batch_size
+            feed_dict = self._get_dummy_inputs(batch_size)
+            if feed_dict is None:
+                return []
+
+            latencies = []
+            try:
+                for _ in range(self.num_warmup_iters):
+                    self._infer(feed_dict, self.output_tensor_names)
+
+                t0 = time.time()
+                while len(latencies) < self.num_profiling_iters:
+                    t1 = time.time()
+                    self._infer(feed_dict, self.output_tensor_names)
+                    latencies.append((time.time() - t1) * 1000)
+
+                    if time.time() - t0 > self.max_profiling_secs_per_batch_size:
+                        break
+            except Exception as e:
+                self._log(f"Failed to profile batch size {batch_size}: {e}")
+                continue
+
+            mean_latency = float(np.mean(latencies))
+            measured_profile.append(
+                ProfileUnit(
+                    batch_size=batch_size,
+                    fps=batch_size * 1000 / mean_latency,
+                    latency_e2e=LatencyMeasurement(
+                        mean=mean_latency,
+                        std=float(np.std(latencies)),
+                        min=float(np.min(latencies)),
+                        max=float(np.max(latencies)),
+                    ),
+                    gpu_mem_usage=profile_unit.gpu_mem_usage,
+                )
+            )
+
+            self._log(
+                f"Profiled batch size {batch_size}: {mean_latency:.2f} ms - "
+                f"{measured_profile[-1].fps:.1f} fps"
+            )
+
+        return measured_profile
+
+    def _apply_cpu_affinity(self):
+        if not self.cpu_affinity:
+            return
+
+        try:
+            os.sched_setaffinity(0, self.cpu_affinity)
+        except Exception as e:
+            self._log(f"Failed to set cpu affinity: {e}", logging.WARNING)
+            return
+
+        # keep thread pools sized from the environment within this instance's cores
+        num_threads = str(len(self.cpu_affinity))
+        for env_name in ["OMP_NUM_THREADS", "TVM_NUM_THREADS"]:
+            os.environ.setdefault(env_name, num_threads)
+
+        self._log(f"Pinned to cpus {self.cpu_affinity}")
+
+    def _send_outputs(self, batch_metadata: List[Dict], output_list: List):
+        for metadata in batch_metadata:
+            self.request_exiting(metadata["extra"])
+
+        for item in output_list:
+            self.output.put_batch(self.next_topic_name, [item])
+
+        if output_list and not self.is_first_output_sent:
+            self.is_first_output_sent = True
+            if self.deploy_t0 > 0:
+                first_infer_secs = time.time() - self.deploy_t0
+                self._log(
+                    f"First inference {first_infer_secs:.2f} secs after deployment started"
+                )
+
     def _process_normal_batchable(self, batch, batch_metadata, output_buffer: List):
         feed_dict = {}
         for tensor_name in self.input_tensor_names:
-            feed_dict[tensor_name] = np.array(batch[tensor_name])
+            feed_dict[tensor_name] = np.asarray(batch[tensor_name])
 
         outputs = self._infer(feed_dict, self.output_tensor_names)
 
@@ -271,14 +492,14 @@ class BackendComputeProcess(ABC):
             ]
 
             for key in batch_metadata[0].get(NXS_BACKEND_CONFIG.FORWARD_INPUTS, []):
-                results[key][0] = batch[key][0]
+                results[key][0] = np.array(batch[key][0])
 
             output_buffer.append((results, batch_metadata[0]))
         else:
             if self.transform_fn is None:
                 feed_dict = {}
                 for tensor_name in self.input_tensor_names:
-                    feed_dict[tensor_name] = np.array(batch[tensor_name])
+                    feed_dict[tensor_name] = np.asarray(batch[tensor_name])
 
                 outputs = self._infer(feed_dict, self.output_tensor_names)
 
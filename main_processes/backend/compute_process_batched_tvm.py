@@ -40,7 +40,7 @@ class BackendComputeProcessBatchedTvm(BackendComputeProcess):
         allow_infer_flag,
         stop_flags,
         next_process_stop_flag,
-        extra_params: Dict = ...,
+        extra_params: Dict = {},
     ) -> None:
         super().__init__(
             args,
@@ -90,21 +90,32 @@ class BackendComputeProcessBatchedTvm(BackendComputeProcess):
             bs = len(feed_dict[input_name])
             break
 
-        module = self.module_dict[bs]
+        # modules are compiled for the profiled batch sizes only, smaller batches are
+        # padded up to the next one
+        module_bs = bs
+        if bs not in self.module_dict:
+            module_bs = min(
+                [b for b in self.module_dict if b >= bs], default=max(self.module_dict)
+            )
+        module = self.module_dict[module_bs]
         if not self.use_gpu:
             set_input = module["set_input_zero_copy"]
         else:
             set_input = module["set_input"]
 
         for input_name in feed_dict:
-            tvm_data = tvm.nd.array(feed_dict[input_name], device=self.ctx)
+            data = np.asarray(feed_dict[input_name])
+            if module_bs > bs:
+                padding = np.zeros((module_bs - bs,) + data.shape[1:], dtype=data.dtype)
+                data = np.concatenate([data, padding])
+            tvm_data = tvm.nd.array(data, device=self.ctx)
             set_input(input_name, tvm_data)
 
         module.run()
 
         outputs = []
         for i in range(len(output_tensor_names)):
-            outputs.append(module.get_output(i).numpy())
+            outputs.append(module.get_output(i).numpy()[:bs])
 
         return outputs
 
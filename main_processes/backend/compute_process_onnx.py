@@ -1,13 +1,14 @@
 import os
 import time
 import json
+import logging
 import numpy as np
 from abc import ABC, abstractmethod
 from typing import Dict, List
 from configs import BACKEND_INTERNAL_CONFIG, NXS_BACKEND_CONFIG, NXS_CONFIG
 from nxs_types.infer import NxsInferRequestMetadata
 from nxs_types.nxs_args import NxsBackendArgs
-from nxs_types.model import NxsModel
+from nxs_types.model import NxsModel, OnnxOptimizationLevel, OnnxSessionOptions
 from nxs_types.scheduling_data import NxsSchedulingPerComponentModelPlan
 from nxs_libs.interface.backend.input import (
     BackendInputInterface,
@@ -22,6 +23,18 @@ from nxs_libs.interface.backend.output import (
 from nxs_utils.logging import NxsLogLevel, write_log
 from main_processes.backend.compute_process import BackendComputeProcess
 
+# onnxruntime output element types -> numpy dtypes, for preallocating output buffers
+ONNX_OUTPUT_DTYPES = {
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+    "tensor(double)": np.float64,
+    "tensor(int8)": np.int8,
+    "tensor(uint8)": np.uint8,
+    "tensor(int32)": np.int32,
+    "tensor(int64)": np.int64,
+    "tensor(bool)": np.bool_,
+}
+
 
 class BackendComputeProcessOnnx(BackendComputeProcess):
     def __init__(
@@ -37,7 +50,7 @@ class BackendComputeProcessOnnx(BackendComputeProcess):
         allow_infer_flag,
         stop_flags,
         next_process_stop_flag,
-        extra_params: Dict = ...,
+        extra_params: Dict = {},
     ) -> None:
         super().__init__(
             args,
@@ -81,20 +94,198 @@ class BackendComputeProcessOnnx(BackendComputeProcess):
             # update model_path
             self.model_path = os.path.join(big_onnx_model_dir, "model.onnx")
 
+        session_options = self.component_model.onnx_session_options
+        if session_options is None:
+            session_options = OnnxSessionOptions()
+
         providers = []
         if not self.use_gpu:
             providers.append("CPUExecutionProvider")
         else:
-            providers.append("CUDAExecutionProvider")
+            cuda_options = {
+                "arena_extend_strategy": session_options.arena_extend_strategy
+            }
+            if session_options.gpu_mem_limit_mb > 0:
+                gpu_mem_limit = session_options.gpu_mem_limit_mb * 1024 * 1024
+                cuda_options["gpu_mem_limit"] = gpu_mem_limit
+            providers.append(("CUDAExecutionProvider", cuda_options))
+
+        sess_options = rt.SessionOptions()
+        if session_options.intra_op_num_threads > 0:
+            sess_options.intra_op_num_threads = session_options.intra_op_num_threads
+        elif self.cpu_affinity:
+            # thread budget of this instance
+            sess_options.intra_op_num_threads = len(self.cpu_affinity)
+        if session_options.inter_op_num_threads > 0:
+            sess_options.inter_op_num_threads = session_options.inter_op_num_threads
+            sess_options.execution_mode = rt.ExecutionMode.ORT_PARALLEL
+        sess_options.enable_cpu_mem_arena = session_options.enable_cpu_mem_arena
+        sess_options.enable_mem_pattern = session_options.enable_mem_pattern
+        ort_levels = rt.GraphOptimizationLevel
+        sess_options.graph_optimization_level = {
+            OnnxOptimizationLevel.DISABLE_ALL: ort_levels.ORT_DISABLE_ALL,
+            OnnxOptimizationLevel.ENABLE_BASIC: ort_levels.ORT_ENABLE_BASIC,
+            OnnxOptimizationLevel.ENABLE_EXTENDED: ort_levels.ORT_ENABLE_EXTENDED,
+            OnnxOptimizationLevel.ENABLE_ALL: ort_levels.ORT_ENABLE_ALL,
+        }[session_options.graph_optimization_level]
+
+        model_path = self.model_path
+        optimized_model_path = ""
+        onnx_sess = None
+        if session_options.cache_optimized_model:
+            cached_model_path = self._get_optimized_model_path(rt, session_options)
+            if os.path.exists(cached_model_path):
+                # graph was optimized by a previous deployment on this node
+                optimization_level = sess_options.graph_optimization_level
+                sess_options.graph_optimization_level = ort_levels.ORT_DISABLE_ALL
+                try:
+                    onnx_sess = rt.InferenceSession(
+                        cached_model_path,
+                        sess_options=sess_options,
+                        providers=providers,
+                    )
+                except Exception as e:
+                    # e.g. a corrupted file, rebuild it from the original model
+                    self._log(
+                        f"Failed to load cached optimized model, rebuilding it: {e}",
+                        logging.WARNING,
+                    )
+                    self._remove_file(cached_model_path)
+                    sess_options.graph_optimization_level = optimization_level
+
+            if onnx_sess is None:
+                optimized_model_path = cached_model_path
+                # instances of a model start together, each writes its own file
+                sess_options.optimized_model_filepath = (
+                    f"{optimized_model_path}.{os.getpid()}.tmp"
+                )
+
+        if onnx_sess is None:
+            try:
+                onnx_sess = rt.InferenceSession(
+                    model_path, sess_options=sess_options, providers=providers
+                )
+            except:
+                if not optimized_model_path:
+                    raise
+                # e.g. models with external data can't be serialized, run without cache
+                self._log("Failed to save optimized model", logging.WARNING)
+                self._remove_file(sess_options.optimized_model_filepath)
+                optimized_model_path = ""
+                sess_options.optimized_model_filepath = ""
+                onnx_sess = rt.InferenceSession(
+                    model_path, sess_options=sess_options, providers=providers
+                )
+        self.onnx_sess = onnx_sess
+
+        if optimized_model_path:
+            try:
+                # only publish complete files, other deployments may be reading it
+                os.replace(sess_options.optimized_model_filepath, optimized_model_path)
+                self._log(f"Cached optimized model into {optimized_model_path}")
+            except:
+                self._log("Failed to cache optimized model", logging.WARNING)
+                self._remove_file(sess_options.optimized_model_filepath)
 
-        self.onnx_sess = rt.InferenceSession(self.model_path, providers=providers)
+        self.use_io_binding = session_options.use_io_binding
+        self.output_buffers: Dict[str, np.ndarray] = {}
+        self.output_buffer_specs: Dict[str, tuple] = {}
+        for output in self.onnx_sess.get_outputs():
+            dtype = ONNX_OUTPUT_DTYPES.get(output.type)
+            if dtype is None or not output.shape or isinstance(output.shape[0], int):
+                continue
+            if all(isinstance(dim, int) and dim > 0 for dim in output.shape[1:]):
+                self.output_buffer_specs[output.name] = (dtype, tuple(output.shape[1:]))
 
         # if not self.use_gpu:
         #     self.onnx_sess.set_providers(["CPUExecutionProvider"])
         # else:
         #     self.onnx_sess.set_providers(["CUDAExecutionProvider"])
 
+    def _remove_file(self, path: str):
+        try:
+            if path and os.path.exists(path):
+                os.remove(path)
+        except:
+            pass
+
+    def _get_optimized_model_path(self, rt, session_options: OnnxSessionOptions):
+        # model dirs are wiped on unscheduling, keep the cache next to them instead
+        cache_dir = os.path.join(
+            os.path.dirname(os.path.realpath(__file__)), "onnx_optimized_models"
+        )
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+
+        model_uuid = self.component_model.model_uuid
+        device = "gpu" if self.use_gpu else "cpu"
+        level = session_options.graph_optimization_level.value
+
+        return os.path.join(
+            cache_dir, f"{model_uuid}_{device}_{level}_{rt.__version__}.onnx"
+        )
+
+    def _get_output_buffers(self, batch_size: int, output_tensor_names: List[str]):
+        # views over one (max_batch_size, *shape) buffer per output, None if some
+        # output does not have a static per-sample shape
+        if not self.can_reuse_output_buffers or batch_size > self.max_batch_size:
+            return None
+
+        buffers = []
+        for output_tensor_name in output_tensor_names:
+            if output_tensor_name not in self.output_buffer_specs:
+                return None
+            if output_tensor_name not in self.output_buffers:
+                dtype, shape = self.output_buffer_specs[output_tensor_name]
+                self.output_buffers[output_tensor_name] = np.empty(
+                    (self.max_batch_size,) + shape, dtype=dtype
+                )
+            buffers.append(self.output_buffers[output_tensor_name][:batch_size])
+
+        return buffers
+
+    def _infer_with_io_binding(
+        self, feed_dict: Dict, output_tensor_names: List[str]
+    ) -> List:
+        io_binding = self.onnx_sess.io_binding()
+
+        batch_size = 0
+        for tensor_name, tensor in feed_dict.items():
+            tensor = np.ascontiguousarray(tensor)
+            batch_size = len(tensor)
+            io_binding.bind_cpu_input(tensor_name, tensor)
+
+        outputs = self._get_output_buffers(batch_size, output_tensor_names)
+        if outputs is None:
+            # let onnxruntime allocate outputs of unknown shapes
+            for output_tensor_name in output_tensor_names:
+                io_binding.bind_output(output_tensor_name, "cpu")
+            self.onnx_sess.run_with_iobinding(io_binding)
+            return io_binding.copy_outputs_to_cpu()
+
+        for output_tensor_name, output in zip(output_tensor_names, outputs):
+            io_binding.bind_output(
+                output_tensor_name,
+                "cpu",
+                0,
+                output.dtype,
+                output.shape,
+                output.ctypes.data,
+            )
+        self.onnx_sess.run_with_iobinding(io_binding)
+
+        return outputs
+
     def _infer(self, feed_dict: Dict, output_tensor_names: List[str]) -> List:
+        if self.use_io_binding:
+            try:
+                return self._infer_with_io_binding(feed_dict, output_tensor_names)
+            except Exception as e:
+                self._log(
+                    f"IOBinding failed, falling back to run(): {e}", logging.WARNING
+                )
+                self.use_io_binding = False
+
         outputs = self.onnx_sess.run(output_tensor_names, feed_dict)
         return outputs
 
@@ -41,7 +41,7 @@ class BackendComputeProcessTfv1(BackendComputeProcess):
         allow_infer_flag,
         stop_flags,
         next_process_stop_flag,
-        extra_params: Dict = ...,
+        extra_params: Dict = {},
     ) -> None:
         super().__init__(
             args,
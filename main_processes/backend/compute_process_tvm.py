@@ -40,7 +40,7 @@ class BackendComputeProcessTvm(BackendComputeProcess):
         allow_infer_flag,
         stop_flags,
         next_process_stop_flag,
-        extra_params: Dict = ...,
+        extra_params: Dict = {},
     ) -> None:
         super().__init__(
             args,
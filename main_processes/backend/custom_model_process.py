@@ -11,6 +11,7 @@ from typing import Dict, List
 import cv2
 import numpy as np
 from configs import BACKEND_INTERNAL_CONFIG, NXS_BACKEND_CONFIG, NXS_CONFIG
+from main_processes.backend.stage_runtime import BackendStageWaiter
 from nxs_libs.interface.backend.input import BackendInputInterfaceFactory
 from nxs_libs.interface.backend.output import BackendOutputInterfaceFactory
 from nxs_libs.interface.model import NxsBaseCustomModel
@@ -106,6 +107,8 @@ class BackendCustomModelProcess:
         # initialize the model
         # self.model_dict: Dict = self.init_fn(self.component_model)
 
+        waiter = BackendStageWaiter([self.input])
+
         while True:
             requests = []
             if not self.stop_flag.value:
@@ -146,11 +149,15 @@ class BackendCustomModelProcess:
                 for request_input in data.inputs:
                     try:
                         if request_input.type == NxsInferInputType.ENCODED_IMAGE:
-                            inputs_dict[request_input.name] = request_input.data
+                            inputs_dict[request_input.name] = bytes(request_input.data)
                         elif request_input.type == NxsInferInputType.PICKLED_DATA:
                             inputs_dict[request_input.name] = pickle.loads(
                                 request_input.data
                             )
+                        elif request_input.type == NxsInferInputType.NUMPY_TENSOR:
+                            inputs_dict[request_input.name] = np.frombuffer(
+                                request_input.data, dtype=np.dtype(request_input.dtype)
+                            ).reshape(request_input.shape)
                     except Exception as ex:
                         metadata[
                             BACKEND_INTERNAL_CONFIG.TASK_STATUS
@@ -259,7 +266,7 @@ class BackendCustomModelProcess:
                 break
 
             if not requests:
-                time.sleep(0.001)
+                waiter.wait()
 
         # trigger next process to stop
         self.next_process_stop_flag.value = True
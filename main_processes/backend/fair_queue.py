@@ -0,0 +1,132 @@
+import time
+from collections import deque
+from typing import Deque, Dict, List
+
+
+# Deficit round robin over per-session queues. Sessions with queued requests take
+# turns, each turn adds quantum * weight to the session's deficit and serves as many
+# requests as the deficit covers, so over time sessions are served in proportion to
+# their weights however bursty each of them is. A session that empties its queue
+# loses what is left of its deficit, idle sessions cannot save up for a burst.
+class BackendSessionFairQueue:
+    def __init__(self, quantum: float = 1, min_weight: float = 0.01) -> None:
+        self.quantum = quantum
+        self.min_weight = min_weight
+
+        self.queues: Dict[str, Deque] = {}
+        self.weights: Dict[str, float] = {}
+        self.deficits: Dict[str, float] = {}
+
+        # sessions with queued requests, in serving order
+        self.active_session_uuids: Deque[str] = deque()
+        # whether the head of active_session_uuids already got its quantum
+        self.is_turn_started = False
+
+        self.num_queued = 0
+
+        # since the last pop_stats
+        self.num_served: Dict[str, int] = {}
+        self.stats_t0 = time.time()
+
+    def add_session(self, session_uuid: str, weight: float = 1.0):
+        if session_uuid in self.queues:
+            return
+
+        self.queues[session_uuid] = deque()
+        self.deficits[session_uuid] = 0
+        self.num_served[session_uuid] = 0
+        self.set_weight(session_uuid, weight)
+
+    def remove_session(self, session_uuid: str) -> List:
+        # returns the requests still queued for the session
+        if session_uuid not in self.queues:
+            return []
+
+        if self.active_session_uuids and self.active_session_uuids[0] == session_uuid:
+            self.is_turn_started = False
+        if session_uuid in self.active_session_uuids:
+            self.active_session_uuids.remove(session_uuid)
+
+        items = list(self.queues.pop(session_uuid))
+        self.num_queued -= len(items)
+        self.weights.pop(session_uuid)
+        self.deficits.pop(session_uuid)
+        self.num_served.pop(session_uuid)
+
+        return items
+
+    def has_session(self, session_uuid: str) -> bool:
+        return session_uuid in self.queues
+
+    def set_weight(self, session_uuid: str, weight: float):
+        # a zero weight would never be served
+        self.weights[session_uuid] = max(self.min_weight, weight)
+
+    def get_num_queued(self, session_uuid: str = None) -> int:
+        if session_uuid is None:
+            return self.num_queued
+        return len(self.queues.get(session_uuid, []))
+
+    def push(self, session_uuid: str, items: List):
+        if not items:
+            return
+
+        queue = self.queues[session_uuid]
+        if not queue:
+            self.active_session_uuids.append(session_uuid)
+
+        queue.extend(items)
+        self.num_queued += len(items)
+
+    def pop(self, max_items: int) -> List:
+        items = []
+
+        while self.active_session_uuids and len(items) < max_items:
+            session_uuid = self.active_session_uuids[0]
+            queue = self.queues[session_uuid]
+
+            if not self.is_turn_started:
+                self.deficits[session_uuid] += self.quantum * self.weights[session_uuid]
+                self.is_turn_started = True
+
+            num_items = min(
+                len(queue), int(self.deficits[session_uuid]), max_items - len(items)
+            )
+            for _ in range(num_items):
+                items.append(queue.popleft())
+            self.deficits[session_uuid] -= num_items
+            self.num_served[session_uuid] += num_items
+            self.num_queued -= num_items
+
+            if queue and self.deficits[session_uuid] >= 1:
+                # out of budget mid-turn, the session continues next time
+                break
+
+            self.is_turn_started = False
+            self.active_session_uuids.popleft()
+            if queue:
+                self.active_session_uuids.append(session_uuid)
+            else:
+                self.deficits[session_uuid] = 0
+
+        return items
+
+    def pop_all(self) -> List:
+        return self.pop(self.num_queued)
+
+    def pop_stats(self) -> Dict[str, Dict[str, float]]:
+        # session_uuid -> queue depth and served requests per sec since the last call
+        cur_ts = time.time()
+        window_secs = max(cur_ts - self.stats_t0, 1e-6)
+        self.stats_t0 = cur_ts
+
+        stats = {}
+        for session_uuid, queue in self.queues.items():
+            stats[session_uuid] = {
+                "weight": self.weights[session_uuid],
+                "queue_depth": len(queue),
+                "served_fps": self.num_served[session_uuid] / window_secs,
+            }
+            self.num_served[session_uuid] = 0
+
+        return stats
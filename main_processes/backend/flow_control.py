@@ -0,0 +1,46 @@
+from multiprocessing import Value
+
+
+# Credit-based flow control over all stages of a cmodel on a backend. The input process
+# of the first component model takes a credit for every request it lets into the
+# pipeline, the output processes of the last component model give it back once the
+# request leaves the backend. So at most max_credits requests are queued or running
+# between them whichever stage is the bottleneck, the queues in between stay bounded
+# and the rest of the load stays in redis for other replicas of the model to pull.
+class BackendInFlightCredits:
+    def __init__(self, max_credits: int) -> None:
+        self.max_credits = max(1, max_credits)
+        self.num_in_flight = Value("i", 0)
+        # set once the pipeline cannot serve requests anymore, e.g. a stage died
+        self.is_blocked = Value("i", 0)
+
+    def get_num_in_flight(self) -> int:
+        return self.num_in_flight.value
+
+    def get_num_available(self) -> int:
+        if self.is_blocked.value:
+            return 0
+        return max(0, self.max_credits - self.num_in_flight.value)
+
+    def acquire(self, num_credits: int):
+        # may go over max_credits, e.g. to flush everything when stopping
+        if num_credits <= 0:
+            return
+        with self.num_in_flight.get_lock():
+            self.num_in_flight.value += num_credits
+
+    def release(self, num_credits: int):
+        # never below 0, e.g. for requests admitted before a reset
+        if num_credits <= 0:
+            return
+        with self.num_in_flight.get_lock():
+            self.num_in_flight.value = max(0, self.num_in_flight.value - num_credits)
+
+    def reset(self):
+        # credits of requests lost with the stage processes would never come back
+        with self.num_in_flight.get_lock():
+            self.num_in_flight.value = 0
+
+    def block(self):
+        # holds all credits, new requests stay in redis for other replicas to pull
+        self.is_blocked.value = 1
@@ -0,0 +1,262 @@
+import logging
+import math
+import time
+from multiprocessing import Value
+from threading import Lock, Thread
+from typing import Dict, List
+
+from nxs_types.model import NxsCompositoryModel
+from nxs_types.scheduling_data import NxsSchedulingPerCompositorymodelPlan
+from nxs_utils.logging import setup_logger
+
+
+class BackendComputeStats:
+    # shared by the compute instances of a component model and the gpu arbiter
+    def __init__(self) -> None:
+        self.busy_secs = Value("d", 0)  # time spent running batches
+        self.num_pending = Value("i", 0)  # batches waiting to run, over all instances
+
+    def add_busy_secs(self, secs: float):
+        with self.busy_secs.get_lock():
+            self.busy_secs.value += secs
+
+    def update_num_pending(self, delta: int):
+        if delta == 0:
+            return
+        with self.num_pending.get_lock():
+            self.num_pending.value += delta
+
+
+class _ArbitratedModel:
+    def __init__(
+        self,
+        cmodel_uuid: str,
+        duty_cycle: float,
+        min_slice_secs: float,
+        infer_flags: List,
+        compute_stats: List[BackendComputeStats],
+    ) -> None:
+        self.cmodel_uuid = cmodel_uuid
+        self.duty_cycle = duty_cycle
+        self.min_slice_secs = min_slice_secs
+        self.infer_flags = infer_flags
+        self.compute_stats = compute_stats
+
+        # smoothed fraction of its slices the model actually used
+        self.demand = 1.0
+
+        # since the last report
+        self.busy_secs = 0
+        self.last_total_busy_secs = self.get_total_busy_secs()
+
+    def get_total_busy_secs(self) -> float:
+        # component models run one after another, the slowest one bounds the model
+        return max(stats.busy_secs.value for stats in self.compute_stats)
+
+    def has_pending(self) -> bool:
+        return any(stats.num_pending.value > 0 for stats in self.compute_stats)
+
+    def set_allowed(self, allowed: bool):
+        for infer_flag in self.infer_flags:
+            infer_flag.value = allowed
+
+    def collect_busy_secs(self) -> float:
+        total_busy_secs = self.get_total_busy_secs()
+        busy_secs = total_busy_secs - self.last_total_busy_secs
+        self.last_total_busy_secs = total_busy_secs
+        self.busy_secs += busy_secs
+        return busy_secs
+
+
+# Time-slices the gpu between co-located cmodels by toggling the allow_infer_flags of
+# their compute processes. Every period, each cmodel with pending batches gets a slice
+# proportional to duty_cycle * demand, where demand is how much of its previous
+# slices it actually used. Slices are rounded up to whole batches of the model's
+# largest batch size, since a batch that started runs to completion. A cmodel that
+# runs out of work hands the rest of its slice over. When at most one cmodel has work
+# all of them may run, so idle backends add no latency.
+class BackendGpuArbiter:
+    def __init__(
+        self,
+        period_secs: float = 0.1,
+        min_demand: float = 0.1,
+        demand_smoothing: float = 0.3,
+        idle_check_secs: float = 0.002,
+    ) -> None:
+        self.period_secs = period_secs
+        self.min_demand = min_demand
+        self.demand_smoothing = demand_smoothing
+        self.idle_check_secs = idle_check_secs
+
+        self.models: Dict[str, _ArbitratedModel] = {}
+        self.lock = Lock()
+
+        self.report_t0 = time.time()
+
+        self.stop_flag = False
+        self.thr = None
+
+        self.log_prefix = "GPU_ARBITER"
+        setup_logger()
+
+    def _log(self, message, log_level=logging.INFO):
+        logging.log(log_level, f"{self.log_prefix} - {message}")
+
+    def start(self):
+        self.thr = Thread(target=self._run, args=())
+        self.thr.start()
+
+    def stop(self):
+        self.stop_flag = True
+        if self.thr is not None:
+            self.thr.join()
+
+    def add_model(
+        self,
+        cmodel: NxsCompositoryModel,
+        cmodel_plan: NxsSchedulingPerCompositorymodelPlan,
+        duty_cycle: float,
+        infer_flags: List,
+        compute_stats: List[BackendComputeStats],
+    ):
+        if not infer_flags or not compute_stats:
+            return
+
+        model = _ArbitratedModel(
+            cmodel.main_model.model_uuid,
+            duty_cycle,
+            self._get_min_slice_secs(cmodel, cmodel_plan),
+            infer_flags,
+            compute_stats,
+        )
+        with self.lock:
+            self.models[model.cmodel_uuid] = model
+
+    def remove_model(self, cmodel_uuid: str):
+        with self.lock:
+            model = self.models.pop(cmodel_uuid, None)
+        if model is not None:
+            model.set_allowed(True)
+
+    def set_duty_cycle(self, cmodel_uuid: str, duty_cycle: float):
+        with self.lock:
+            if cmodel_uuid in self.models:
+                self.models[cmodel_uuid].duty_cycle = duty_cycle
+
+    def update_profile(
+        self,
+        cmodel: NxsCompositoryModel,
+        cmodel_plan: NxsSchedulingPerCompositorymodelPlan,
+    ):
+        # e.g. once the profile measured on this backend replaced the registered one
+        min_slice_secs = self._get_min_slice_secs(cmodel, cmodel_plan)
+        with self.lock:
+            if cmodel.main_model.model_uuid in self.models:
+                self.models[cmodel.main_model.model_uuid].min_slice_secs = min_slice_secs
+
+    def _get_min_slice_secs(
+        self,
+        cmodel: NxsCompositoryModel,
+        cmodel_plan: NxsSchedulingPerCompositorymodelPlan,
+    ) -> float:
+        # latency of the largest planned batch of the slowest component model
+        min_slice_secs = 0
+        for component_model, component_model_plan in zip(
+            cmodel.component_models, cmodel_plan.component_model_plans
+        ):
+            latency_secs = 0
+            for profile_unit in component_model.profile:
+                if profile_unit.batch_size <= component_model_plan.batch_size:
+                    latency_secs = max(
+                        latency_secs, profile_unit.latency_e2e.mean / 1000.0
+                    )
+            min_slice_secs = max(min_slice_secs, latency_secs)
+        return min_slice_secs
+
+    def get_shares(self) -> Dict[str, Dict[str, float]]:
+        # cmodel_uuid -> duty cycle and share of gpu time it got since the last call
+        cur_ts = time.time()
+        window_secs = max(cur_ts - self.report_t0, 1e-6)
+        self.report_t0 = cur_ts
+
+        shares = {}
+        with self.lock:
+            for model in self.models.values():
+                model.collect_busy_secs()
+                shares[model.cmodel_uuid] = {
+                    "duty_cycle": model.duty_cycle,
+                    "achieved_share": model.busy_secs / window_secs,
+                }
+                model.busy_secs = 0
+        return shares
+
+    def _run(self):
+        while not self.stop_flag:
+            with self.lock:
+                models = list(self.models.values())
+
+            active_models = [model for model in models if model.has_pending()]
+            if len(active_models) <= 1:
+                # nothing to arbitrate
+                for model in models:
+                    model.set_allowed(True)
+                time.sleep(self.idle_check_secs)
+                continue
+
+            for model, slice_secs in self._compute_slices(active_models):
+                if self.stop_flag:
+                    break
+                self._run_slice(models, model, slice_secs)
+
+        for model in list(self.models.values()):
+            model.set_allowed(True)
+
+    def _compute_slices(self, active_models: List[_ArbitratedModel]) -> List:
+        weights = [
+            max(model.duty_cycle, 0) * max(model.demand, self.min_demand)
+            for model in active_models
+        ]
+        total_weight = sum(weights)
+
+        slices = []
+        for model, weight in zip(active_models, weights):
+            slice_secs = self.period_secs / len(active_models)
+            if total_weight > 0:
+                slice_secs = self.period_secs * weight / total_weight
+
+            if model.min_slice_secs > 0:
+                num_batches = max(1, math.ceil(slice_secs / model.min_slice_secs))
+                slice_secs = num_batches * model.min_slice_secs
+
+            slices.append((model, slice_secs))
+
+        return slices
+
+    def _run_slice(
+        self, models: List[_ArbitratedModel], model: _ArbitratedModel, slice_secs: float
+    ):
+        for other_model in models:
+            if other_model is not model:
+                other_model.set_allowed(False)
+        model.set_allowed(True)
+
+        # get_shares collects from the main thread, so both sides hold the lock
+        with self.lock:
+            model.collect_busy_secs()
+        t0 = time.time()
+        while time.time() - t0 < slice_secs:
+            if not model.has_pending():
+                # give the rest of the slice to the next model
+                break
+            time.sleep(min(self.idle_check_secs, slice_secs))
+        elapsed_secs = max(time.time() - t0, 1e-6)
+
+        with self.lock:
+            busy_secs = model.collect_busy_secs()
+        used_fraction = min(1.0, busy_secs / elapsed_secs)
+        if model.has_pending():
+            # still backlogged, it would have used more
+            used_fraction = 1.0
+        model.demand = (
+            1 - self.demand_smoothing
+        ) * model.demand + self.demand_smoothing * used_fraction
@@ -3,24 +3,32 @@ import logging
 import pickle
 import time
 from abc import ABC, abstractmethod
-from typing import Dict
+from typing import Dict, List
 
 import numpy as np
 import requests
-from configs import GLOBAL_QUEUE_NAMES, NXS_CONFIG
+from configs import BACKEND_INTERNAL_CONFIG, GLOBAL_QUEUE_NAMES, NXS_CONFIG
+from main_processes.backend.batching import REQUEST_DEADLINE_KEY
+from main_processes.backend.fair_queue import BackendSessionFairQueue
+from main_processes.backend.flow_control import BackendInFlightCredits
+from main_processes.backend.stage_runtime import BackendStageWaiter
 from nxs_libs.interface.backend.dispatcher import (
     BackendDispatcherFactory,
     BackendDispatcherType,
+    get_request_sla,
+    get_request_weight,
 )
 from nxs_libs.interface.backend.input import (
     BackendInputInterface,
     BackendInputInterfaceFactory,
+    BackendInputInterfaceType,
 )
 from nxs_libs.interface.backend.output import BackendOutputInterfaceFactory
 from nxs_libs.queue import NxsQueuePusherFactory, NxsQueueType
-from nxs_types.infer import NxsInferRequest
+from nxs_libs.queue.nxs_redis_queue import NxsRedisMultiTopicQueuePuller
+from nxs_types.infer import NxsInferRequest, NxsInferStatus
 from nxs_types.log import NxsBackendCmodelThroughputLog
-from nxs_types.model import ModelInput, NxsModel
+from nxs_types.model import ModelInput, NxsModel, ProfileUnit
 from nxs_types.nxs_args import NxsBackendArgs
 from nxs_types.scheduling_data import NxsSchedulingPerComponentModelPlan
 from nxs_utils.logging import NxsLogLevel, setup_logger, write_log
@@ -60,6 +68,13 @@ class BackendInputProcess(ABC):
         self.extra_params = extra_params
         self.preprocessing_fn_path = preprocessing_fn_path
 
+        # only set for the first component model of a cmodel, see BackendInFlightCredits
+        self.in_flight_credits: BackendInFlightCredits = extra_params.get(
+            "in_flight_credits", None
+        )
+        # manager queue co-located cmodels hand their requests over through, if any
+        self.local_input_queue = extra_params.get("local_input_queue", None)
+
         self.p = None
         self.preproc_fn = None
         self.preproc_extra_params = {}
@@ -71,7 +86,8 @@ class BackendInputProcess(ABC):
         except:
             pass
 
-        self.log_pusher = create_queue_pusher_from_args(args, NxsQueueType.REDIS)
+        # created in the input process, redis clients cannot be sent to it
+        self.log_pusher = None
 
         self.log_prefix = "{}_INPUT".format(component_model.model_uuid)
         # self.log_level = os.environ.get(NXS_CONFIG.LOG_LEVEL, NxsLogLevel.INFO)
@@ -94,6 +110,10 @@ class BackendInputProcess(ABC):
             self.process_update_shared_list.append(("REMOVE_SESSION", session_uuid))
             self.input_interface_args_dict.pop(session_uuid)
 
+    def update_profile(self, profile: List[ProfileUnit]):
+        # profile of the component model measured on this backend
+        self.process_update_shared_list.append(("UPDATE_PROFILE", profile))
+
     # def _log(self, message):
     #     write_log(self.log_prefix, message, self.log_level)
 
@@ -107,12 +127,15 @@ class BackendInputProcess(ABC):
         self.p.start()
 
     def _run(self):
+        self.log_pusher = create_queue_pusher_from_args(self.args, NxsQueueType.REDIS)
+
+        # redis sessions are all pulled by one shared puller, see _create_session_input
+        self.session_puller: NxsRedisMultiTopicQueuePuller = None
+
         self.input_dict: Dict[str, BackendInputInterface] = {}
         for session_uuid in self.input_interface_args_dict:
-            self.input_dict[
-                session_uuid
-            ] = BackendInputInterfaceFactory.create_input_interface(
-                **(self.input_interface_args_dict[session_uuid])
+            self.input_dict[session_uuid] = self._create_session_input(
+                self.input_interface_args_dict[session_uuid]
             )
             self.input_dict[session_uuid].set_num_partitions(1)
 
@@ -135,10 +158,22 @@ class BackendInputProcess(ABC):
 
         # set max buffer size for input interface
         max_queue_size = max(1, int(1.0 / max_latency * max_batch_size))
+        if self.in_flight_credits is not None:
+            # requests pulled but not in flight cannot be taken by other replicas
+            max_queue_size = min(max_queue_size, self.in_flight_credits.max_credits)
+        self.max_queue_size = max_queue_size
 
         for session_uuid in self.input_dict:
             self.input_dict[session_uuid].set_buf_size(max_queue_size)
 
+        self.local_input: BackendInputInterface = None
+        if self.local_input_queue is not None:
+            self.local_input = BackendInputInterfaceFactory.create_input_interface(
+                type=BackendInputInterfaceType.LOCAL_QUEUE,
+                queue=self.local_input_queue,
+                buf_size=max_queue_size,
+            )
+
         # setup dispatcher
         self.max_batch_size = max_batch_size
         self.max_latency = max_latency
@@ -172,6 +207,16 @@ class BackendInputProcess(ABC):
 
         delaying_batches = []
 
+        # task_uuid -> unpickled carry_over_extras of requests still held by the
+        # fair queue or the dispatcher, so they are only (un)pickled once per stage
+        self.pending_extras: Dict[str, Dict] = {}
+
+        # sessions are admitted to the dispatcher in proportion to their weights, a
+        # bursty session queues up here instead of delaying everyone else
+        self.fair_queue = BackendSessionFairQueue()
+
+        waiter = BackendStageWaiter(self._get_inputs())
+
         to_exit = False
         tt0 = time.time()
         requests_count = 0
@@ -194,21 +239,28 @@ class BackendInputProcess(ABC):
                         session_uuid = cmd_args
 
                         if session_uuid in self.input_dict:
-                            incoming_batches.extend(
-                                self.input_dict[session_uuid].close_and_get_remains()
-                            )
+                            remains = self.input_dict[
+                                session_uuid
+                            ].close_and_get_remains()
+                            remains.extend(self.fair_queue.remove_session(session_uuid))
+                            self._acquire_credits(remains)
+                            incoming_batches.extend(remains)
                             self.input_dict.pop(session_uuid)
+                            waiter.set_inputs(self._get_inputs())
                             self._log("Removed session {}".format(session_uuid))
                     elif cmd == "ADD_SESSION":
                         input_args = cmd_args
                         session_uuid = input_args["session_uuid"]
                         if session_uuid not in self.input_dict:
-                            self.input_dict[
-                                session_uuid
-                            ] = BackendInputInterfaceFactory.create_input_interface(
-                                **input_args
+                            self.input_dict[session_uuid] = self._create_session_input(
+                                input_args
                             )
+                            waiter.set_inputs(self._get_inputs())
                             self._log("Added session {}".format(session_uuid))
+                    elif cmd == "UPDATE_PROFILE":
+                        self.component_model.profile = cmd_args
+                        self.dispatcher.update_profile(cmd_args)
+                        self._log("Updated profile")
                     else:
                         print(cmd, cmd_args)
 
@@ -250,6 +302,13 @@ class BackendInputProcess(ABC):
                         latency_mean=summary_log["latency"]["mean"],
                         latency_min=summary_log["latency"]["min"],
                         latency_max=summary_log["latency"]["max"],
+                        sla_miss_rate=summary_log.get("sla_miss_rate", 0),
+                        extra={
+                            "batch_size_hist": json.dumps(
+                                summary_log.get("batch_size_hist", {})
+                            ),
+                            "session_stats": json.dumps(self.fair_queue.pop_stats()),
+                        },
                     )
 
                     self.global_dispatcher_output_shared_list.append(tp_log)
@@ -258,37 +317,56 @@ class BackendInputProcess(ABC):
 
                 dispatcher_update_t0 = time.time()
 
-            # check if there are too many requests queuing in preprocessing processes
+            # check if there are too many requests queuing in preprocessing processes,
+            # credits already bound what is queued in all later stages
             if (
-                self.output.get_num_buffered_items(self.next_topic_name)
+                self.in_flight_credits is None
+                and self.output.get_num_buffered_items(self.next_topic_name)
                 >= max_queue_size
             ):
                 time.sleep(max_latency / 2)
 
-            new_requests = []
+            has_new_requests = False
             if self.stop_flag.value:
+                if self.session_puller is not None:
+                    # nothing is in flight once its readers are stopped
+                    self.session_puller.stop()
                 for session_uuid in self.input_dict:
                     new_requests = self.input_dict[session_uuid].close_and_get_remains()
-                    incoming_batches.extend(new_requests)
+                    self._enqueue_requests(session_uuid, new_requests)
+                if self.local_input is not None:
+                    self._enqueue_local_requests(
+                        self.local_input.close_and_get_remains()
+                    )
                 to_exit = True
             else:
                 for session_uuid in self.input_dict:
+                    if self.fair_queue.get_num_queued(session_uuid) >= max_queue_size:
+                        # leave the rest buffered upstream
+                        continue
                     new_requests = self.input_dict[session_uuid].get_batch()
-                    incoming_batches.extend(new_requests)
+                    self._enqueue_requests(session_uuid, new_requests)
+                    has_new_requests = has_new_requests or len(new_requests) > 0
 
-            for request in new_requests:
-                data: NxsInferRequest = request
+                if self.local_input is not None:
+                    new_requests = self.local_input.get_batch()
+                    self._enqueue_local_requests(new_requests)
+                    has_new_requests = has_new_requests or len(new_requests) > 0
 
-                carry_over_extras = {}
-                if data.carry_over_extras is not None:
-                    try:
-                        carry_over_extras = pickle.loads(data.carry_over_extras)
-                    except:
-                        carry_over_extras = {}
-
-                self.request_entering(carry_over_extras)
-
-                data.carry_over_extras = pickle.dumps(carry_over_extras)
+            if to_exit:
+                admitted = self.fair_queue.pop_all()
+            else:
+                # admit only what the dispatcher can hold and the later stages can
+                # finish in time, the rest waits its turn
+                num_held = len(self.pending_extras) - self.fair_queue.get_num_queued()
+                num_admitted = max(0, max_queue_size - num_held)
+                if self.in_flight_credits is not None:
+                    num_admitted = min(
+                        num_admitted, self.in_flight_credits.get_num_available()
+                    )
+                admitted = self.fair_queue.pop(num_admitted)
+            self._acquire_credits(admitted)
+            incoming_batches.extend(admitted)
 
             # trigger dispatcher to rearrange execution orders
             dispatching_result = self.dispatcher.dispatch(incoming_batches)
@@ -296,14 +374,29 @@ class BackendInputProcess(ABC):
             # add delayed requests into delaying_batches
             delaying_batches.extend(dispatching_result.to_delay)
 
-            # TODO: dropping requests is not supported yet - we should forward these requests directly to output process
+            if dispatching_result.to_drop:
+                # preprocessors forward FAILED requests straight to the output process
+                for request in dispatching_result.to_drop:
+                    data: NxsInferRequest = request
+                    carry_over_extras = self._pop_pending_extras(data)
+                    error_msgs = carry_over_extras.setdefault(
+                        BACKEND_INTERNAL_CONFIG.TASK_ERROR_MSGS, []
+                    )
+                    error_msgs.append(
+                        f"{self.component_model.model_uuid}: Dropped, deadline cannot be met"
+                    )
+                    self.request_exiting(carry_over_extras)
+                    data.status = NxsInferStatus.FAILED
+                    data.carry_over_extras = pickle.dumps(carry_over_extras)
+
+                self.output.put_batch(self.next_topic_name, dispatching_result.to_drop)
 
             requests_count += len(dispatching_result.to_schedule)
 
             if dispatching_result.to_schedule:
                 for request in dispatching_result.to_schedule:
                     data: NxsInferRequest = request
-                    carry_over_extras = pickle.loads(data.carry_over_extras)
+                    carry_over_extras = self._pop_pending_extras(data)
                     self.request_exiting(carry_over_extras)
                     data.carry_over_extras = pickle.dumps(carry_over_extras)
 
@@ -336,8 +429,13 @@ class BackendInputProcess(ABC):
             if to_exit:
                 break
 
-            if not incoming_batches:
-                time.sleep(0.0025)
+            if not incoming_batches and not has_new_requests:
+                # held requests are released as the next stages free up, keep checking
+                # on them, otherwise sleep until new requests arrive
+                timeout = None
+                if self.pending_extras or delaying_batches:
+                    timeout = waiter.poll_secs
+                waiter.wait(timeout)
 
         # trigger next process to stop
         self.next_process_stop_flag.value = True
@@ -354,6 +452,93 @@ class BackendInputProcess(ABC):
         except:
             pass
 
+    def _enqueue_requests(self, session_uuid: str, requests: List[NxsInferRequest]):
+        if not requests:
+            return
+
+        if not self.fair_queue.has_session(session_uuid):
+            # all requests of a session carry the same params
+            self.fair_queue.add_session(session_uuid, get_request_weight(requests[0]))
+
+        for request in requests:
+            data: NxsInferRequest = request
+
+            carry_over_extras = {}
+            if data.carry_over_extras is not None:
+                try:
+                    carry_over_extras = pickle.loads(data.carry_over_extras)
+                except:
+                    carry_over_extras = {}
+
+            # before queuing, so the time spent waiting counts in latency and deadline
+            self.request_entering(carry_over_extras)
+
+            if REQUEST_DEADLINE_KEY not in carry_over_extras:
+                # set once by the first component model, covers the whole pipeline
+                sla = get_request_sla(data)
+                if sla > 0:
+                    input_t0 = carry_over_extras.get("input_t0", time.time())
+                    deadline = input_t0 + sla / 1000.0
+                    carry_over_extras[REQUEST_DEADLINE_KEY] = deadline
+
+            self.pending_extras[data.task_uuid] = carry_over_extras
+
+        self.fair_queue.push(session_uuid, requests)
+
+    def _enqueue_local_requests(self, requests: List[NxsInferRequest]):
+        # all sessions share the local queue
+        session_uuid2requests: Dict[str, List[NxsInferRequest]] = {}
+        for request in requests:
+            session_uuid2requests.setdefault(request.session_uuid, []).append(request)
+
+        for session_uuid, session_requests in session_uuid2requests.items():
+            self._enqueue_requests(session_uuid, session_requests)
+
+    def _get_inputs(self) -> List[BackendInputInterface]:
+        inputs = list(self.input_dict.values())
+        if self.local_input is not None:
+            inputs.append(self.local_input)
+        return inputs
+
+    def _acquire_credits(self, requests: List[NxsInferRequest]):
+        # every request let into the pipeline leaves it through the last output process
+        if self.in_flight_credits is not None:
+            self.in_flight_credits.acquire(len(requests))
+
+    def _create_session_input(self, input_args: Dict) -> BackendInputInterface:
+        if input_args["type"] != BackendInputInterfaceType.REDIS:
+            return BackendInputInterfaceFactory.create_input_interface(**input_args)
+
+        if self.session_puller is None:
+            puller_args = {
+                key: value
+                for key, value in input_args.items()
+                if key not in ["type", "topic", "session_uuid"]
+            }
+            self.session_puller = NxsRedisMultiTopicQueuePuller(**puller_args)
+
+        return BackendInputInterfaceFactory.create_input_interface(
+            type=BackendInputInterfaceType.REDIS_SESSION,
+            puller=self.session_puller,
+            topic=input_args["topic"],
+            session_uuid=input_args["session_uuid"],
+        )
+
+    def get_request_deadline(self, request: NxsInferRequest) -> float:
+        # absolute deadline of a request held by the dispatcher, None if it has no sla
+        carry_over_extras = self.pending_extras.get(request.task_uuid, {})
+        return carry_over_extras.get(REQUEST_DEADLINE_KEY)
+
+    def _pop_pending_extras(self, request: NxsInferRequest) -> Dict:
+        carry_over_extras = self.pending_extras.pop(request.task_uuid, None)
+        if carry_over_extras is None:
+            # e.g. leftovers of a removed session
+            carry_over_extras = {}
+            if request.carry_over_extras is not None:
+                carry_over_extras = pickle.loads(request.carry_over_extras)
+            self.request_entering(carry_over_extras)
+        return carry_over_extras
+
     @abstractmethod
     def request_entering(self, extra_metadata: Dict):
         raise NotImplementedError
@@ -1,9 +1,12 @@
 import copy
+import json
 import logging
+import math
 import multiprocessing
 import os
 import shutil
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing import Process, Value
 from multiprocessing.managers import SyncManager
 from threading import Lock, Thread
@@ -13,6 +16,8 @@ from configs import *
 from lru import LRU
 from main_processes.backend.batcher_process import BackendBatcherProcess
 from main_processes.backend.compute_process_onnx import BackendComputeProcessOnnx
+from main_processes.backend.flow_control import BackendInFlightCredits
+from main_processes.backend.gpu_arbiter import BackendComputeStats, BackendGpuArbiter
 from main_processes.backend.input_process import BackendInputProcess
 from main_processes.backend.input_process_basic import BackendBasicInputProcess
 from main_processes.backend.output_process import (
@@ -27,21 +32,36 @@ from nxs_libs.interface.backend.global_dispatcher import (
     MiniDispatcherUpdateData,
 )
 from nxs_libs.interface.backend.input import BackendInputInterfaceType
-from nxs_libs.storage_cache import NxsBaseStorageCache, NxsLocalStorageCache
+from nxs_libs.interface.backend.output import (
+    BackendOutputInterfaceFactory,
+    BackendOutputInterfaceType,
+)
+from nxs_libs.serialization import decode_if_encoded
+from nxs_libs.shared_memory import NxsSharedMemoryArena, get_tensor_nbytes
+from nxs_libs.storage_cache import NxsBaseStorageCache, NxsPersistentStorageCache
 from nxs_types.backend import GpuInfo, NxsBackendType
 from nxs_types.log import NxsBackendThroughputLog
 from nxs_types.message import *
-from nxs_types.model import Framework, NxsCompositoryModel, NxsModel
+from nxs_types.model import Framework, NxsCompositoryModel, NxsModel, ProfileUnit
 from nxs_types.nxs_args import NxsBackendArgs
 from nxs_types.scheduling_data import (
     NxsSchedulingPerComponentModelPlan,
     NxsSchedulingPerCompositorymodelPlan,
     NxsUnschedulingPerCompositoryPlan,
 )
-from nxs_utils.common import create_dir_if_needed, delete_and_create_dir
+from nxs_utils.common import (
+    create_dir_if_needed,
+    delete_and_create_dir,
+    delete_dir,
+    link_or_copy_file,
+)
 from nxs_utils.logging import setup_logger
 from nxs_utils.nxs_helper import *
 
+# this module is preloaded by the forkserver, stage processes forked from it inherit
+# the logging setup
+setup_logger()
+
 
 class InferRuntimeInfo:
     def __init__(
@@ -53,6 +73,8 @@ class InferRuntimeInfo:
         stop_flags: List[Value],
         infer_flags: List[Value],
         shared_queues: List,
+        shared_memory_arenas: List = [],
+        in_flight_credits: BackendInFlightCredits = None,
     ) -> None:
         self.cmodel = cmodel
         self.cmodel_plan = cmodel_plan
@@ -61,6 +83,10 @@ class InferRuntimeInfo:
         self.stop_flags = stop_flags
         self.infer_flags = infer_flags
         self.shared_list = shared_queues
+        self.shared_memory_arenas = shared_memory_arenas
+        self.in_flight_credits = in_flight_credits
+        # set once a dead stage process has been reported
+        self.has_dead_processes = False
 
 
 class NxsBackendBaseProcess(ABC):
@@ -100,6 +126,33 @@ class NxsBackendBaseProcess(ABC):
 
         # store a map from cmodel_uuid -> infer_process (input, compute, output)
         self.infer_runtime_map: Dict[str, InferRuntimeInfo] = {}
+        self.check_processes_period_secs = 5
+
+        # compute processes push (model_uuid, List[ProfileUnit]) measured on this
+        # backend after loading their models, forwarded with the next stats report
+        self.measured_profiles_queue = multiprocessing.Queue()
+        # model_uuid -> measured profile, used instead of the registered one by the
+        # cmodels deployed here (dispatchers, gpu arbiter, in-flight credits)
+        self.measured_profiles: Dict[str, List[ProfileUnit]] = {}
+        # model_uuid -> measured profile not reported to the scheduler yet
+        self.unreported_measured_profiles: Dict[str, List[ProfileUnit]] = {}
+        self.measured_profiles_lock = Lock()
+
+        # co-located cmodels share the gpu in time slices sized by their duty cycles
+        self.gpu_arbiter = None
+        if self.use_gpu and self.args.enable_gpu_time_slicing:
+            self.gpu_arbiter = BackendGpuArbiter(
+                period_secs=self.args.gpu_time_slice_period_ms / 1000.0
+            )
+            self.gpu_arbiter.start()
+
+        # cmodels running here hand requests for each other over through manager
+        # queues instead of redis, see BackendOutputToLocalFirst. Both dicts live in
+        # the multiprocessing manager and are created with the first cmodel.
+        # cmodel_uuid -> queue of its input process
+        self.local_input_queues = None
+        # "{cmodel_uuid}_{session_uuid}" -> cmodel_uuid, for sessions it serves
+        self.local_session_topics = None
 
         # setup global dispatcher
         self.global_dispatcher = BasicGlobalDispatcher(
@@ -193,6 +246,7 @@ class NxsBackendBaseProcess(ABC):
         from multiprocessing import Manager, Process, Value
 
         last_alive_ts = time.time()
+        check_processes_t0 = time.time()
 
         with Manager() as manager:
             while True:
@@ -234,11 +288,21 @@ class NxsBackendBaseProcess(ABC):
                         self.global_dispatcher_lock.acquire()
                         self._process_unscheduling_plan(msg.plan, manager)
                         self.global_dispatcher_lock.release()
+                    elif msg.type == NxsMsgType.APPLY_PLAN_DELTA:
+                        self.global_dispatcher_lock.acquire()
+                        self._process_plan_delta(msg, manager)
+                        self.global_dispatcher_lock.release()
 
                 if time.time() - last_alive_ts > 30 * 60:
                     self._log("Main process is still alive...")
                     last_alive_ts = time.time()
 
+                self._collect_measured_profiles()
+
+                if time.time() - check_processes_t0 > self.check_processes_period_secs:
+                    self._check_stage_processes(manager)
+                    check_processes_t0 = time.time()
+
                 if not msgs:
                     time.sleep(0.1)
 
@@ -291,9 +355,7 @@ class NxsBackendBaseProcess(ABC):
                 time.time() - t1
                 > self.global_dispatcher_report_to_scheduler_period_secs
             ):
-                backend_report = (
-                    self.global_dispatcher.generate_backend_stats_report_in_json_str()
-                )
+                backend_report = self._generate_backend_stats_report()
                 self.queue_pusher.push(
                     GLOBAL_QUEUE_NAMES.SCHEDULER,
                     NxsMsgBackendStatsReport(
@@ -328,6 +390,46 @@ class NxsBackendBaseProcess(ABC):
 
             t0 = time.time()
 
+    def _generate_backend_stats_report(self) -> str:
+        report = json.loads(
+            self.global_dispatcher.generate_backend_stats_report_in_json_str()
+        )
+
+        # measured throughput, latency and sla misses of each deployed cmodel
+        try:
+            cmodel_logs = self.global_dispatcher.generate_backend_monitoring_log()
+            report["cmodel_logs"] = [log.dict() for log in cmodel_logs]
+        except Exception as e:
+            self._log(f"Failed to collect cmodel logs: {e}")
+
+        with self.measured_profiles_lock:
+            measured_profiles = {
+                model_uuid: [unit.dict() for unit in profile]
+                for model_uuid, profile in self.unreported_measured_profiles.items()
+            }
+            self.unreported_measured_profiles = {}
+
+        if measured_profiles:
+            backend_type = NxsBackendType.GPU if self.use_gpu else NxsBackendType.CPU
+            report["backend_type"] = backend_type.value
+            report["measured_profiles"] = measured_profiles
+
+        if self.gpu_arbiter is not None:
+            # cmodel_uuid -> duty cycle and the share of gpu time it actually got
+            report["gpu_shares"] = self.gpu_arbiter.get_shares()
+
+        return json.dumps(report)
+
+    def _process_plan_delta(self, msg: NxsMsgApplyPlanDelta, mp_manager: SyncManager):
+        self._process_unscheduling_plan(msg.unscheduling, mp_manager)
+        self._process_scheduling_plan_v2(msg.scheduling, mp_manager)
+
+        # let the scheduler know this version is in place
+        self.queue_pusher.push(
+            GLOBAL_QUEUE_NAMES.SCHEDULER,
+            NxsMsgAckPlanDelta(backend_name=self.backend_name, version=msg.version),
+        )
+
     def _process_unscheduling_plan(
         self, plan: NxsUnschedulingPerBackendPlan, mp_manager: SyncManager
     ):
@@ -342,10 +444,17 @@ class NxsBackendBaseProcess(ABC):
             ].processes[0]
             for to_undeploy_session_uuid in cmodel_plan.session_uuid_list:
                 first_input_process.remove_session_uuid(to_undeploy_session_uuid)
+            self._unregister_local_sessions(cmodel_uuid, cmodel_plan.session_uuid_list)
 
             if first_input_process.input_interface_args_dict:
                 continue
 
+            local_input_queue = self._unregister_local_input(cmodel_uuid)
+
+            if self.gpu_arbiter is not None:
+                # let it drain its pending requests without waiting for a slice
+                self.gpu_arbiter.remove_model(cmodel_uuid)
+
             infer_runtime = self.infer_runtime_map[cmodel_uuid]
             infer_runtime.stop_flags[0].value = True
 
@@ -358,8 +467,18 @@ class NxsBackendBaseProcess(ABC):
             for pid, process in enumerate(infer_runtime.processes):
                 process.terminate()
 
+            # credits of requests that were still in the stages are gone with them
+            if infer_runtime.in_flight_credits is not None:
+                infer_runtime.in_flight_credits.reset()
+
+            for arena in infer_runtime.shared_memory_arenas:
+                arena.unlink()
+
             self._log(f"Stopped processes - model {cmodel_uuid}")
 
+            if local_input_queue is not None:
+                self._forward_local_leftovers(cmodel_uuid, local_input_queue)
+
             for component_model in self.infer_runtime_map[
                 cmodel_uuid
             ].cmodel.component_models:
@@ -369,7 +488,10 @@ class NxsBackendBaseProcess(ABC):
                 )
                 # print(f"to_delete_folder: {component_model_dir_path}")
                 self._log(f"to_delete_folder: {component_model_dir_path}")
-                shutil.rmtree(component_model_dir_path)
+                # keep the unpacked model around in case it gets redeployed soon
+                self.model_store_cache.release_model_dir(
+                    component_model.model_uuid, component_model_dir_path
+                )
 
             self.global_dispatcher.remove_state(cmodel_uuid)
 
@@ -584,7 +706,7 @@ class NxsBackendBaseProcess(ABC):
 
                 # create dispatcher for input_process
                 if idx == 0:
-                    dispatcher_args = {"type": BackendDispatcherType.BASIC_MONITORING}
+                    dispatcher_args = {"type": BackendDispatcherType.EDF}
                 else:
                     dispatcher_args = None
 
@@ -872,23 +994,35 @@ class NxsBackendBaseProcess(ABC):
                 cmodel_plan.model_uuid
             ].processes[0]
 
+            if self.gpu_arbiter is not None:
+                self.gpu_arbiter.set_duty_cycle(cmodel_plan.model_uuid, duty_cycle)
+
             # update session list if needed
-            for session_uuid in cmodel_plan.session_uuid_list:
-                if session_uuid in first_input_process.input_interface_args_dict:
-                    continue
+            input_interface_args_dict = first_input_process.input_interface_args_dict
+            new_session_uuids = [
+                session_uuid
+                for session_uuid in cmodel_plan.session_uuid_list
+                if session_uuid not in input_interface_args_dict
+            ]
+            if not new_session_uuids:
+                return
 
-                existing_session_uuid = list(
-                    first_input_process.input_interface_args_dict.keys()
-                )[0]
+            # all sessions of a cmodel share the same args except for their uuid
+            existing_session_uuid = next(iter(input_interface_args_dict))
+            for session_uuid in new_session_uuids:
                 input_interface_args = copy.deepcopy(
-                    first_input_process.input_interface_args_dict[existing_session_uuid]
+                    input_interface_args_dict[existing_session_uuid]
                 )
                 input_interface_args["session_uuid"] = session_uuid
                 first_input_process.add_session(input_interface_args)
+            self._register_local_sessions(cmodel_plan.model_uuid, new_session_uuids)
 
             return
 
+        deploy_t0 = time.time()
+
         cmodel = self._get_compository_model_from_plan(cmodel_plan)
+        self._apply_measured_profiles(cmodel)
 
         component_model_paths = []
         component_preprocessing_paths = []
@@ -901,21 +1035,21 @@ class NxsBackendBaseProcess(ABC):
             f"Downloading models and processing functions for cmodel {cmodel_plan.model_uuid} ..."
         )
 
-        for component_model in cmodel.component_models:
-            if not component_model.is_custom_model:
-                (
-                    component_model_path,
-                    preproc_path,
-                    postproc_path,
-                    transform_path,
-                ) = self._download_pipelined_component_model(component_model)
-            else:
-                (
-                    component_model_path,
-                    preproc_path,
-                    postproc_path,
-                    transform_path,
-                ) = self._download_arbitrary_component_model(component_model)
+        # component models are fetched and unpacked concurrently
+        with ThreadPoolExecutor(max_workers=len(cmodel.component_models)) as executor:
+            download_results = list(
+                executor.map(self._download_component_model, cmodel.component_models)
+            )
+
+        for component_model, download_result in zip(
+            cmodel.component_models, download_results
+        ):
+            (
+                component_model_path,
+                preproc_path,
+                postproc_path,
+                transform_path,
+            ) = download_result
 
             component_model_paths.append(component_model_path)
             component_preprocessing_paths.append(preproc_path)
@@ -927,13 +1061,23 @@ class NxsBackendBaseProcess(ABC):
                 # TODO: report back to scheduler
                 return
 
+        download_secs = time.time() - deploy_t0
         self._log(
-            f"Downloaded models and processing functions for cmodel {cmodel_plan.model_uuid}"
+            f"Downloaded models and processing functions for cmodel {cmodel_plan.model_uuid} in {download_secs:.2f} secs"
         )
 
         shared_queues = []
+        shared_memory_arenas = []
         stop_flags = []
         allow_inference_flags = []
+        compute_stats_list = []
+
+        # bounds the requests in flight over all component models of the cmodel
+        in_flight_credits = self._create_in_flight_credits(cmodel, cmodel_plan)
+
+        if self.args.enable_local_short_circuit and self.local_input_queues is None:
+            self.local_input_queues = mp_manager.dict()
+            self.local_session_topics = mp_manager.dict()
 
         # launch processes to run component models
         dispatcher_update_shared_list = mp_manager.list()
@@ -955,6 +1099,7 @@ class NxsBackendBaseProcess(ABC):
                     component_model_plan,
                     cmodel_plan.session_uuid_list,
                     shared_queues,
+                    shared_memory_arenas,
                     stop_flags,
                     allow_inference_flags,
                     component_model_paths,
@@ -965,6 +1110,9 @@ class NxsBackendBaseProcess(ABC):
                     dispatcher_update_shared_list,
                     global_dispatcher_input_shared_list,
                     global_dispatcher_output_shared_list,
+                    deploy_t0=deploy_t0,
+                    compute_stats_list=compute_stats_list,
+                    in_flight_credits=in_flight_credits,
                 )
             else:
                 self._deploy_arbitrary_component_model(
@@ -985,13 +1133,18 @@ class NxsBackendBaseProcess(ABC):
                     dispatcher_update_shared_list,
                     global_dispatcher_input_shared_list,
                     global_dispatcher_output_shared_list,
+                    in_flight_credits=in_flight_credits,
                 )
 
         self._log(f"Lauching processes for cmodel {cmodel_plan.model_uuid} ...")
         # start all processes
+        launch_t0 = time.time()
         for p in component_processes:
             p.run()
-        self._log(f"Launched processes for cmodel {cmodel_plan.model_uuid}")
+        launch_secs = time.time() - launch_t0
+        self._log(
+            f"Launched processes for cmodel {cmodel_plan.model_uuid} in {launch_secs:.2f} secs"
+        )
 
         infer_runtime_info = InferRuntimeInfo(
             cmodel,
@@ -1001,10 +1154,33 @@ class NxsBackendBaseProcess(ABC):
             stop_flags,
             allow_inference_flags,
             shared_queues,
+            shared_memory_arenas,
+            in_flight_credits,
         )
         self.infer_runtime_map[cmodel.main_model.model_uuid] = infer_runtime_info
 
-        self._log(f"Deployed cmodel {cmodel_plan.model_uuid}")
+        # other cmodels may hand requests over once the input process is running
+        first_input_process: BackendInputProcess = component_processes[0]
+        if first_input_process.local_input_queue is not None:
+            self.local_input_queues[
+                cmodel_plan.model_uuid
+            ] = first_input_process.local_input_queue
+            self._register_local_sessions(
+                cmodel_plan.model_uuid, cmodel_plan.session_uuid_list
+            )
+
+        if self.gpu_arbiter is not None:
+            self.gpu_arbiter.add_model(
+                cmodel,
+                cmodel_plan,
+                duty_cycle,
+                allow_inference_flags,
+                compute_stats_list,
+            )
+
+        # model load time is reported by the compute processes once they are ready
+        deploy_secs = time.time() - deploy_t0
+        self._log(f"Deployed cmodel {cmodel_plan.model_uuid} in {deploy_secs:.2f} secs")
 
     def _deploy_pipelined_component_model(
         self,
@@ -1015,6 +1191,7 @@ class NxsBackendBaseProcess(ABC):
         component_model_plan: NxsSchedulingPerComponentModelPlan,
         session_uuid_list: List[str],
         shared_queues: List,
+        shared_memory_arenas: List,
         stop_flags: List,
         allow_inference_flags: List,
         component_model_paths: List,
@@ -1025,10 +1202,24 @@ class NxsBackendBaseProcess(ABC):
         dispatcher_update_shared_list,
         global_dispatcher_input_shared_list,
         global_dispatcher_output_shared_list,
+        deploy_t0: float = 0,
+        compute_stats_list: List = None,
+        in_flight_credits: BackendInFlightCredits = None,
     ):
         # create shared_output_queue as shortcut for failed requests
         shared_output_queue = multiprocessing.Queue()
 
+        # tensors between preprocessors -> compute -> output go through shared memory
+        compute_input_arena = self._create_compute_input_arena(
+            component_model, component_model_plan
+        )
+        compute_output_arena = self._create_compute_output_arena(
+            component_model, component_model_plan
+        )
+        for arena in [compute_input_arena, compute_output_arena]:
+            if arena is not None:
+                shared_memory_arenas.append(arena)
+
         # create input_inf for input_process
         input_process = self._deploy_input_process(
             mp_manager,
@@ -1042,8 +1233,15 @@ class NxsBackendBaseProcess(ABC):
             dispatcher_update_shared_list,
             global_dispatcher_input_shared_list,
             global_dispatcher_output_shared_list,
+            in_flight_credits=in_flight_credits,
+        )
+
+        num_compute_instances = self._get_num_compute_instances(component_model)
+        is_batcher_enabled = self._is_batcher_enabled(
+            component_model, component_model_plan
         )
 
+        # preprocessors feed every compute instance, or the batcher which does it
         (
             preprocessor_processes,
             compute_input_queues,
@@ -1055,9 +1253,29 @@ class NxsBackendBaseProcess(ABC):
             stop_flags,
             shared_output_queue,
             component_preprocessing_paths[model_idx],
+            compute_input_arena,
+            num_output_queues=1 if is_batcher_enabled else num_compute_instances,
         )
 
-        compute_process = self._deploy_pipelined_compute_process(
+        batcher_processes = []
+        if is_batcher_enabled:
+            (
+                batcher_process,
+                compute_input_queues,
+                stop_compute_flags,
+            ) = self._deploy_batcher_process(
+                component_model,
+                component_model_plan,
+                shared_queues,
+                stop_flags,
+                compute_input_queues[0],
+                stop_compute_flags,
+                compute_input_arena,
+                num_output_queues=num_compute_instances,
+            )
+            batcher_processes.append(batcher_process)
+
+        compute_processes = self._deploy_pipelined_compute_process(
             component_model,
             component_model_plan,
             shared_queues,
@@ -1068,6 +1286,10 @@ class NxsBackendBaseProcess(ABC):
             allow_inference_flags,
             component_model_paths[model_idx],
             component_transforming_paths[model_idx],
+            compute_input_arena,
+            compute_output_arena,
+            deploy_t0=deploy_t0,
+            compute_stats_list=compute_stats_list,
         )
 
         output_processes = self._deploy_output_process(
@@ -1080,13 +1302,17 @@ class NxsBackendBaseProcess(ABC):
             shared_output_queue,
             dispatcher_update_shared_list,
             component_postprocessing_paths[model_idx],
+            compute_output_arena,
+            in_flight_credits=in_flight_credits,
         )
 
         component_processes.append(input_process)
         for p in preprocessor_processes:
             component_processes.append(p)
-        # component_processes.append(batcher_process)
-        component_processes.append(compute_process)
+        for p in batcher_processes:
+            component_processes.append(p)
+        for p in compute_processes:
+            component_processes.append(p)
         # component_processes.append(output_process)
         for p in output_processes:
             component_processes.append(p)
@@ -1112,6 +1338,7 @@ class NxsBackendBaseProcess(ABC):
         dispatcher_update_shared_list,
         global_dispatcher_input_shared_list,
         global_dispatcher_output_shared_list,
+        in_flight_credits: BackendInFlightCredits = None,
     ):
         # create shared_output_queue as shortcut for failed requests
         shared_output_queue = multiprocessing.Queue()
@@ -1129,6 +1356,7 @@ class NxsBackendBaseProcess(ABC):
             dispatcher_update_shared_list,
             global_dispatcher_input_shared_list,
             global_dispatcher_output_shared_list,
+            in_flight_credits=in_flight_credits,
         )
 
         model_process = self._deploy_arbitrary_model_process(
@@ -1150,6 +1378,7 @@ class NxsBackendBaseProcess(ABC):
             shared_output_queue,
             dispatcher_update_shared_list,
             component_postprocessing_paths[model_idx],
+            in_flight_credits=in_flight_credits,
         )
 
         component_processes.append(input_process)
@@ -1172,6 +1401,7 @@ class NxsBackendBaseProcess(ABC):
         dispatcher_update_shared_list: List,
         global_dispatcher_input_shared_list: List,
         global_dispatcher_output_shared_list: List,
+        in_flight_credits: BackendInFlightCredits = None,
     ):
         # create input_inf for input_process
         if model_idx == 0:
@@ -1210,7 +1440,7 @@ class NxsBackendBaseProcess(ABC):
 
         # create dispatcher for input_process
         if model_idx == 0:
-            dispatcher_args = {"type": BackendDispatcherType.BASIC_MONITORING}
+            dispatcher_args = {"type": BackendDispatcherType.EDF}
         else:
             dispatcher_args = None
 
@@ -1223,6 +1453,17 @@ class NxsBackendBaseProcess(ABC):
         stop_preprocessors_flag = Value("i", False)
         stop_flags.append(stop_preprocessors_flag)
 
+        local_input_queue = None
+        if model_idx == 0 and self.local_input_queues is not None:
+            # what does not fit goes through redis, where other replicas can take it.
+            # Items are whole batches, about batch_size requests each.
+            max_queue_size = 2 * component_model_plan.batch_size
+            if in_flight_credits is not None:
+                max_queue_size = in_flight_credits.max_credits
+            local_input_queue = mp_manager.Queue(
+                maxsize=max(2, max_queue_size // component_model_plan.batch_size)
+            )
+
         input_process = BackendBasicInputProcess(
             args=self.args,
             component_model=component_model,
@@ -1243,6 +1484,10 @@ class NxsBackendBaseProcess(ABC):
             if model_idx == 0
             else None,
             process_update_shared_list=mp_manager.list(),
+            extra_params={
+                "in_flight_credits": in_flight_credits if model_idx == 0 else None,
+                "local_input_queue": local_input_queue,
+            },
         )
 
         return input_process
@@ -1255,6 +1500,8 @@ class NxsBackendBaseProcess(ABC):
         stop_flags: List,
         shared_output_queue,
         preprocessing_fn_path,
+        compute_input_arena: NxsSharedMemoryArena = None,
+        num_output_queues: int = 1,
     ):
         stop_preprocessors_flag = stop_flags[-1]
 
@@ -1265,16 +1512,21 @@ class NxsBackendBaseProcess(ABC):
         }
 
         stop_compute_flags = []
-        compute_input_queues = []
+        # compute_input_queues[i] holds the queues of all preprocessors to output i
+        compute_input_queues = [[] for _ in range(num_output_queues)]
 
         preprocessor_processes = []
         for pid in range(component_model.num_preprocessors):
-            shared_queue = multiprocessing.Queue()
-            shared_queues.append(shared_queue)
-            preprocessors_process_output_interface_args = {
-                "type": BackendInputInterfaceType.MULTIPROCESSING_QUEUE,
-                "mp_queue": shared_queues[-1],
-            }
+            output_queues = []
+            for idx in range(num_output_queues):
+                shared_queue = multiprocessing.Queue()
+                shared_queues.append(shared_queue)
+                output_queues.append(shared_queue)
+                compute_input_queues[idx].append(shared_queue)
+
+            preprocessors_process_output_interface_args = self._get_queues_output_args(
+                output_queues, compute_input_arena
+            )
             error_output_interface_args = {
                 "type": BackendInputInterfaceType.MULTIPROCESSING_QUEUE,
                 "mp_queue": shared_output_queue,
@@ -1298,10 +1550,99 @@ class NxsBackendBaseProcess(ABC):
             preprocessor_processes.append(p)
 
             stop_compute_flags.append(stop_compute_flag)
-            compute_input_queues.append(shared_queue)
 
         return preprocessor_processes, compute_input_queues, stop_compute_flags
 
+    def _get_queues_output_args(
+        self, queues: List, arena: NxsSharedMemoryArena = None
+    ) -> Dict:
+        output_interface_args_list = []
+        for queue in queues:
+            output_interface_args = {
+                "type": BackendInputInterfaceType.MULTIPROCESSING_QUEUE,
+                "mp_queue": queue,
+            }
+            if arena is not None:
+                output_interface_args = {
+                    "type": BackendInputInterfaceType.SHARED_MEMORY,
+                    "mp_queue": queue,
+                    "arena": arena,
+                }
+            output_interface_args_list.append(output_interface_args)
+
+        if len(output_interface_args_list) == 1:
+            return output_interface_args_list[0]
+
+        # one queue per compute instance, items go to the least loaded one
+        return {
+            "type": BackendInputInterfaceType.LEAST_LOADED,
+            "output_interface_args_list": output_interface_args_list,
+        }
+
+    def _is_batcher_enabled(
+        self,
+        component_model: NxsModel,
+        component_model_plan: NxsSchedulingPerComponentModelPlan,
+    ) -> bool:
+        # the batcher stage only makes sense for models compute can run in batches
+        return (
+            component_model_plan.enable_batcher
+            and component_model.batching
+            and component_model.cross_requests_batching
+            and component_model.model_desc.transforming_name.lower() in ["", "none"]
+        )
+
+    def _deploy_batcher_process(
+        self,
+        component_model: NxsModel,
+        component_model_plan: NxsSchedulingPerComponentModelPlan,
+        shared_queues: List,
+        stop_flags: List,
+        preproc_output_queues: List,
+        stop_batcher_flags: List,
+        compute_input_arena: NxsSharedMemoryArena = None,
+        num_output_queues: int = 1,
+    ):
+        batcher_input_interface_args_list = []
+        for preproc_output_queue in preproc_output_queues:
+            batcher_input_interface_args = {
+                "type": BackendInputInterfaceType.MULTIPROCESSING_QUEUE,
+                "mp_queue": preproc_output_queue,
+            }
+            if compute_input_arena is not None:
+                batcher_input_interface_args = {
+                    "type": BackendInputInterfaceType.SHARED_MEMORY,
+                    "mp_queue": preproc_output_queue,
+                    "arena": compute_input_arena,
+                }
+            batcher_input_interface_args_list.append(batcher_input_interface_args)
+
+        output_queues = []
+        for _ in range(num_output_queues):
+            shared_queue = multiprocessing.Queue()
+            shared_queues.append(shared_queue)
+            output_queues.append(shared_queue)
+        batcher_output_interface_args = self._get_queues_output_args(
+            output_queues, compute_input_arena
+        )
+
+        stop_compute_flag = Value("i", False)
+        stop_flags.append(stop_compute_flag)
+
+        batcher_process = BackendBatcherProcess(
+            args=None,
+            component_model=component_model,
+            component_model_plan=component_model_plan,
+            input_interface_args_list=batcher_input_interface_args_list,
+            output_interface_args=batcher_output_interface_args,
+            stop_flags=stop_batcher_flags,
+            next_process_stop_flag=stop_compute_flag,
+        )
+
+        compute_input_queues = [[shared_queue] for shared_queue in output_queues]
+
+        return batcher_process, compute_input_queues, [stop_compute_flag]
+
     def _deploy_pipelined_compute_process(
         self,
         component_model: NxsModel,
@@ -1314,22 +1655,22 @@ class NxsBackendBaseProcess(ABC):
         allow_inference_flags: List,
         model_path: str,
         transform_path: str,
+        compute_input_arena: NxsSharedMemoryArena = None,
+        compute_output_arena: NxsSharedMemoryArena = None,
+        deploy_t0: float = 0,
+        compute_stats_list: List = None,
     ):
-        compute_process_input_interface_args_list = []
-        for compute_input_queue in compute_input_queues:
-            compute_process_input_interface_args = {
-                "type": BackendInputInterfaceType.MULTIPROCESSING_QUEUE,
-                "mp_queue": compute_input_queue,
-            }
-            compute_process_input_interface_args_list.append(
-                compute_process_input_interface_args
-            )
-
         shared_queues.append(shared_output_queue)
         compute_process_output_interface_args = {
             "type": BackendInputInterfaceType.MULTIPROCESSING_QUEUE,
             "mp_queue": shared_output_queue,
         }
+        if compute_output_arena is not None:
+            compute_process_output_interface_args = {
+                "type": BackendInputInterfaceType.SHARED_MEMORY,
+                "mp_queue": shared_output_queue,
+                "arena": compute_output_arena,
+            }
 
         backend_compute_process_cls = self._get_compute_process_cls(
             component_model.framework
@@ -1338,24 +1679,275 @@ class NxsBackendBaseProcess(ABC):
         allow_inference_flag = Value("i", True)
         allow_inference_flags.append(allow_inference_flag)
 
+        # all instances share the flag above, so they are paused and resumed together
+        compute_stats = BackendComputeStats()
+        if compute_stats_list is not None:
+            compute_stats_list.append(compute_stats)
+
         stop_output_flag = Value("i", False)
         stop_flags.append(stop_output_flag)
 
-        compute_process = backend_compute_process_cls(
-            args=None,
-            component_model=component_model,
-            component_model_plan=component_model_plan,
-            model_path=model_path,
-            use_gpu=self.use_gpu,
-            transforming_fn_path=transform_path,
-            input_interface_args_list=compute_process_input_interface_args_list,
-            output_interface_args=compute_process_output_interface_args,
-            allow_infer_flag=allow_inference_flag,
-            stop_flags=stop_compute_flags,
-            next_process_stop_flag=stop_output_flag,
+        # compute_input_queues[i] holds the input queues of instance i
+        num_instances = len(compute_input_queues)
+        cpu_affinities = self._get_compute_cpu_affinities(num_instances)
+        instance_countdown = Value("i", num_instances) if num_instances > 1 else None
+
+        profile_queue = None
+        if self.args.enable_self_profiling:
+            profile_queue = self.measured_profiles_queue
+
+        compute_processes = []
+        for instance_id, instance_input_queues in enumerate(compute_input_queues):
+            compute_process_input_interface_args_list = []
+            for compute_input_queue in instance_input_queues:
+                compute_process_input_interface_args = {
+                    "type": BackendInputInterfaceType.MULTIPROCESSING_QUEUE,
+                    "mp_queue": compute_input_queue,
+                }
+                if compute_input_arena is not None:
+                    compute_process_input_interface_args = {
+                        "type": BackendInputInterfaceType.SHARED_MEMORY,
+                        "mp_queue": compute_input_queue,
+                        "arena": compute_input_arena,
+                    }
+                compute_process_input_interface_args_list.append(
+                    compute_process_input_interface_args
+                )
+
+            compute_process = backend_compute_process_cls(
+                args=None,
+                component_model=component_model,
+                component_model_plan=component_model_plan,
+                model_path=model_path,
+                use_gpu=self.use_gpu,
+                transforming_fn_path=transform_path,
+                input_interface_args_list=compute_process_input_interface_args_list,
+                output_interface_args=compute_process_output_interface_args,
+                allow_infer_flag=allow_inference_flag,
+                stop_flags=stop_compute_flags,
+                next_process_stop_flag=stop_output_flag,
+                extra_params={
+                    "instance_id": instance_id,
+                    "cpu_affinity": cpu_affinities[instance_id],
+                    "instance_countdown": instance_countdown,
+                    "deploy_t0": deploy_t0,
+                    "profile_queue": profile_queue if instance_id == 0 else None,
+                    "compute_stats": compute_stats,
+                },
+            )
+            compute_processes.append(compute_process)
+
+        return compute_processes
+
+    def _get_num_compute_instances(self, component_model: NxsModel) -> int:
+        if component_model.num_compute_instances is None:
+            return 1
+        return max(1, component_model.num_compute_instances)
+
+    def _register_local_sessions(self, cmodel_uuid: str, session_uuids: List[str]):
+        if self.local_session_topics is None:
+            return
+        if cmodel_uuid not in self.local_input_queues:
+            return
+
+        for session_uuid in session_uuids:
+            self.local_session_topics[f"{cmodel_uuid}_{session_uuid}"] = cmodel_uuid
+
+    def _unregister_local_sessions(self, cmodel_uuid: str, session_uuids: List[str]):
+        if self.local_session_topics is None:
+            return
+
+        for session_uuid in session_uuids:
+            self.local_session_topics.pop(f"{cmodel_uuid}_{session_uuid}", None)
+
+    def _unregister_local_input(self, cmodel_uuid: str):
+        # returns the queue of the cmodel's input process, None if it had none
+        if self.local_input_queues is None:
+            return None
+
+        for topic, topic_cmodel_uuid in list(self.local_session_topics.items()):
+            if topic_cmodel_uuid == cmodel_uuid:
+                self.local_session_topics.pop(topic, None)
+
+        return self.local_input_queues.pop(cmodel_uuid, None)
+
+    def _forward_local_leftovers(self, cmodel_uuid: str, local_input_queue):
+        # requests handed over while the cmodel was stopping go through redis, to the
+        # other replicas of the cmodel. The queue holds batches of wire-encoded
+        # requests, they are decoded so the redis pusher does not encode them twice.
+        leftovers = []
+        while True:
+            try:
+                items = local_input_queue.get_nowait()
+            except:
+                break
+            leftovers.extend(decode_if_encoded(data) for data in items)
+
+        if not leftovers:
+            return
+
+        output = BackendOutputInterfaceFactory.create_input_interface(
+            type=BackendOutputInterfaceType.REDIS,
+            address=self.args.job_redis_queue_address,
+            port=self.args.job_redis_queue_port,
+            password=self.args.job_redis_queue_password,
+            is_using_ssl=self.args.job_redis_queue_use_ssl,
         )
+        for request in leftovers:
+            output.put_batch(f"{cmodel_uuid}_{request.session_uuid}", [request])
+
+        self._log(f"Forwarded {len(leftovers)} leftover requests of {cmodel_uuid}")
+
+    def _collect_measured_profiles(self):
+        new_profiles = {}
+        while True:
+            try:
+                model_uuid, profile = self.measured_profiles_queue.get_nowait()
+            except:
+                break
+            new_profiles[model_uuid] = profile
+
+        if not new_profiles:
+            return
+
+        with self.measured_profiles_lock:
+            self.measured_profiles.update(new_profiles)
+            self.unreported_measured_profiles.update(new_profiles)
+
+        # running cmodels switch to the measured profiles right away
+        for infer_runtime in self.infer_runtime_map.values():
+            if not self._apply_measured_profiles(infer_runtime.cmodel):
+                continue
+
+            for process in infer_runtime.processes:
+                if not isinstance(process, BackendInputProcess):
+                    continue
+                profile = new_profiles.get(process.component_model.model_uuid)
+                if profile:
+                    process.update_profile(profile)
+
+            if self.gpu_arbiter is not None:
+                self.gpu_arbiter.update_profile(
+                    infer_runtime.cmodel, infer_runtime.cmodel_plan
+                )
+
+    def _apply_measured_profiles(self, cmodel: NxsCompositoryModel) -> bool:
+        # returns True if some component model got a new profile
+        is_updated = False
+        for component_model in cmodel.component_models:
+            profile = self.measured_profiles.get(component_model.model_uuid)
+            if profile and component_model.profile is not profile:
+                component_model.profile = profile
+                is_updated = True
+        return is_updated
+
+    def _check_stage_processes(self, mp_manager: SyncManager):
+        # a cmodel with a dead stage process cannot serve requests anymore. It stops
+        # admitting them right away so they stay in redis for other replicas, then it
+        # is removed and the backend registers again, which makes the scheduler resend
+        # its whole plan and so redeploy the cmodel.
+        failed_cmodel_uuids = []
+        for cmodel_uuid, infer_runtime in self.infer_runtime_map.items():
+            if infer_runtime.has_dead_processes:
+                continue
+
+            dead_processes = [
+                process
+                for process in infer_runtime.processes
+                if process.p is not None and not process.p.is_alive()
+            ]
+            if not dead_processes:
+                continue
+
+            infer_runtime.has_dead_processes = True
+            if infer_runtime.in_flight_credits is not None:
+                infer_runtime.in_flight_credits.block()
+
+            self._log(
+                f"{len(dead_processes)} stage processes of cmodel {cmodel_uuid} died, "
+                "redeploying it",
+                logging.WARNING,
+            )
+            failed_cmodel_uuids.append(cmodel_uuid)
+
+        if not failed_cmodel_uuids:
+            return
+
+        for cmodel_uuid in failed_cmodel_uuids:
+            first_input_process: BackendInputProcess = self.infer_runtime_map[
+                cmodel_uuid
+            ].processes[0]
+            unschedule_plan = NxsUnschedulingPerBackendPlan(
+                backend_name=self.backend_name,
+                compository_model_plans=[
+                    NxsUnschedulingPerCompositoryPlan(
+                        model_uuid=cmodel_uuid,
+                        session_uuid_list=list(
+                            first_input_process.input_interface_args_dict.keys()
+                        ),
+                    )
+                ],
+            )
+            self.global_dispatcher_lock.acquire()
+            self._process_unscheduling_plan(unschedule_plan, mp_manager)
+            self.global_dispatcher_lock.release()
+
+        self._register_backend()
+
+    def _create_in_flight_credits(
+        self,
+        cmodel: NxsCompositoryModel,
+        cmodel_plan: NxsSchedulingPerCompositorymodelPlan,
+    ) -> BackendInFlightCredits:
+        # as many requests as the cmodel finishes within in_flight_budget_ms, None if
+        # disabled or if there is no profile to size it with
+        if self.args.in_flight_budget_ms <= 0:
+            return None
+
+        # the slowest component model bounds the throughput of the cmodel
+        capacity_fps = math.inf
+        for component_model, component_model_plan in zip(
+            cmodel.component_models, cmodel_plan.component_model_plans
+        ):
+            latency_secs = 0
+            for profile_unit in component_model.profile:
+                if profile_unit.batch_size == component_model_plan.batch_size:
+                    latency_secs = profile_unit.latency_e2e.mean / 1000.0
+                    break
+            if latency_secs <= 0:
+                return None
+
+            num_instances = 1
+            if not component_model.is_custom_model:
+                num_instances = self._get_num_compute_instances(component_model)
+            capacity_fps = min(
+                capacity_fps,
+                num_instances * component_model_plan.batch_size / latency_secs,
+            )
+
+        max_credits = math.ceil(capacity_fps * self.args.in_flight_budget_ms / 1000.0)
+
+        # leave room for a batch being prepared while another one runs
+        min_credits = 2 * cmodel_plan.component_model_plans[0].batch_size
+
+        return BackendInFlightCredits(max(min_credits, max_credits))
+
+    def _get_compute_cpu_affinities(self, num_instances: int) -> List[List[int]]:
+        # splits the cores available to the backend evenly between cpu instances
+        if self.use_gpu or num_instances <= 1:
+            return [[] for _ in range(num_instances)]
+
+        cpus = sorted(os.sched_getaffinity(0))
+        num_cpus_per_instance = len(cpus) // num_instances
+        if num_cpus_per_instance == 0:
+            return [[] for _ in range(num_instances)]
 
-        return compute_process
+        affinities = []
+        for instance_id in range(num_instances):
+            start = instance_id * num_cpus_per_instance
+            affinities.append(cpus[start : start + num_cpus_per_instance])
+
+        return affinities
 
     def _deploy_arbitrary_model_process(
         self,
@@ -1411,6 +2003,8 @@ class NxsBackendBaseProcess(ABC):
         shared_output_queue,
         dispatcher_update_shared_list: List,
         postproc_path: str,
+        compute_output_arena: NxsSharedMemoryArena = None,
+        in_flight_credits: BackendInFlightCredits = None,
     ):
         stop_output_flag = stop_flags[-1]
 
@@ -1419,6 +2013,12 @@ class NxsBackendBaseProcess(ABC):
             "type": BackendInputInterfaceType.MULTIPROCESSING_QUEUE,
             "mp_queue": shared_output_queue,
         }
+        if compute_output_arena is not None:
+            output_process_input_interface_args = {
+                "type": BackendInputInterfaceType.SHARED_MEMORY,
+                "mp_queue": shared_output_queue,
+                "arena": compute_output_arena,
+            }
 
         # create output_inf for output_process
         if model_idx < num_component_models - 1:
@@ -1437,6 +2037,15 @@ class NxsBackendBaseProcess(ABC):
                 "password": self.args.job_redis_queue_password,
                 "is_using_ssl": self.args.job_redis_queue_use_ssl,
             }
+            if self.local_input_queues is not None:
+                # next cmodels of the pipeline may be running here
+                output_process_output_interface_args.update(
+                    {
+                        "type": BackendOutputInterfaceType.LOCAL_FIRST,
+                        "local_session_topics": self.local_session_topics,
+                        "local_input_queues": self.local_input_queues,
+                    }
+                )
 
         next_process_stop_flag = None
         if model_idx < num_component_models - 1:
@@ -1458,11 +2067,72 @@ class NxsBackendBaseProcess(ABC):
                 dispatcher_update_shared_list=None
                 if model_idx < num_component_models - 1
                 else dispatcher_update_shared_list,
+                extra_params={
+                    "in_flight_credits": None
+                    if model_idx < num_component_models - 1
+                    else in_flight_credits
+                },
             )
             output_processes.append(output_process)
 
         return output_processes
 
+    def _create_shared_memory_arena(
+        self, num_slots: int, slot_size: int
+    ) -> NxsSharedMemoryArena:
+        try:
+            return NxsSharedMemoryArena(num_slots, slot_size)
+        except Exception as e:
+            # e.g., /dev/shm is too small, fallback to pickling through mp queues
+            self._log(f"Failed to create shared memory arena: {e}", logging.WARNING)
+            return None
+
+    def _create_compute_input_arena(
+        self,
+        component_model: NxsModel,
+        component_model_plan: NxsSchedulingPerComponentModelPlan,
+    ) -> NxsSharedMemoryArena:
+        sample_size = 0
+        for input in component_model.model_desc.inputs:
+            nbytes = get_tensor_nbytes(input.shape, input.dtype.value)
+            if nbytes < 0:
+                # dynamic shapes, slots can't be sized in advance
+                return None
+            sample_size += nbytes + 64
+
+        # a couple of batches in flight per preprocessor and per compute instance,
+        # preprocessors block when all are taken
+        num_compute_instances = self._get_num_compute_instances(component_model)
+        num_slots = 2 * component_model.num_preprocessors + 2 * num_compute_instances
+        if self._is_batcher_enabled(component_model, component_model_plan):
+            # batcher holds on to incoming batches until they are merged
+            num_slots += component_model_plan.batch_size
+        slot_size = component_model_plan.batch_size * sample_size
+
+        return self._create_shared_memory_arena(num_slots, slot_size)
+
+    def _create_compute_output_arena(
+        self,
+        component_model: NxsModel,
+        component_model_plan: NxsSchedulingPerComponentModelPlan,
+    ) -> NxsSharedMemoryArena:
+        sample_size = 0
+        for output in component_model.model_desc.outputs:
+            if not output.shape:
+                return None
+            nbytes = get_tensor_nbytes(output.shape, output.dtype.value)
+            if nbytes < 0:
+                return None
+            sample_size += nbytes + 64
+
+        if sample_size == 0:
+            return None
+
+        # compute sends one slot per request
+        num_compute_instances = self._get_num_compute_instances(component_model)
+        num_slots = 4 * component_model_plan.batch_size * num_compute_instances
+        return self._create_shared_memory_arena(num_slots, sample_size)
+
     def _get_compute_process_cls(self, framework: Framework):
         backend_compute_process_cls = BackendComputeProcessOnnx
         if framework == Framework.TVM:
@@ -1491,23 +2161,7 @@ class NxsBackendBaseProcess(ABC):
         component_model_dir_path = os.path.join(
             dir_abs_path, component_model.model_uuid
         )
-        create_dir_if_needed(component_model_dir_path)
 
-        cached_component_model_path = self.model_store_cache.get_model_path(
-            component_model.model_uuid
-        )
-
-        is_zip_file = zipfile.is_zipfile(cached_component_model_path)
-
-        # extract the zip file to model dir path
-        if is_zip_file:
-            shutil.unpack_archive(
-                cached_component_model_path,
-                component_model_dir_path,
-                format="zip",
-            )
-
-        # copy cached model into new location
         component_model_path = os.path.join(component_model_dir_path, f"model.onnx")
         if component_model.framework == Framework.ONNX:
             component_model_path = os.path.join(component_model_dir_path, f"model.onnx")
@@ -1518,23 +2172,26 @@ class NxsBackendBaseProcess(ABC):
         elif component_model.framework == Framework.TF_PB:
             component_model_path = os.path.join(component_model_dir_path, f"model.pb")
 
-        if not is_zip_file:
-            shutil.copy(cached_component_model_path, component_model_path)
-
-        preproc_data = self.storage.download(
-            f"preprocessing/{component_model.model_desc.preprocessing_name}.py"
-        )
-        postproc_data = self.storage.download(
-            f"postprocessing/{component_model.model_desc.postprocessing_name}.py"
+        is_warm = self.model_store_cache.acquire_model_dir(
+            component_model.model_uuid, component_model_dir_path
         )
+        if is_warm and not os.path.exists(component_model_path):
+            delete_dir(component_model_dir_path)
+            is_warm = False
+
+        if not is_warm:
+            delete_and_create_dir(component_model_dir_path)
+
+        # path in store -> local path of the processing fns
+        artifacts = {}
 
         preproc_path = os.path.join(component_model_dir_path, "preprocessing.py")
-        with open(preproc_path, "wb") as f:
-            f.write(preproc_data)
+        preproc_name = component_model.model_desc.preprocessing_name
+        artifacts[f"preprocessing/{preproc_name}.py"] = preproc_path
 
         postproc_path = os.path.join(component_model_dir_path, "postprocessing.py")
-        with open(postproc_path, "wb") as f:
-            f.write(postproc_data)
+        postproc_name = component_model.model_desc.postprocessing_name
+        artifacts[f"postprocessing/{postproc_name}.py"] = postproc_path
 
         transform_path = ""
         if (
@@ -1545,21 +2202,60 @@ class NxsBackendBaseProcess(ABC):
                 "none",
             ]
         ):
-            transforming_data = self.storage.download(
-                f"transforming/{component_model.model_desc.transforming_name}.py"
-            )
             transform_path = os.path.join(component_model_dir_path, "transforming.py")
-            with open(transform_path, "wb") as f:
-                f.write(transforming_data)
+            transform_name = component_model.model_desc.transforming_name
+            artifacts[f"transforming/{transform_name}.py"] = transform_path
+
+        with ThreadPoolExecutor(max_workers=len(artifacts)) as executor:
+            # fetch the processing fns while the model is downloaded and unpacked
+            futures = []
+            for path_in_store, local_path in artifacts.items():
+                futures.append(
+                    executor.submit(
+                        self.model_store_cache.copy_artifact, path_in_store, local_path
+                    )
+                )
+
+            if is_warm:
+                self._log(f"Reusing unpacked model {component_model.model_uuid}")
+            else:
+                cached_component_model_path = self.model_store_cache.get_model_path(
+                    component_model.model_uuid
+                )
+
+                # extract the zip file to model dir path
+                if zipfile.is_zipfile(cached_component_model_path):
+                    shutil.unpack_archive(
+                        cached_component_model_path,
+                        component_model_dir_path,
+                        format="zip",
+                    )
+                else:
+                    link_or_copy_file(cached_component_model_path, component_model_path)
+
+            for future in futures:
+                future.result()
 
         return component_model_path, preproc_path, postproc_path, transform_path
 
+    def _download_component_model(self, component_model: NxsModel):
+        if component_model.is_custom_model:
+            return self._download_arbitrary_component_model(component_model)
+        return self._download_pipelined_component_model(component_model)
+
     def _download_arbitrary_component_model(self, component_model: NxsModel):
         dir_abs_path = os.path.dirname(os.path.realpath(__file__))
         component_model_dir_path = os.path.join(
             dir_abs_path, component_model.model_uuid
         )
-        create_dir_if_needed(component_model_dir_path)
+
+        if self.model_store_cache.acquire_model_dir(
+            component_model.model_uuid, component_model_dir_path
+        ):
+            self._log(f"Reusing unpacked model {component_model.model_uuid}")
+            return component_model_dir_path, "", "", ""
+
+        delete_and_create_dir(component_model_dir_path)
 
         cached_component_model_path = self.model_store_cache.get_model_path(
             component_model.model_uuid
@@ -1644,11 +2340,35 @@ class NxsBackendProcess(NxsBackendBaseProcess):
         return {"backend_process": self}
 
 
+def setup_process_start_method(args: NxsBackendArgs):
+    if args.process_start_method != "forkserver":
+        multiprocessing.set_start_method(args.process_start_method)
+        return
+
+    # stage processes are forked from a standby server that already imported this
+    # module and the heavy deps, so a deployment does not pay for interpreter startup
+    # and imports, only for loading its model
+    preload = ["__main__"]
+    for module_name in args.forkserver_preload.split(","):
+        if module_name.strip():
+            preload.append(module_name.strip())
+
+    multiprocessing.set_start_method("forkserver")
+    multiprocessing.set_forkserver_preload(preload)
+
+    from multiprocessing import forkserver
+
+    forkserver.ensure_running()
+
+
 if __name__ == "__main__":
     from main_processes.backend.args import parse_args
 
     args = parse_args()
 
+    # must happen before any queue, lock or shared memory is created
+    setup_process_start_method(args)
+
     queue_puller = create_queue_puller_from_args(
         args, NxsQueueType.REDIS, args.backend_name
     )
@@ -1658,8 +2378,13 @@ if __name__ == "__main__":
 
     model_store = create_storage_from_args(args, args.storage_type)
 
-    # NOTE: model cache has to be big enough to store all running models (e.g., 50 models)
-    model_store_cache = NxsLocalStorageCache(model_store, max_cache_size=50)
+    # shared by backends on the same node and kept across restarts
+    model_store_cache = NxsPersistentStorageCache(
+        model_store,
+        cache_dir=args.model_cache_dir,
+        max_cache_size_bytes=int(args.model_cache_size_gb * 1024 * 1024 * 1024),
+        max_num_warm_models=args.num_warm_models,
+    )
 
     backend = NxsBackendProcess(
         args,
@@ -10,8 +10,12 @@ from typing import Dict, List
 import cv2
 import numpy as np
 from configs import BACKEND_INTERNAL_CONFIG, NXS_BACKEND_CONFIG, NXS_CONFIG
+from main_processes.backend.batching import REQUEST_DEADLINE_KEY
+from main_processes.backend.flow_control import BackendInFlightCredits
+from main_processes.backend.stage_runtime import BackendStageWaiter
 from nxs_libs.interface.backend.input import BackendInputInterfaceFactory
 from nxs_libs.interface.backend.output import BackendOutputInterfaceFactory
+from nxs_libs.shared_memory import release_if_shared
 from nxs_types.infer import (
     NxsInferInput,
     NxsInferInputType,
@@ -69,6 +73,11 @@ class BackendOutputProcess(ABC):
         self.dispatcher_update_shared_list = dispatcher_update_shared_list
         self.pid = pid
 
+        # only set for the last component model of a cmodel, see BackendInFlightCredits
+        self.in_flight_credits: BackendInFlightCredits = extra_params.get(
+            "in_flight_credits", None
+        )
+
         self.p = None
         self.postproc_fn = None
         self.postproc_extra_params = {}
@@ -76,6 +85,9 @@ class BackendOutputProcess(ABC):
         self.metadata_list: List[LogMetadata] = []
         self.metadata_processing_period_secs = 1
 
+        # outputs are grouped per topic and flushed once per loop iteration
+        self.pending_outputs: Dict[str, List] = {}
+
         try:
             self.postproc_extra_params = json.loads(
                 self.component_model.model_desc.extra_postprocessing_metadata
@@ -115,6 +127,8 @@ class BackendOutputProcess(ABC):
 
         self.metadata_processing_t0 = time.time()
 
+        waiter = BackendStageWaiter([self.input])
+
         requests_count = 0
         tt0 = time.time()
         to_exit = False
@@ -155,7 +169,7 @@ class BackendOutputProcess(ABC):
                             status=NxsInferStatus.FAILED,
                         )
 
-                        self.output.put_batch("error", [new_request])
+                        self._buffer_outputs("error", [new_request])
                     else:
                         result = NxsInferResultWithMetadata(
                             type=NxsInferResultType.CUSTOM,
@@ -167,7 +181,7 @@ class BackendOutputProcess(ABC):
                             custom="{}",
                         )
                         next_topic = user_metadata.exec_pipelines[-1]
-                        self.output.put_batch(next_topic, [result])
+                        self._buffer_outputs(next_topic, [result])
 
                     continue
 
@@ -243,17 +257,13 @@ class BackendOutputProcess(ABC):
                     new_request = NxsInferRequest(
                         **(user_metadata.dict()),
                         inputs=[
-                            NxsInferInput(
-                                name=key,
-                                type=NxsInferInputType.PICKLED_DATA,
-                                data=pickle.dumps(result[key]),
-                            )
+                            self._create_infer_input(key, result[key])
                             for key in result
                         ],
                         status=metadata[BACKEND_INTERNAL_CONFIG.TASK_STATUS],
                     )
 
-                    self.output.put_batch(next_topic, [new_request])
+                    self._buffer_outputs(next_topic, [new_request])
                 else:
                     # send data outside
                     status = metadata.get(
@@ -270,18 +280,14 @@ class BackendOutputProcess(ABC):
                         new_request = NxsInferRequest(
                             **(user_metadata.dict()),
                             inputs=[
-                                NxsInferInput(
-                                    name=key,
-                                    type=NxsInferInputType.PICKLED_DATA,
-                                    data=pickle.dumps(result[key]),
-                                )
+                                self._create_infer_input(key, result[key])
                                 for key in result
                             ],
                         )
 
                         # FIXME: How to add session_uuid to this???
                         next_topic = f"{next_topic}_{new_request.session_uuid}"
-                        self.output.put_batch(next_topic, [new_request])
+                        self._buffer_outputs(next_topic, [new_request])
                     else:
                         try:
                             if isinstance(result, Dict):
@@ -414,16 +420,26 @@ class BackendOutputProcess(ABC):
                             if status != NxsInferStatus.FAILED:
                                 result.status = NxsInferStatus.COMPLETED
 
-                            self.output.put_batch(next_topic, [result])
+                            self._buffer_outputs(next_topic, [result])
                         else:
                             # do not need to forward FAILED task to next computation step, jutst forward to last topic
                             next_topic = user_metadata.exec_pipelines[-1]
-                            self.output.put_batch(next_topic, [result])
+                            self._buffer_outputs(next_topic, [result])
 
                 self.metadata_list.append(LogMetadata(user_metadata, metadata["extra"]))
 
                 requests_count += 1
 
+            self._flush_outputs()
+
+            # everything referencing input tensors has been serialized by now
+            for batch in incoming_batches:
+                release_if_shared(batch[0])
+
+            if self.in_flight_credits is not None:
+                # these requests have left the backend
+                self.in_flight_credits.release(len(incoming_batches))
+
             if (
                 time.time() - self.metadata_processing_t0
                 > self.metadata_processing_period_secs
@@ -451,13 +467,41 @@ class BackendOutputProcess(ABC):
                 break
 
             if not incoming_batches:
-                time.sleep(0.0025)
+                waiter.wait()
 
         if self.next_process_stop_flag is not None:
             self.next_process_stop_flag.value = True
 
         self._log("Exiting...")
 
+    def _create_infer_input(self, name: str, value) -> NxsInferInput:
+        if isinstance(value, np.ndarray) and value.dtype != object:
+            # ship tensors as raw buffers, they are framed as-is by the wire format
+            value = np.ascontiguousarray(value)
+            return NxsInferInput.construct(
+                name=name,
+                type=NxsInferInputType.NUMPY_TENSOR,
+                data=memoryview(value).cast("B"),
+                dtype=value.dtype.str,
+                shape=list(value.shape),
+            )
+
+        return NxsInferInput(
+            name=name,
+            type=NxsInferInputType.PICKLED_DATA,
+            data=pickle.dumps(value),
+        )
+
+    def _buffer_outputs(self, topic: str, items: List):
+        if topic not in self.pending_outputs:
+            self.pending_outputs[topic] = []
+        self.pending_outputs[topic].extend(items)
+
+    def _flush_outputs(self):
+        for topic, items in self.pending_outputs.items():
+            self.output.put_batch(topic, items)
+        self.pending_outputs = {}
+
     def _load_postprocessing_fn(self):
         import importlib
 
@@ -559,12 +603,28 @@ class BackendBasicOutputProcess(BackendOutputProcess):
         fps = total_requests / duration_secs
 
         request_lats = []
+        num_sla_reqs = 0
+        num_sla_misses = 0
+        # component model uuid -> batch_size -> number of requests
+        batch_size_hist: Dict[str, Dict[int, int]] = {}
         for request_log in metadata_list:
             input_t0 = request_log.extra["input_t0"]
             postprocessing_t1 = request_log.extra["postprocessing_t1"]
             e2e_lat = postprocessing_t1 - input_t0
             request_lats.append(e2e_lat)
 
+            deadline = request_log.extra.get(REQUEST_DEADLINE_KEY)
+            if deadline is not None:
+                num_sla_reqs += 1
+                if postprocessing_t1 > deadline:
+                    num_sla_misses += 1
+
+            for key, value in request_log.extra.items():
+                if isinstance(value, Dict) and "batch_size" in value:
+                    model_hist = batch_size_hist.setdefault(key, {})
+                    bs = value["batch_size"]
+                    model_hist[bs] = model_hist.get(bs, 0) + 1
+
         latency = {
             "mean": 0,
             "min": 0,
@@ -584,6 +644,9 @@ class BackendBasicOutputProcess(BackendOutputProcess):
             "num_reqs": total_requests,
             "fps": fps,
             "latency": latency,
+            "batch_size_hist": batch_size_hist,
+            "num_sla_reqs": num_sla_reqs,
+            "num_sla_misses": num_sla_misses,
         }
 
     # def process_metadata_list(self, metadata_list: List[LogMetadata], duration_secs: float) -> Dict:
@@ -11,8 +11,14 @@ import cv2
 import numpy as np
 
 from configs import BACKEND_INTERNAL_CONFIG, NXS_BACKEND_CONFIG, NXS_CONFIG
+from main_processes.backend.batching import BackendBatchBuilder
+from main_processes.backend.stage_runtime import BackendStageWaiter
 from nxs_libs.interface.backend.input import BackendInputInterfaceFactory
-from nxs_libs.interface.backend.output import BackendOutputInterfaceFactory
+from nxs_libs.interface.backend.output import (
+    BackendOutputInterfaceFactory,
+    BackendOutputToLeastLoaded,
+    BackendOutputToSharedMemory,
+)
 from nxs_types.infer import NxsInferInputType, NxsInferRequest, NxsInferRequestMetadata
 from nxs_types.infer_result import NxsInferStatus
 from nxs_types.model import ModelInput, NxsModel
@@ -108,6 +114,10 @@ class BackendPreprocessingProcess:
         for input in self.component_model.model_desc.inputs:
             self.input_name_2_input_desc[input.name] = input
 
+        self.batch_builder = BackendBatchBuilder(self.component_model, max_batch_size)
+
+        waiter = BackendStageWaiter([self.input])
+
         to_exit = False
         tt0 = time.time()
 
@@ -188,11 +198,18 @@ class BackendPreprocessingProcess:
                                     if request_input.name != "encoded_image"
                                     else f"{request_input.name}_encoded"
                                 )
-                                decoded_inputs_dict[key_name] = request_input.data
+                                decoded_inputs_dict[key_name] = bytes(
+                                    request_input.data
+                                )
                         elif request_input.type == NxsInferInputType.PICKLED_DATA:
                             decoded_inputs_dict[request_input.name] = pickle.loads(
                                 request_input.data
                             )
+                        elif request_input.type == NxsInferInputType.NUMPY_TENSOR:
+                            # zero-copy view over the received buffer
+                            decoded_inputs_dict[request_input.name] = np.frombuffer(
+                                request_input.data, dtype=np.dtype(request_input.dtype)
+                            ).reshape(request_input.shape)
                     except Exception as ex:
                         metadata[
                             BACKEND_INTERNAL_CONFIG.TASK_STATUS
@@ -316,19 +333,10 @@ class BackendPreprocessingProcess:
                     batches.append(current_batch.pop(0))
                     metadatas.append(current_metadata_batch.pop(0))
 
-                transformed_batch = {}
-                for item in batches:
-                    for tensor_name in item:
-                        if not tensor_name in transformed_batch.keys():
-                            transformed_batch[tensor_name] = []
-                        transformed_batch[tensor_name].extend(item[tensor_name])
-
                 for metadata in metadatas:
                     self.request_exiting(metadata["extra"])
 
-                self.output.put_batch(
-                    self.next_topic_name, [(transformed_batch, metadatas)],
-                )
+                self._send_batch(batches, metadatas)
 
             if time.time() - tt0 > 5:
                 if requests_count > 0:
@@ -342,13 +350,39 @@ class BackendPreprocessingProcess:
                 break
 
             if not requests:
-                time.sleep(0.01)
+                waiter.wait()
 
         # trigger next process to stop
         self.next_process_stop_flag.value = True
 
         self._log("Exiting...")
 
+    def _send_batch(self, batches: List[Dict], metadatas: List[Dict]):
+        output = self.output
+        if isinstance(output, BackendOutputToLeastLoaded):
+            # one queue per compute instance
+            output = output.select_output(self.next_topic_name)
+
+        if isinstance(output, BackendOutputToSharedMemory):
+            # write samples straight into a slot of the compute arena
+            arena = output.arena
+            allocation = arena.allocate(self.batch_builder.get_tensor_specs(batches))
+            if allocation is not None:
+                slot, layout, views = allocation
+                transformed_batch = self.batch_builder.assemble(batches, out=views)
+                inline_data = {
+                    tensor_name: value
+                    for tensor_name, value in transformed_batch.items()
+                    if tensor_name not in layout
+                }
+                desc = arena.send(slot, layout, inline_data)
+                output.put_batch(self.next_topic_name, [(desc, metadatas)])
+                return
+
+        # the mp queue pickles in the background, so this can't be a reused buffer
+        transformed_batch = self.batch_builder.assemble(batches)
+        output.put_batch(self.next_topic_name, [(transformed_batch, metadatas)])
+
     def _load_preprocessing_fn(self):
         import importlib
 
@@ -0,0 +1,71 @@
+import time
+from multiprocessing.connection import wait
+from typing import Iterable, List
+
+from nxs_libs.interface.backend.input import BackendInputInterface
+
+
+# Lets a backend stage sleep until one of its inputs has data instead of polling them
+# with fixed sleeps. Inputs backed by multiprocessing queues (and redis sessions, via
+# their puller) expose a handle multiprocessing.connection.wait() can block on, if any
+# input has none the stage falls back to short sleeps. Stop flags are shared values
+# that cannot be waited on, so a wait never exceeds max_wait_secs. After waking up
+# the stage is expected to drain all of its inputs, several items at a time.
+class BackendStageWaiter:
+    def __init__(
+        self,
+        inputs: List[BackendInputInterface],
+        max_wait_secs: float = 0.1,
+        poll_secs: float = 0.001,
+    ) -> None:
+        self.max_wait_secs = max_wait_secs
+        self.poll_secs = poll_secs
+
+        self.set_inputs(inputs)
+
+    def set_inputs(self, inputs: List[BackendInputInterface]):
+        # inputs sharing a handle (e.g. sessions of one puller) are waited on once
+        self.inputs = list(inputs)
+        self.handles = []
+        self.handle_inputs: List[BackendInputInterface] = []
+        self.handle_input_indices: List[int] = []
+        self.can_wait = True
+
+        handle_ids = set()
+        for idx, input in enumerate(self.inputs):
+            handle = input.get_wait_handle()
+            if handle is None:
+                self.can_wait = False
+                continue
+            if id(handle) in handle_ids:
+                continue
+            handle_ids.add(id(handle))
+            self.handles.append(handle)
+            self.handle_inputs.append(input)
+            self.handle_input_indices.append(idx)
+
+    def wait(self, timeout: float = None, closed_inputs: Iterable[int] = ()) -> bool:
+        # returns False if nothing arrived within the timeout
+        if timeout is None:
+            timeout = self.max_wait_secs
+        timeout = max(0, min(timeout, self.max_wait_secs))
+
+        if not self.can_wait:
+            if timeout > 0:
+                time.sleep(min(timeout, self.poll_secs))
+            return True
+
+        handles = []
+        for handle, idx in zip(self.handles, self.handle_input_indices):
+            if idx not in closed_inputs:
+                handles.append(handle)
+        if not handles:
+            # nothing left to wait on, the caller is about to exit
+            return True
+
+        ready_handles = wait(handles, timeout=timeout)
+        for handle, input in zip(self.handles, self.handle_inputs):
+            if handle in ready_handles:
+                input.reset_wait_handle()
+
+        return len(ready_handles) > 0
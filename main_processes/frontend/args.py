@@ -30,6 +30,12 @@ def parse_args():
         default=True,
         type=lambda x: (str(x).lower() == "true"),
     )
+    # asyncio redis clients on the request path, they do not support redis cluster
+    parser.add_argument(
+        "--enable_async_redis_queue",
+        default=False,
+        type=lambda x: (str(x).lower() == "true"),
+    )
     _args = parser.parse_args()
 
     args = NxsApiArgs(**(vars(_args)))
@@ -32,6 +32,7 @@ from nxs_libs.interface.frontend.simple_interface import (
     SimpleFrontendTaskSummaryProcessor,
 )
 from nxs_libs.object.pipeline_runtime import NxsPipelineRuntime
+from nxs_libs.serialization import nxs_loads
 from nxs_libs.storage.nxs_blobstore import NxsAzureBlobStorage
 from nxs_libs.storage.nxs_blobstore_async import NxsAsyncAzureBlobStorage
 from nxs_types.backend import NxsBackendType
@@ -93,8 +94,9 @@ tasks_data = []
 tasks_summary_data = []
 session_params = {}
 
-task_result_dict = {}
-task_result_t0_dict = {}
+# task_uuid -> future resolved by task_result_recv_loop (or task_result_recv_thread)
+task_result_futures: Dict[str, asyncio.Future] = {}
+task_result_recv_task: asyncio.Task = None
 
 shared_queue_pusher: NxsQueuePusher = None
 redis_kv_server: NxsSimpleKeyValueDb = None
@@ -280,38 +282,103 @@ def task_monitor_thread():
 
 
 def task_result_recv_thread():
-    global args, task_result_dict, task_result_t0_dict
+    global args, task_result_futures
 
     queue_puller = create_queue_puller_from_args(
         args, NxsQueueType.REDIS, args.frontend_name
     )
 
-    cleanup_t0 = time.time()
-    expiration_secs = 60
-
     while True:
         msgs = queue_puller.pull()
 
         for msg in msgs:
             msg: NxsInferResult = msg
-            task_result_dict[msg.task_uuid] = msg
-            task_result_t0_dict[msg.task_uuid] = time.time()
+            future = task_result_futures.pop(msg.task_uuid, None)
+            if future is None:
+                # requester already timed out
+                continue
 
-            # print("RECV", msg)
+            future.get_loop().call_soon_threadsafe(_set_task_result, future, msg)
 
-        if time.time() - cleanup_t0 > 60:
-            # clean up some unused data
-            cur_ts = time.time()
-            to_remove_task_uuids = []
-            for task_uuid in task_result_t0_dict:
-                if cur_ts - task_result_t0_dict[task_uuid] > 3 * expiration_secs:
-                    to_remove_task_uuids.append(task_uuid)
+        if not msgs:
+            time.sleep(0.002)
+
+
+def _set_task_result(future: asyncio.Future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+async def task_result_recv_loop():
+    global args, task_result_futures
+
+    queue_puller = create_queue_puller_from_args(
+        args, NxsQueueType.REDIS_ASYNC, args.frontend_name
+    )
+
+    while True:
+        # one bad message must not stop the loop, every later request would time out
+        try:
+            msgs = await queue_puller.pull()
+
+            for msg in msgs:
+                msg: NxsInferResult = msg
+                future = task_result_futures.pop(msg.task_uuid, None)
+                if future is None or future.done():
+                    # requester already timed out
+                    continue
+
+                future.set_result(msg)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            write_log("task_result_recv_loop", f"Exception: {e}", NxsLogLevel.INFO)
+            await asyncio.sleep(0.01)
+
+
+def _register_task_result_future(task_uuid: str) -> asyncio.Future:
+    # must be registered before the task is pushed so the result can't race us
+    future = asyncio.get_running_loop().create_future()
+    task_result_futures[task_uuid] = future
+    return future
+
+
+async def _wait_for_task_result(future: asyncio.Future, timeout: float):
+    try:
+        return await asyncio.wait_for(future, timeout=max(0, timeout))
+    except asyncio.TimeoutError:
+        raise Exception("Request timeout")
+
+
+async def _push_task(topic: str, data):
+    if args.enable_async_redis_queue:
+        await shared_queue_pusher.push(topic, data)
+    else:
+        shared_queue_pusher.push(topic, data)
+
+
+async def _push_task_to_session(topic: str, session_uuid: str, data):
+    if args.enable_async_redis_queue:
+        await shared_queue_pusher.push_to_session(topic, session_uuid, data)
+    else:
+        shared_queue_pusher.push_to_session(topic, session_uuid, data)
 
-            for task_uuid in to_remove_task_uuids:
-                task_result_t0_dict.pop(task_uuid, None)
-                task_result_dict.pop(task_uuid, None)
 
-        time.sleep(0.002)
+async def _submit_task_and_wait(
+    task_uuid: str, topic: str, data, timeout_ts: float, session_uuid: str = None
+):
+    # the future is dropped whatever happens, e.g. if the push fails or the client
+    # goes away while waiting
+    future = _register_task_result_future(task_uuid)
+    try:
+        if session_uuid is None:
+            await _push_task(topic, data)
+        else:
+            await _push_task_to_session(topic, session_uuid, data)
+
+        return await _wait_for_task_result(future, timeout_ts - time.time())
+    finally:
+        task_result_futures.pop(task_uuid, None)
 
 
 def setup():
@@ -320,10 +387,16 @@ def setup():
     task_monitor_thr = Thread(target=task_monitor_thread, args=())
     task_monitor_thr.start()
 
-    task_recv_thr = Thread(target=task_result_recv_thread, args=())
-    task_recv_thr.start()
+    if args.enable_async_redis_queue:
+        # results are pulled by task_result_recv_loop once the event loop runs
+        shared_queue_pusher = create_queue_pusher_from_args(
+            args, NxsQueueType.REDIS_ASYNC
+        )
+    else:
+        task_recv_thr = Thread(target=task_result_recv_thread, args=())
+        task_recv_thr.start()
 
-    shared_queue_pusher = create_queue_pusher_from_args(args, NxsQueueType.REDIS)
+        shared_queue_pusher = create_queue_pusher_from_args(args, NxsQueueType.REDIS)
     redis_kv_server = create_simple_key_value_db_from_args(
         args, NxsSimpleKeyValueDbType.REDIS
     )
@@ -333,6 +406,13 @@ if shared_queue_pusher is None:
     setup()
 
 
+@router.on_event("startup")
+async def start_task_result_recv_loop():
+    global task_result_recv_task
+    if args.enable_async_redis_queue:
+        task_result_recv_task = asyncio.create_task(task_result_recv_loop())
+
+
 @router.post("/sessions/create")
 async def create_session(
     extra_params_json_str: str = "{}",
@@ -364,6 +444,7 @@ async def delete_session(
 ):
     key = f"{session_uuid}_params"
     redis_kv_server.delete_key(key)
+    session_params.pop(session_uuid, None)
     return {}
 
 
@@ -718,7 +799,8 @@ async def submit_task_tensors(
     authenticated: bool = Depends(check_api_key),
 ):
     data: bytes = await request.body()
-    infer_request = pickle.loads(data)
+    # body is either a wire-format envelope or a pickled request/dict
+    infer_request = nxs_loads(data)
 
     if isinstance(infer_request, Dict):
         try:
@@ -804,18 +886,10 @@ if args.enable_benchmark_api:
             task_uuid=task_uuid,
             metadata=image_bin,
         )
-        shared_queue_pusher.push(args.frontend_name, infer_result)
-
-        # wait for result
-        result = {}
-        while True:
-            if task_uuid not in task_result_dict:
-                # time.sleep(0.01)
-                await asyncio.sleep(0.0025)
-                continue
-
-            result = task_result_dict.pop(task_uuid)
-            break
+        # send it and wait for it to come back
+        await _submit_task_and_wait(
+            task_uuid, args.frontend_name, infer_result, time.time() + 10
+        )
 
         return {"status": "COMPLETED"}
 
@@ -1056,7 +1130,7 @@ async def _infer_single(
     users_extra_params: NxsInferExtraParams = NxsInferExtraParams(),
     infer_timeout: float = 10,
 ) -> NxsInferResult:
-    global tasks_data, shared_queue_pusher, task_result_dict, tasks_summary_data
+    global tasks_data, shared_queue_pusher, tasks_summary_data
     global task_summary_processor, session_params, redis_kv_server
     global backend_infos_t0, backend_infos
     global scheduler_info, scheduler_info_t0
@@ -1164,21 +1238,13 @@ async def _infer_single(
     )
 
     # shared_queue_pusher.push(next_topic, infer_task)
-    shared_queue_pusher.push_to_session(next_topic, session_uuid, infer_task)
-
-    # wait for result
-    result = {}
-    while True:
-        if time.time() - entry_t0 > infer_timeout:
-            raise Exception("Request timeout")
-
-        if task_uuid not in task_result_dict:
-            # time.sleep(0.01)
-            await asyncio.sleep(0.0025)
-            continue
-
-        result = task_result_dict.pop(task_uuid)
-        break
+    result = await _submit_task_and_wait(
+        task_uuid,
+        next_topic,
+        infer_task,
+        entry_t0 + infer_timeout,
+        session_uuid=session_uuid,
+    )
 
     task_summary.end_ts = time.time()
     task_summary.e2e_latency = task_summary.end_ts - entry_t0
@@ -1193,7 +1259,7 @@ async def _infer_single(
 
 
 async def _infer_tensors(infer_request: NxsTensorsInferRequest):
-    global tasks_data, shared_queue_pusher, task_result_dict
+    global tasks_data, shared_queue_pusher
     global tasks_summary_data, task_summary_processor, session_params, redis_kv_server
     global backend_infos_t0, backend_infos
 
@@ -1240,24 +1306,14 @@ async def _infer_tensors(infer_request: NxsTensorsInferRequest):
     )
 
     # shared_queue_pusher.push(next_topic, infer_task)
-    shared_queue_pusher.push_to_session(
-        next_topic, infer_request.session_uuid, infer_task
+    result = await _submit_task_and_wait(
+        task_uuid,
+        next_topic,
+        infer_task,
+        entry_t0 + infer_request.infer_timeout,
+        session_uuid=infer_request.session_uuid,
     )
 
-    # wait for result
-    result = {}
-    while True:
-        if time.time() - entry_t0 > infer_request.infer_timeout:
-            raise Exception("Request timeout")
-
-        if task_uuid not in task_result_dict:
-            # time.sleep(0.01)
-            await asyncio.sleep(0.0025)
-            continue
-
-        result = task_result_dict.pop(task_uuid)
-        break
-
     task_summary.end_ts = time.time()
     task_summary.e2e_latency = task_summary.end_ts - entry_t0
 
@@ -1290,12 +1346,13 @@ def _get_pipeline_info(pipeline_uuid) -> Union[NxsPipelineInfo, None]:
 def _get_session_params(session_uuid) -> Dict:
     global session_params, redis_kv_server
 
-    extra_params = {}
-    if session_uuid not in session_params:
-        extra_params = redis_kv_server.get_value(session_uuid)
-        if extra_params is None:
-            extra_params = {}
-        else:
-            session_params[session_uuid] = extra_params
+    if session_uuid in session_params:
+        return session_params[session_uuid]
+
+    # stored by create_session
+    extra_params = redis_kv_server.get_value(f"{session_uuid}_params")
+    if extra_params is None:
+        return {}
 
+    session_params[session_uuid] = extra_params
     return extra_params
@@ -1,3 +1,4 @@
+from nxs_libs.interface.scheduling_policy import NxsSchedulingPolicyType
 from nxs_types.nxs_args import NxsSchedulerArgs
 
 
@@ -9,6 +10,7 @@ def parse_args():
     parser.add_argument("--model_timeout_secs", type=float, default=180)
     parser.add_argument("--backend_timeout_secs", type=float, default=30)
     parser.add_argument("--epoch_scheduling_interval_secs", type=float, default=10)
+    parser.add_argument("--plan_ack_timeout_secs", type=float, default=30)
     parser.add_argument(
         "--enable_multi_models",
         default=False,
@@ -19,6 +21,12 @@ def parse_args():
         default=False,
         type=lambda x: (str(x).lower() == "true"),
     )
+    parser.add_argument(
+        "--scheduling_policy",
+        type=str,
+        default="simple",
+        choices=[policy_type.value for policy_type in NxsSchedulingPolicyType],
+    )
     _args = parser.parse_args()
 
     args = NxsSchedulerArgs(**(vars(_args)))
@@ -6,10 +6,12 @@ import time
 from configs import GLOBAL_QUEUE_NAMES, NXS_CONFIG
 from lru import LRU
 from nxs_libs.db import NxsDb, NxsDbFactory, NxsDbType
-from nxs_libs.interface.scheduling_policy import BaseSchedulingPolicy
-from nxs_libs.interface.scheduling_policy.simple_policy_v2 import (
-    SimpleSchedulingPolicyv2,
+from nxs_libs.interface.scheduling_policy import (
+    BaseSchedulingPolicy,
+    NxsSchedulingPolicyFactory,
+    NxsSchedulingPolicyType,
 )
+from nxs_libs.object.backend_plan import NxsBackendPlanTracker
 from nxs_libs.object.backend_runtime import NxsBackendRuntime
 from nxs_libs.object.pipeline_runtime import NxsPipelineRuntime
 from nxs_libs.queue import (
@@ -76,6 +78,9 @@ class NxsSchedulerProcess:
         self.cpu_backends: dict[str, NxsBackendRuntime] = {}
         self.gpu_backends: dict[str, NxsBackendRuntime] = {}
 
+        # what each backend was told to run, only changes are sent to backends
+        self.backend_plan_trackers: dict[str, NxsBackendPlanTracker] = {}
+
         self.pipeline_info_cache = LRU(self.PIPELINE_CACHE_SIZE)
         self.compository_model_info_cache = LRU(self.PIPELINE_CACHE_SIZE * 5)
 
@@ -142,6 +147,8 @@ class NxsSchedulerProcess:
                     self.process_heartbeat_msg(msg)
                 if msg.type == NxsMsgType.REPORT_BACKEND_STATS:
                     self.process_backend_stats(msg)
+                if msg.type == NxsMsgType.ACK_PLAN_DELTA:
+                    self.process_plan_delta_ack(msg)
 
             if (
                 time.time() - check_expired_backend_t0
@@ -165,6 +172,19 @@ class NxsSchedulerProcess:
 
         self.scheduling_policy.update_backend_runtime_stats(msg.backend_name, stats)
 
+    def process_plan_delta_ack(self, msg: NxsMsgAckPlanDelta):
+        if msg.backend_name not in self.backend_plan_trackers:
+            return
+
+        self.backend_plan_trackers[msg.backend_name].ack(msg.version)
+
+    def _get_backend_plan_tracker(self, backend_name: str) -> NxsBackendPlanTracker:
+        if backend_name not in self.backend_plan_trackers:
+            self.backend_plan_trackers[backend_name] = NxsBackendPlanTracker(
+                backend_name, self.args.plan_ack_timeout_secs
+            )
+        return self.backend_plan_trackers[backend_name]
+
     def restore_scheduler_states(self):
         backend_names = self.state_db.get_value(self.BACKEND_ROOT_TOPIC)
         if backend_names:
@@ -188,6 +208,8 @@ class NxsSchedulerProcess:
         if backend_name in self.backends:
             # backend could be just restarted - resend DEPLOY_MODEL requests
             self.send_heartbeat_interval(backend_name)
+            # it does not run anything anymore, next plans have to be sent in full
+            self._get_backend_plan_tracker(backend_name).reset()
             self.deploy_models_on_single_backend(backend_name)
             return
 
@@ -217,6 +239,8 @@ class NxsSchedulerProcess:
 
         backend.update_entry_in_db(self.state_db)
 
+        self.backend_plan_trackers.pop(backend_name, None)
+
         self._log(f"Backend {backend_name} was added.")
 
     def send_heartbeat_interval(self, backend_name: str):
@@ -263,29 +287,30 @@ class NxsSchedulerProcess:
             ],
         )
         scheduling_plans = final_plan.scheduling
-        unscheduling_plans = final_plan.unscheduling
 
-        # send out plans to backend
-        for plan in unscheduling_plans:
-            msg = NxsMsgUnschedulePlans(plan=plan)
-            backend_name = plan.backend_name
+        # send out what changed since the last plans sent to each backend, backends
+        # without any plan get their models removed
+        backend_name_2_plan = {plan.backend_name: plan for plan in scheduling_plans}
+        for backend_name in self.backends:
+            tracker = self._get_backend_plan_tracker(backend_name)
+            msg = tracker.generate_delta(backend_name_2_plan.get(backend_name))
+            if msg is None:
+                continue
+
             self.queue_pusher.push(backend_name, msg)
 
-            for cplan in plan.compository_model_plans:
+            for cplan in msg.unscheduling.compository_model_plans:
                 self._log(
-                    f"Deallocating {cplan.model_uuid} to backend {plan.backend_name}"
+                    f"Deallocating {cplan.model_uuid} to backend {backend_name} - sessions: {cplan.session_uuid_list}"
                 )
 
-        for plan in scheduling_plans:
-            msg = NxsMsgSchedulePlans(plan=plan)
-            backend_name = plan.backend_name
-            self.queue_pusher.push(backend_name, msg)
-
-            for cplan in plan.compository_model_plans:
+            for cplan in msg.scheduling.compository_model_plans:
                 self._log(
-                    f"Allocating {cplan.model_uuid} to backend {plan.backend_name}"
+                    f"Allocating {cplan.model_uuid} to backend {backend_name} - sessions: {cplan.session_uuid_list}"
                 )
 
+            self._log(f"Sent plan version {msg.version} to backend {backend_name}")
+
         self.last_requests = _scheduling_requests
 
         scheduling_log = NxsSchedulerLog()
@@ -383,6 +408,7 @@ class NxsSchedulerProcess:
             backend = self.backends.pop(backend_name)
             self.cpu_backends.pop(backend_name, None)
             self.gpu_backends.pop(backend_name, None)
+            self.backend_plan_trackers.pop(backend_name, None)
             backend.remove(self.state_db)
 
             # print(f"Backend {backend_name} has been removed from system!")
@@ -409,7 +435,9 @@ if __name__ == "__main__":
 
     state_db = create_simple_key_value_db_from_args(args, NxsSimpleKeyValueDbType.REDIS)
 
-    policy = SimpleSchedulingPolicyv2()
+    policy = NxsSchedulingPolicyFactory.create_scheduling_policy(
+        NxsSchedulingPolicyType(args.scheduling_policy)
+    )
 
     scheduler = NxsSchedulerProcess(
         args, queue_puller, queue_pusher, state_db, main_db, policy
@@ -1,17 +1,23 @@
+import heapq
+import json
 import pickle
+import sys
+import time
 import numpy as np
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from enum import Enum
 from nxs_types import DataModel
 
 from nxs_types.infer import NxsInferRequest
+from nxs_types.model import ProfileUnit
 
 
 class BackendDispatcherType(str, Enum):
     BASIC = "basic"
     BASIC_SLA = "basic_sla"
     BASIC_MONITORING = "basic_monitoring"
+    EDF = "edf"
 
 
 class BackendDispatcherExceptionInvalidType(Exception):
@@ -24,6 +30,39 @@ class DispatcherResult(DataModel):
     to_drop: List[NxsInferRequest] = []
 
 
+def get_request_session_param(request: NxsInferRequest, name: str, default: float):
+    # session params (see /sessions/create) are attached to each request, frontends
+    # send them as json
+    if not request.extra_params:
+        return default
+
+    try:
+        extra_params = json.loads(request.extra_params)
+    except:
+        try:
+            extra_params = pickle.loads(request.extra_params)
+        except:
+            return default
+
+    if not isinstance(extra_params, Dict):
+        return default
+
+    try:
+        return float(extra_params.get(name, default))
+    except:
+        return default
+
+
+def get_request_sla(request: NxsInferRequest) -> float:
+    # in ms, 0 if the session has none
+    return get_request_session_param(request, "sla", 0)
+
+
+def get_request_weight(request: NxsInferRequest) -> float:
+    # share of the model the session gets relative to other sessions when overloaded
+    return get_request_session_param(request, "weight", 1.0)
+
+
 class BackendDispatcher(ABC):
     def __init__(self, extra_params={}) -> None:
         super().__init__()
@@ -49,6 +88,10 @@ class BackendDispatcher(ABC):
     def get_stats_summary(self) -> Dict:
         raise NotImplementedError
 
+    def update_profile(self, profile: List[ProfileUnit]) -> None:
+        # called with the profile measured on this backend, once available
+        pass
+
 
 class BackendBasicDispatcher(BackendDispatcher):
     def __init__(self, extra_params={}) -> None:
@@ -123,14 +166,142 @@ class BackendBasicMonitoringDispatcher(BackendBasicDispatcher):
             "max": np.mean([stats["max"] for stats in latency_stats]),
         }
 
+        # fraction of requests with an sla that finished after their deadline
+        num_sla_reqs, num_sla_misses = self._get_sla_counts()
+        sla_miss_rate = num_sla_misses / num_sla_reqs if num_sla_reqs > 0 else 0
+
+        batch_size_hist = {}
+        for stats in self.states_cache:
+            for model_uuid, model_hist in stats.get("batch_size_hist", {}).items():
+                merged_hist = batch_size_hist.setdefault(model_uuid, {})
+                for bs, count in model_hist.items():
+                    merged_hist[bs] = merged_hist.get(bs, 0) + count
+
         response = {
             "total_reqs": self.total_processed_reqs,
             "fps": fps,
             "latency": latency,
+            "batch_size_hist": batch_size_hist,
+            "sla_miss_rate": sla_miss_rate,
         }
 
         return response
 
+    def _get_sla_counts(self) -> Tuple[int, int]:
+        num_sla_reqs = sum(stats.get("num_sla_reqs", 0) for stats in self.states_cache)
+        num_sla_misses = sum(
+            stats.get("num_sla_misses", 0) for stats in self.states_cache
+        )
+        return num_sla_reqs, num_sla_misses
+
+
+# Earliest-deadline-first dispatcher. Requests wait in a heap keyed by their deadline
+# (set from the session's sla and the request's arrival time, see BackendInputProcess)
+# and only a few batches at a time are released to the preprocessors, so under
+# overload requests queue here, in deadline order, instead of in fifo stage queues.
+# Requests that cannot meet their deadline anymore, even as a batch of one, are
+# dropped: they are sent on as FAILED rather than computed for nothing, and count as
+# sla misses. Requests without an sla get a soft deadline best_effort_slack_secs
+# after arrival so they are not starved.
+class BackendEdfDispatcher(BackendBasicMonitoringDispatcher):
+    def __init__(
+        self,
+        extra_params={},
+        max_cache_size: int = 30,
+        max_scheduled_batches: int = 2,
+        best_effort_slack_secs: float = 1.0,
+    ) -> None:
+        super().__init__(extra_params, max_cache_size)
+        self.input_process = extra_params["input_process"]
+        self.max_scheduled_batches = max_scheduled_batches
+        self.best_effort_slack_secs = best_effort_slack_secs
+
+        # registered profile until the one measured on this backend is available
+        self.min_service_secs = self._get_min_service_secs(
+            self.input_process.component_model.profile
+        )
+
+        # (deadline, arrival order, has_sla, request)
+        self.heap: List[Tuple[float, int, bool, NxsInferRequest]] = []
+        self.num_arrived = 0
+
+        self.num_dropped = 0  # since last update_stats
+        self.dropped_cache: List[int] = []
+
+    def dispatch(self, requests: List[NxsInferRequest]) -> DispatcherResult:
+        cur_ts = time.time()
+
+        for request in requests:
+            deadline = self.input_process.get_request_deadline(request)
+            has_sla = deadline is not None
+            if not has_sla:
+                deadline = cur_ts + self.best_effort_slack_secs
+
+            heapq.heappush(self.heap, (deadline, self.num_arrived, has_sla, request))
+            self.num_arrived += 1
+
+        num_free_slots = self._get_num_free_slots()
+
+        to_schedule = []
+        to_drop = []
+        while self.heap:
+            deadline, _, has_sla, request = self.heap[0]
+
+            if has_sla and deadline < cur_ts + self.min_service_secs:
+                heapq.heappop(self.heap)
+                to_drop.append(request)
+                continue
+
+            if len(to_schedule) >= num_free_slots:
+                break
+
+            heapq.heappop(self.heap)
+            to_schedule.append(request)
+
+        self.num_dropped += len(to_drop)
+
+        return DispatcherResult(to_schedule=to_schedule, to_drop=to_drop)
+
+    def update_profile(self, profile: List[ProfileUnit]) -> None:
+        self.min_service_secs = self._get_min_service_secs(profile)
+
+    def _get_min_service_secs(self, profile: List[ProfileUnit]) -> float:
+        # a request cannot get through this model faster than a batch of one
+        latencies = [profile_unit.latency_e2e.mean for profile_unit in profile]
+        if not latencies:
+            return 0
+        return min(latencies) / 1000.0
+
+    def _get_num_free_slots(self) -> int:
+        if self.input_process.stop_flag.value:
+            # exiting, let everything through
+            return sys.maxsize
+
+        try:
+            num_buffered = self.input_process.output.get_num_buffered_items(
+                self.input_process.next_topic_name
+            )
+        except:
+            # e.g. redis outputs cannot tell, keep the fifo behavior
+            return sys.maxsize
+
+        max_scheduled = self.max_scheduled_batches * self.input_process.max_batch_size
+        return max(0, max_scheduled - num_buffered)
+
+    def update_stats(self, stats: Dict = {}) -> None:
+        super().update_stats(stats)
+
+        # keep drops aligned with states_cache
+        if len(self.dropped_cache) > self.max_cache_size:
+            self.dropped_cache.pop(0)
+        self.dropped_cache.append(self.num_dropped)
+        self.num_dropped = 0
+
+    def _get_sla_counts(self) -> Tuple[int, int]:
+        num_sla_reqs, num_sla_misses = super()._get_sla_counts()
+        num_dropped = sum(self.dropped_cache)
+        return num_sla_reqs + num_dropped, num_sla_misses + num_dropped
+
 
 class BackendBasicSlaDispatcher(BackendDispatcher):
     def __init__(self, extra_params={}) -> None:
@@ -143,34 +314,17 @@ class BackendBasicSlaDispatcher(BackendDispatcher):
         nonsla_requests: List[NxsInferRequest] = []
 
         for request in requests:
-            try:
-                # extra_params = json.loads(request.extra_params)
-                extra_params = pickle.loads(request.extra_params)
-                assert isinstance(extra_params, Dict)
-            except:
-                extra_params = {}
-
-            if "sla" in extra_params:
-                sla = 0
-                try:
-                    sla = float(extra_params.get("sla", 0))
-                except:
-                    sla = 0
-
-                if sla > 0:
-                    sla_requests.append(request)
-                    slas.append(sla)
-                else:
-                    # treat invalid requests as non-sla requests
-                    nonsla_requests.append(request)
+            sla = get_request_sla(request)
+            if sla > 0:
+                sla_requests.append(request)
+                slas.append(sla)
             else:
+                # treat invalid requests as non-sla requests
                 nonsla_requests.append(request)
 
-        # sort sla-requests based on sla-requirements
-        zipped_lists = zip(slas, sla_requests)
-        sorted_pairs = sorted(zipped_lists)
-        tuples = zip(*sorted_pairs)
-        slas, sla_requests = tuples
+        # sort sla-requests based on sla-requirements, stable for equal slas
+        order = sorted(range(len(sla_requests)), key=lambda idx: slas[idx])
+        sla_requests = [sla_requests[idx] for idx in order]
 
         # schedule sla_requests first
         to_schedule = []
@@ -202,7 +356,11 @@ class BackendDispatcherFactory:
     def create_dispatcher(type: BackendDispatcherType, **kwargs) -> BackendDispatcher:
         if type == BackendDispatcherType.BASIC:
             return BackendBasicDispatcher(**kwargs)
+        elif type == BackendDispatcherType.BASIC_SLA:
+            return BackendBasicSlaDispatcher(**kwargs)
         elif type == BackendDispatcherType.BASIC_MONITORING:
             return BackendBasicMonitoringDispatcher(**kwargs)
+        elif type == BackendDispatcherType.EDF:
+            return BackendEdfDispatcher(**kwargs)
 
         raise BackendDispatcherExceptionInvalidType
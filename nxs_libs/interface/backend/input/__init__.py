@@ -1,15 +1,28 @@
+import queue
+import time
 from abc import ABC, abstractmethod
 from typing import Dict, List
 from enum import Enum
+from multiprocessing import Pipe
+from multiprocessing.connection import wait
+from threading import Lock, Thread
 from nxs_libs.queue import NxsQueuePullerFactory, NxsQueueType
+from nxs_libs.serialization import decode_if_encoded
+from nxs_libs.shared_memory import NxsSharedMemoryArena, NxsSharedMemorySlotDescriptor
 
-from nxs_libs.queue.nxs_redis_queue import NxsRedisQueuePuller
+from nxs_libs.queue.nxs_redis_queue import (
+    NxsRedisMultiTopicQueuePuller,
+    NxsRedisQueuePuller,
+)
 
 
 class BackendInputInterfaceType(str, Enum):
     MULTIPROCESSING_SHARED_LIST = "mt_shared_list"
     MULTIPROCESSING_QUEUE = "mt_queue"
     REDIS = "redis"
+    REDIS_SESSION = "redis_session"
+    SHARED_MEMORY = "shared_memory"
+    LOCAL_QUEUE = "local_queue"
 
 
 class BackendInputInterfaceExceptionInvalidType(Exception):
@@ -39,6 +52,14 @@ class BackendInputInterface(ABC):
     def set_num_partitions(self, num_partitions: int):
         raise NotImplementedError
 
+    def get_wait_handle(self):
+        # object usable with multiprocessing.connection.wait(), None if not supported
+        return None
+
+    def reset_wait_handle(self):
+        # called once the handle was seen ready, before the input is pulled
+        pass
+
 
 class BackendInputFromRedisQueue(BackendInputInterface):
     def __init__(self, **kwargs) -> None:
@@ -63,6 +84,40 @@ class BackendInputFromRedisQueue(BackendInputInterface):
         self.queue.set_num_partitions(num_partitions)
 
 
+class BackendInputFromRedisSession(BackendInputInterface):
+    # one session topic of a puller shared by all sessions of a model
+    def __init__(
+        self, puller: NxsRedisMultiTopicQueuePuller, topic: str, session_uuid: str
+    ) -> None:
+        super().__init__()
+        self.puller = puller
+        self.topic = f"{topic}_{session_uuid}"
+        self.puller.add_topic(self.topic)
+
+    def get_batch(self, external_data: Dict = {}) -> List:
+        return self.puller.pull_topic(self.topic)
+
+    def close_and_get_remains(self, external_data: Dict = {}):
+        return self.puller.remove_topic(self.topic)
+
+    def set_buf_size(self, size: int):
+        # the puller caps every topic at the same size
+        self.puller.set_buf_size(size)
+
+    def get_num_buffered_items(self) -> int:
+        return self.puller.get_topic_num_buffered_items(self.topic)
+
+    def set_num_partitions(self, num_partitions: int):
+        self.puller.set_topic_num_partitions(self.topic, num_partitions)
+
+    def get_wait_handle(self):
+        # shared by all sessions of the puller
+        return self.puller.get_wait_handle()
+
+    def reset_wait_handle(self):
+        self.puller.clear_notification()
+
+
 class BackendInputFromMultiprocessingSharedList(BackendInputInterface):
     def __init__(self, mp_shared_list) -> None:
         super().__init__()
@@ -81,7 +136,7 @@ class BackendInputFromMultiprocessingSharedList(BackendInputInterface):
         for _ in range(queue_len):
             try:
                 data = self.mp_shared_list.pop(0)
-                batch.append(data)
+                batch.append(decode_if_encoded(data))
             except:
                 break
 
@@ -101,29 +156,41 @@ class BackendInputFromMultiprocessingSharedList(BackendInputInterface):
 
 
 class BackendInputFromMultiprocessingQueue(BackendInputInterface):
-    def __init__(self, mp_queue) -> None:
+    def __init__(self, mp_queue, max_drain_secs: float = 1.0) -> None:
         super().__init__()
         self.mp_queue = mp_queue
+        self.max_drain_secs = max_drain_secs
 
     def get_batch(self, external_data: Dict = {}) -> List:
-
-        if self.mp_queue.empty():
-            return []
-
+        # never blocks, empty()/qsize() may lag behind the feeder thread of the
+        # producer so keep reading until the queue says it is empty
         batch = []
 
-        queue_len = min(self.mp_queue.qsize(), external_data.get("max_items", 32))
-        try:
-            for _ in range(queue_len):
-                data = self.mp_queue.get(block=True, timeout=0.01)
-                batch.append(data)
-        except:
-            pass
+        max_items = external_data.get("max_items", 32)
+        while len(batch) < max_items:
+            try:
+                data = self.mp_queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(decode_if_encoded(data))
 
         return batch
 
     def close_and_get_remains(self, external_data: Dict = {}):
-        return self.get_batch()
+        # producers have stopped, qsize() also counts items their feeder threads
+        # have not written into the pipe yet. A producer killed before flushing
+        # leaves the count above 0 forever, hence the overall deadline.
+        remains = []
+        deadline = time.time() + self.max_drain_secs
+        while True:
+            batch = self.get_batch(external_data)
+            remains.extend(batch)
+            if not batch:
+                if self.get_num_buffered_items() <= 0 or time.time() > deadline:
+                    break
+                wait([self.get_wait_handle()], timeout=0.01)
+
+        return remains
 
     def set_buf_size(self, size: int):
         pass
@@ -134,6 +201,115 @@ class BackendInputFromMultiprocessingQueue(BackendInputInterface):
     def set_num_partitions(self, num_partitions: int):
         pass
 
+    def get_wait_handle(self):
+        return self.mp_queue._reader
+
+
+class BackendInputFromSharedMemory(BackendInputFromMultiprocessingQueue):
+    # mp queue carrying slot descriptors, tensors are mapped from the arena without copying
+    def __init__(
+        self, mp_queue, arena: NxsSharedMemoryArena, max_drain_secs: float = 1.0
+    ) -> None:
+        super().__init__(mp_queue, max_drain_secs)
+        self.arena = arena
+        self.arena.register_consumer()
+
+    def get_batch(self, external_data: Dict = {}) -> List:
+        batch = super().get_batch(external_data)
+
+        for idx, item in enumerate(batch):
+            if isinstance(item, tuple) and isinstance(
+                item[0], NxsSharedMemorySlotDescriptor
+            ):
+                batch[idx] = (self.arena.read(item[0]),) + item[1:]
+
+        return batch
+
+
+class BackendInputFromLocalQueue(BackendInputInterface):
+    # requests handed over by cmodels co-located on the same backend, through a
+    # multiprocessing manager queue of wire-encoded batches (see
+    # BackendOutputToLocalFirst). A thread blocks on the queue and buffers about
+    # buf_size items, so the stage can wait on a pipe instead of polling the manager and
+    # a full buffer makes producers fall back to redis.
+    def __init__(self, queue, buf_size: int = 32) -> None:
+        super().__init__()
+        self.queue = queue
+        self.buf_size = buf_size
+
+        self.lock = Lock()
+        self.buf = []
+
+        self.notify_reader, self.notify_writer = Pipe(duplex=False)
+        self.is_notified = False
+
+        self.max_timeout_secs = 0.1
+
+        self.reader_thread_alive_flag = True
+        self.reader_thread = Thread(target=self._reader_thread_fn, args=())
+        self.reader_thread.start()
+
+    def _reader_thread_fn(self):
+        while self.reader_thread_alive_flag:
+            if self.get_num_buffered_items() >= self.buf_size:
+                time.sleep(0.001)
+                continue
+
+            try:
+                items = self.queue.get(timeout=self.max_timeout_secs)
+            except queue.Empty:
+                continue
+            except:
+                # manager is shutting down
+                time.sleep(0.01)
+                continue
+
+            with self.lock:
+                self.buf.extend(items)
+                if not self.is_notified:
+                    self.notify_writer.send_bytes(b"1")
+                    self.is_notified = True
+
+    def get_batch(self, external_data: Dict = {}) -> List:
+        with self.lock:
+            batch = self.buf
+            self.buf = []
+
+        return [decode_if_encoded(data) for data in batch]
+
+    def close_and_get_remains(self, external_data: Dict = {}):
+        self.reader_thread_alive_flag = False
+        self.reader_thread.join()
+
+        remains = self.get_batch()
+        while True:
+            try:
+                items = self.queue.get_nowait()
+            except:
+                break
+            remains.extend(decode_if_encoded(data) for data in items)
+
+        return remains
+
+    def set_buf_size(self, size: int):
+        self.buf_size = size
+
+    def get_num_buffered_items(self) -> int:
+        with self.lock:
+            return len(self.buf)
+
+    def set_num_partitions(self, num_partitions: int):
+        pass
+
+    def get_wait_handle(self):
+        return self.notify_reader
+
+    def reset_wait_handle(self):
+        with self.lock:
+            while self.notify_reader.poll():
+                self.notify_reader.recv_bytes()
+            self.is_notified = False
+
 
 class BackendInputInterfaceFactory:
     @staticmethod
@@ -146,5 +322,11 @@ class BackendInputInterfaceFactory:
             return BackendInputFromMultiprocessingQueue(**kwargs)
         elif type == BackendInputInterfaceType.REDIS:
             return BackendInputFromRedisQueue(**kwargs)
+        elif type == BackendInputInterfaceType.REDIS_SESSION:
+            return BackendInputFromRedisSession(**kwargs)
+        elif type == BackendInputInterfaceType.SHARED_MEMORY:
+            return BackendInputFromSharedMemory(**kwargs)
+        elif type == BackendInputInterfaceType.LOCAL_QUEUE:
+            return BackendInputFromLocalQueue(**kwargs)
 
         raise BackendInputInterfaceExceptionInvalidType
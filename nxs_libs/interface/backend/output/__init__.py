@@ -1,13 +1,23 @@
+import queue
+import time
 from abc import ABC, abstractmethod
 from typing import Dict, List
 from enum import Enum
+
+import numpy as np
 from nxs_libs.queue import NxsQueuePusherFactory, NxsQueueType
+from nxs_libs.serialization import encode_if_supported
+from nxs_libs.shared_memory import NxsSharedMemoryArena
+from nxs_utils.logging import NxsLogLevel, write_log
 
 
 class BackendOutputInterfaceType(str, Enum):
     MULTIPROCESSING_SHARED_LIST = "mt_shared_list"
     MULTIPROCESSING_QUEUE = "mt_queue"
     REDIS = "redis"
+    SHARED_MEMORY = "shared_memory"
+    LEAST_LOADED = "least_loaded"
+    LOCAL_FIRST = "local_first"
 
 
 class BackendOutputInterfaceExceptionInvalidType(Exception):
@@ -33,8 +43,7 @@ class BackendOutputToRedisQueue(BackendOutputInterface):
         )
 
     def put_batch(self, topic: str, batch: List, external_data: Dict = {}) -> None:
-        for item in batch:
-            self.queue.push(topic, item)
+        self.queue.push_many(topic, batch)
 
     def get_num_buffered_items(self, topic: str):
         # FIXME: should aggregate #num_items in redis cluster
@@ -48,7 +57,7 @@ class BackendOutputToMultiprocessingList(BackendOutputInterface):
 
     def put_batch(self, topic: str, batch: List, external_data: Dict = {}) -> None:
         for item in batch:
-            self.mp_shared_list.append(item)
+            self.mp_shared_list.append(encode_if_supported(item))
 
     def get_num_buffered_items(self, topic: str):
         return len(self.mp_shared_list)
@@ -61,12 +70,156 @@ class BackendOutputToMultiprocessingQueue(BackendOutputInterface):
 
     def put_batch(self, topic: str, batch: List, external_data: Dict = {}) -> None:
         for item in batch:
-            self.mp_queue.put(item)
+            self.mp_queue.put(encode_if_supported(item))
 
     def get_num_buffered_items(self, topic: str):
         return self.mp_queue.qsize()
 
 
+class BackendOutputToSharedMemory(BackendOutputToMultiprocessingQueue):
+    # (tensors_dict, metadata) items get their tensors copied into an arena slot and
+    # only the slot descriptor goes through the queue, anything else is sent as-is.
+    # Either way callers can reuse their tensor buffers once put_batch returns.
+    def __init__(self, mp_queue, arena: NxsSharedMemoryArena) -> None:
+        super().__init__(mp_queue)
+        self.arena = arena
+
+    def put_batch(self, topic: str, batch: List, external_data: Dict = {}) -> None:
+        for item in batch:
+            if isinstance(item, tuple) and isinstance(item[0], dict):
+                desc = self.arena.write(item[0])
+                if desc is not None:
+                    item = (desc,) + item[1:]
+                else:
+                    # the queue pickles in the background, snapshot the tensors now
+                    data = {
+                        key: np.array(value) if isinstance(value, np.ndarray) else value
+                        for key, value in item[0].items()
+                    }
+                    item = (data,) + item[1:]
+            self.mp_queue.put(encode_if_supported(item))
+
+
+class BackendOutputToLeastLoaded(BackendOutputInterface):
+    # spreads items over several outputs (e.g. one queue per compute instance), each
+    # item goes to the output with the fewest buffered items
+    def __init__(self, output_interface_args_list: List[Dict]) -> None:
+        super().__init__()
+        self.outputs: List[BackendOutputInterface] = []
+        for args in output_interface_args_list:
+            self.outputs.append(
+                BackendOutputInterfaceFactory.create_input_interface(**args)
+            )
+        self.next_idx = 0
+
+    def select_output(self, topic: str) -> BackendOutputInterface:
+        best_idx = self.next_idx
+        best_num_items = None
+        for i in range(len(self.outputs)):
+            # start from a rotating index so ties are broken round-robin
+            idx = (self.next_idx + i) % len(self.outputs)
+            try:
+                num_items = self.outputs[idx].get_num_buffered_items(topic)
+            except NotImplementedError:
+                num_items = 0
+            if best_num_items is None or num_items < best_num_items:
+                best_idx = idx
+                best_num_items = num_items
+
+        self.next_idx = (best_idx + 1) % len(self.outputs)
+
+        return self.outputs[best_idx]
+
+    def put_batch(self, topic: str, batch: List, external_data: Dict = {}) -> None:
+        for item in batch:
+            self.select_output(topic).put_batch(topic, [item], external_data)
+
+    def get_num_buffered_items(self, topic: str):
+        return sum(output.get_num_buffered_items(topic) for output in self.outputs)
+
+
+class BackendOutputToLocalFirst(BackendOutputInterface):
+    # items for the input of a cmodel running on this backend skip redis: topics are
+    # looked up in local_session_topics ("{cmodel_uuid}_{session_uuid}" -> cmodel_uuid)
+    # and items are put into that cmodel's queue in local_input_queues, both manager
+    # dicts maintained by the backend. Anything else, or what does not fit in a local
+    # queue, goes to redis. The topic map is refreshed every refresh_secs.
+    # Manager queues cost a round trip to the manager process per put, so each batch
+    # goes as a single list of wire-encoded items (tensors included).
+    def __init__(
+        self,
+        local_session_topics,
+        local_input_queues,
+        refresh_secs: float = 1,
+        **kwargs,
+    ) -> None:
+        super().__init__()
+        self.redis_output = BackendOutputToRedisQueue(**kwargs)
+
+        self.local_session_topics = local_session_topics
+        self.local_input_queues = local_input_queues
+        self.refresh_secs = refresh_secs
+
+        self.topic2cmodel_uuid: Dict[str, str] = {}
+        self.cmodel_uuid2queue: Dict = {}
+        self.refresh_t0 = 0
+
+        self._log_level = NxsLogLevel.INFO
+        self._logging_prefix = "BackendOutputToLocalFirst"
+
+    def _get_local_queue(self, topic: str):
+        if time.time() - self.refresh_t0 > self.refresh_secs:
+            try:
+                self.topic2cmodel_uuid = dict(self.local_session_topics)
+            except:
+                self.topic2cmodel_uuid = {}
+            self.refresh_t0 = time.time()
+
+            # let go of queues of removed cmodels, the backend drains them into redis
+            cmodel_uuids = set(self.topic2cmodel_uuid.values())
+            for cmodel_uuid in list(self.cmodel_uuid2queue.keys()):
+                if cmodel_uuid not in cmodel_uuids:
+                    self.cmodel_uuid2queue.pop(cmodel_uuid)
+
+        cmodel_uuid = self.topic2cmodel_uuid.get(topic)
+        if cmodel_uuid is None:
+            return None
+
+        if cmodel_uuid not in self.cmodel_uuid2queue:
+            try:
+                self.cmodel_uuid2queue[cmodel_uuid] = self.local_input_queues.get(
+                    cmodel_uuid
+                )
+            except:
+                return None
+
+        return self.cmodel_uuid2queue[cmodel_uuid]
+
+    def put_batch(self, topic: str, batch: List, external_data: Dict = {}) -> None:
+        if not batch:
+            return
+
+        local_queue = self._get_local_queue(topic)
+        if local_queue is not None:
+            try:
+                local_queue.put_nowait([encode_if_supported(item) for item in batch])
+                return
+            except queue.Full:
+                pass
+            except Exception as e:
+                # e.g. the cmodel is being removed and its queue is gone
+                self._log(f"Failed to put {len(batch)} items to {topic} locally: {e}")
+                self.cmodel_uuid2queue.pop(self.topic2cmodel_uuid.get(topic), None)
+
+        self.redis_output.put_batch(topic, batch, external_data)
+
+    def get_num_buffered_items(self, topic: str):
+        raise NotImplementedError
+
+    def _log(self, log):
+        write_log(self._logging_prefix, log, self._log_level)
+
+
 class BackendOutputInterfaceFactory:
     @staticmethod
     def create_input_interface(
@@ -78,5 +231,11 @@ class BackendOutputInterfaceFactory:
             return BackendOutputToMultiprocessingQueue(**kwargs)
         elif type == BackendOutputInterfaceType.REDIS:
             return BackendOutputToRedisQueue(**kwargs)
+        elif type == BackendOutputInterfaceType.SHARED_MEMORY:
+            return BackendOutputToSharedMemory(**kwargs)
+        elif type == BackendOutputInterfaceType.LEAST_LOADED:
+            return BackendOutputToLeastLoaded(**kwargs)
+        elif type == BackendOutputInterfaceType.LOCAL_FIRST:
+            return BackendOutputToLocalFirst(**kwargs)
 
         raise BackendOutputInterfaceExceptionInvalidType
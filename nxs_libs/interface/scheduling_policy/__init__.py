@@ -1,5 +1,6 @@
 from typing import Dict, List, Tuple
 from abc import ABC, abstractmethod
+from enum import Enum
 from nxs_types.backend import BackendInfo
 from nxs_types.scheduling_data import NxsSchedulingPlan, NxsSchedulingRequest
 
@@ -25,3 +26,33 @@ class BaseSchedulingPolicy(ABC):
     @abstractmethod
     def update_backend_runtime_stats(self, backend_name: str, backend_states: Dict):
         raise NotImplementedError
+
+
+class NxsSchedulingPolicyType(str, Enum):
+    SIMPLE = "simple"
+    SLA_AWARE = "sla_aware"
+
+
+class NxsSchedulingPolicyExceptionInvalidType(Exception):
+    pass
+
+
+class NxsSchedulingPolicyFactory:
+    @staticmethod
+    def create_scheduling_policy(
+        type: NxsSchedulingPolicyType, **kwargs
+    ) -> BaseSchedulingPolicy:
+        if type == NxsSchedulingPolicyType.SIMPLE:
+            from nxs_libs.interface.scheduling_policy.simple_policy_v2 import (
+                SimpleSchedulingPolicyv2,
+            )
+
+            return SimpleSchedulingPolicyv2(**kwargs)
+        elif type == NxsSchedulingPolicyType.SLA_AWARE:
+            from nxs_libs.interface.scheduling_policy.sla_aware_policy import (
+                SlaAwareSchedulingPolicy,
+            )
+
+            return SlaAwareSchedulingPolicy(**kwargs)
+
+        raise NxsSchedulingPolicyExceptionInvalidType
@@ -1,9 +1,9 @@
 import math
-from typing import List, Tuple, Dict
+from typing import Dict, List, Set, Tuple
 
 from nxs_libs.interface.scheduling_policy import BaseSchedulingPolicy
 from nxs_types import scheduling_data
-from nxs_types.backend import BackendInfo
+from nxs_types.backend import BackendInfo, NxsBackendType
 from nxs_types.model import (
     LatencyMeasurement,
     NxsCompositoryModel,
@@ -40,18 +40,167 @@ class RequiredResouce:
         self.min_gpu_mem: float = 0
 
 
+# Holds the per-session scheduling plans together with indexes over them, so lookups
+# such as "which backends run this cmodel" or "which cmodels run on this backend" do
+# not need to scan every session's plans. Plans must only be changed through this
+# class. Returned sets are the indexes themselves, copy them before modifying the
+# store while iterating.
+class NxsSimpleSchedulingPlanStore:
+    def __init__(self) -> None:
+        # session_uuid -> cmodel_uuid -> plan, plans always have at least one backend
+        self.session_plans: Dict[
+            str, Dict[str, NxsSimpleSchedulingPerCompositoryModelPlan]
+        ] = {}
+
+        # (cmodel_uuid, backend_name) -> sessions served by that deployment
+        self.deployment_sessions: Dict[Tuple[str, str], Set[str]] = {}
+        self.cmodel_backends: Dict[str, Set[str]] = {}
+        self.backend_cmodels: Dict[str, Set[str]] = {}
+        self.cmodel_sessions: Dict[str, Set[str]] = {}
+
+    def has_session(self, session_uuid: str) -> bool:
+        return session_uuid in self.session_plans
+
+    def get_session_uuids(self) -> List[str]:
+        return list(self.session_plans.keys())
+
+    def get_plans(
+        self, session_uuid: str
+    ) -> List[NxsSimpleSchedulingPerCompositoryModelPlan]:
+        return list(self.session_plans.get(session_uuid, {}).values())
+
+    def get_all_plans(self) -> List[NxsSimpleSchedulingPerCompositoryModelPlan]:
+        plans = []
+        for cmodel_plans in self.session_plans.values():
+            plans.extend(cmodel_plans.values())
+        return plans
+
+    def get_cmodel_backend_names(self, cmodel_uuid: str) -> Set[str]:
+        return self.cmodel_backends.get(cmodel_uuid, set())
+
+    def get_backend_cmodel_uuids(self, backend_name: str) -> Set[str]:
+        return self.backend_cmodels.get(backend_name, set())
+
+    def get_cmodel_session_uuids(self, cmodel_uuid: str) -> Set[str]:
+        return self.cmodel_sessions.get(cmodel_uuid, set())
+
+    def get_deployment_session_uuids(
+        self, cmodel_uuid: str, backend_name: str
+    ) -> Set[str]:
+        return self.deployment_sessions.get((cmodel_uuid, backend_name), set())
+
+    def get_backend_plan(
+        self, cmodel_uuid: str, backend_name: str
+    ) -> NxsSimpleSchedulingPerBackendPlan:
+        # plan of any session using this deployment, they are all equivalent
+        for session_uuid in self.get_deployment_session_uuids(
+            cmodel_uuid, backend_name
+        ):
+            cmodel_plan = self.session_plans[session_uuid][cmodel_uuid]
+            for backend_plan in cmodel_plan.backend_plans:
+                if backend_plan.backend_name == backend_name:
+                    return backend_plan
+        return None
+
+    def add_backend_plan(
+        self,
+        session_uuid: str,
+        cmodel_uuid: str,
+        backend_plan: NxsSimpleSchedulingPerBackendPlan,
+    ) -> bool:
+        backend_name = backend_plan.backend_name
+        session_uuids = self.deployment_sessions.setdefault(
+            (cmodel_uuid, backend_name), set()
+        )
+        if session_uuid in session_uuids:
+            return False
+
+        cmodel_plans = self.session_plans.setdefault(session_uuid, {})
+        if cmodel_uuid not in cmodel_plans:
+            cmodel_plans[cmodel_uuid] = NxsSimpleSchedulingPerCompositoryModelPlan(
+                model_uuid=cmodel_uuid,
+                session_uuid=session_uuid,
+                backend_plans=[],
+            )
+        cmodel_plans[cmodel_uuid].backend_plans.append(backend_plan)
+
+        session_uuids.add(session_uuid)
+        self.cmodel_backends.setdefault(cmodel_uuid, set()).add(backend_name)
+        self.backend_cmodels.setdefault(backend_name, set()).add(cmodel_uuid)
+        self.cmodel_sessions.setdefault(cmodel_uuid, set()).add(session_uuid)
+
+        return True
+
+    def remove_backend_plan(
+        self, session_uuid: str, cmodel_uuid: str, backend_name: str
+    ) -> bool:
+        session_uuids = self.deployment_sessions.get((cmodel_uuid, backend_name))
+        if not session_uuids or session_uuid not in session_uuids:
+            return False
+
+        cmodel_plans = self.session_plans[session_uuid]
+        cmodel_plan = cmodel_plans[cmodel_uuid]
+        cmodel_plan.backend_plans = [
+            backend_plan
+            for backend_plan in cmodel_plan.backend_plans
+            if backend_plan.backend_name != backend_name
+        ]
+
+        session_uuids.discard(session_uuid)
+        if not session_uuids:
+            # nobody uses this deployment anymore
+            self.deployment_sessions.pop((cmodel_uuid, backend_name))
+            self._discard(self.cmodel_backends, cmodel_uuid, backend_name)
+            self._discard(self.backend_cmodels, backend_name, cmodel_uuid)
+
+        if not cmodel_plan.backend_plans:
+            cmodel_plans.pop(cmodel_uuid)
+            self._discard(self.cmodel_sessions, cmodel_uuid, session_uuid)
+
+        if not cmodel_plans:
+            self.session_plans.pop(session_uuid)
+
+        return True
+
+    def remove_session(self, session_uuid: str):
+        for cmodel_plan in self.get_plans(session_uuid):
+            for backend_plan in list(cmodel_plan.backend_plans):
+                self.remove_backend_plan(
+                    session_uuid, cmodel_plan.model_uuid, backend_plan.backend_name
+                )
+
+    def _discard(self, index: Dict[str, Set[str]], key: str, value: str):
+        values = index.get(key)
+        if values is None:
+            return
+        values.discard(value)
+        if not values:
+            index.pop(key)
+
+
 class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
     MAX_MODELS_PER_BACKEND = 5
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        gpu_mem_safety_margin: float = 0.1,
+        min_duty_cycle: float = 0.05,
+        prefer_colocated_stages: bool = True,
+    ) -> None:
         super().__init__()
 
+        # fraction of each gpu's memory kept free for allocation spikes
+        self.gpu_mem_safety_margin = gpu_mem_safety_margin
+        # smallest share of gpu time a deployed replica gets on a shared gpu
+        self.min_duty_cycle = min_duty_cycle
+        # place consecutive cmodels of pipelines on the same backend when possible,
+        # backends hand requests over between them without going through redis
+        self.prefer_colocated_stages = prefer_colocated_stages
+
         self.last_requests_dict: Dict[str, NxsSchedulingRequest] = {}
         self.last_backends_dict: Dict[str, BackendInfo] = {}
 
-        self.scheduling_plans_dict: Dict[
-            str, List[NxsSimpleSchedulingPerCompositoryModelPlan]
-        ] = {}  # from session_uuid -> plans for cmodels
+        self.plan_store = NxsSimpleSchedulingPlanStore()
         self.unscheduling_plans_dict: Dict[
             str, List[NxsSimpleUnschedulingPerCompositoryModelPlan]
         ] = {}  # from session_uuid -> plans for cmodels
@@ -62,57 +211,52 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
         self.cmodels_dict: Dict[str, NxsCompositoryModel] = {}
         self.pipelines_dict: Dict[str, NxsPipelineInfo] = {}
 
+        # cmodel_uuid -> cmodels right before or after it in some pipeline
+        self.cmodel_neighbor_uuids: Dict[str, Set[str]] = {}
+
+        # cmodel_uuid -> sum of requested fps of current sessions using it
+        self.cmodel_requested_fps: Dict[str, float] = {}
+
+        # cmodel_uuid -> gpu memory (MB) one replica takes, measured if available
+        self.cmodel_gpu_mem: Dict[str, float] = {}
+        # backend_name -> gpu memory (MB) in use that no scheduled cmodel accounts
+        # for (other processes, models using more than expected...)
+        self.unaccounted_gpu_mem: Dict[str, float] = {}
+
+        # profiles measured by backends, backend_type -> model_uuid -> profile
+        self.measured_profiles: Dict[str, Dict[str, List[ProfileUnit]]] = {}
+
     def _deploy_new_pipelines(self):
         to_add_pipeline_uuids = self._compute_pipeline_uuids_to_add()
 
         # print("to_add_pipeline_uuids", to_add_pipeline_uuids)
 
+        pipeline_uuid_2_session_uuids: Dict[str, List[str]] = {}
+        for session_uuid, request in self.current_requests_dict.items():
+            pipeline_uuid = request.pipeline_info.pipeline_uuid
+            if pipeline_uuid not in pipeline_uuid_2_session_uuids:
+                pipeline_uuid_2_session_uuids[pipeline_uuid] = []
+            pipeline_uuid_2_session_uuids[pipeline_uuid].append(session_uuid)
+
         for pipeline_uuid in to_add_pipeline_uuids:
             deployed = True
             pipeline_info = self.pipelines_dict[pipeline_uuid]
-            associated_session_uuids = []
+            associated_session_uuids = pipeline_uuid_2_session_uuids.get(
+                pipeline_uuid, []
+            )
             deployment_info = []
-
-            existing_cmodel_2_plans: Dict[
-                str, NxsSimpleSchedulingPerCompositoryModelPlan
-            ] = {}
-
-            for session_uuid in self.current_requests_dict:
-                if (
-                    self.current_requests_dict[session_uuid].pipeline_info.pipeline_uuid
-                    == pipeline_uuid
-                ):
-                    associated_session_uuids.append(session_uuid)
+            existing_cmodel_uuids = []
 
             for cmodel in pipeline_info.models:
-                # search if any plans contain this cmodel
+                # reuse cmodels that are already running for other pipelines
                 cmodel_uuid = cmodel.main_model.model_uuid
-
-                existed = False
-                for session_uuid in self.scheduling_plans_dict:
-                    other_cmodel_plans = self.scheduling_plans_dict[session_uuid]
-                    for other_cmodel_plan in other_cmodel_plans:
-                        if other_cmodel_plan.model_uuid == cmodel_uuid:
-                            existed = True
-
-                            if (
-                                other_cmodel_plan.model_uuid
-                                not in existing_cmodel_2_plans
-                            ):
-                                existing_cmodel_2_plans[
-                                    other_cmodel_plan.model_uuid
-                                ] = []
-
-                            existing_cmodel_2_plans[
-                                other_cmodel_plan.model_uuid
-                            ].append(other_cmodel_plan)
-
-                if existed:
+                if self.plan_store.get_cmodel_backend_names(cmodel_uuid):
+                    existing_cmodel_uuids.append(cmodel_uuid)
                     continue
 
                 # print(f"Trying to deploy cmodel {cmodel.main_model.model_uuid}")
                 deployed_backend = self._deploy_cmodel(
-                    cmodel.main_model.model_uuid, associated_session_uuids
+                    cmodel_uuid, associated_session_uuids
                 )
 
                 if not deployed_backend:
@@ -130,69 +274,36 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
                         generate_unscheduling_plans=False,
                     )
             else:
-                # for deployed_cmodel, deployed_backend in deployment_info:
-                #     print(
-                #         f"Deployed cmodel {deployed_cmodel.main_model.model_uuid} onto backend {deployed_backend.backend_name}"
-                #     )
-
                 # add sessions associated with this pipeline into some old cmodels
                 for session_uuid in associated_session_uuids:
-                    for cmodel_uuid in existing_cmodel_2_plans:
-                        cmodel_plans = existing_cmodel_2_plans[cmodel_uuid]
-                        for cmodel_plan in cmodel_plans:
-                            if session_uuid not in self.scheduling_plans_dict:
-                                self.scheduling_plans_dict[session_uuid] = []
-
-                            self.scheduling_plans_dict[session_uuid].append(cmodel_plan)
+                    for cmodel_uuid in existing_cmodel_uuids:
+                        self._add_session_to_deployed_cmodel(session_uuid, cmodel_uuid)
+
+    def _add_session_to_deployed_cmodel(self, session_uuid: str, cmodel_uuid: str):
+        for backend_name in list(self.plan_store.get_cmodel_backend_names(cmodel_uuid)):
+            self.plan_store.add_backend_plan(
+                session_uuid,
+                cmodel_uuid,
+                self.plan_store.get_backend_plan(cmodel_uuid, backend_name),
+            )
 
     def _assign_backends_to_unscheduled_sessions(self):
-        for session_uuid in self.current_requests_dict:
-            if session_uuid in self.scheduling_plans_dict:
+        for session_uuid, request in self.current_requests_dict.items():
+            if self.plan_store.has_session(session_uuid):
                 # already scheduled
                 continue
 
-            request = self.current_requests_dict[session_uuid]
-            cmodels = request.pipeline_info.models
-            cmodel2backendplans = {}
-            cmodel2backendnames = {}
-
-            for cmodel in cmodels:
-                for other_session_uuid in self.scheduling_plans_dict:
-                    if other_session_uuid == session_uuid:
-                        continue
-
-                    other_cmodel_plans = self.scheduling_plans_dict[other_session_uuid]
-                    for other_cmodel_plan in other_cmodel_plans:
-                        if other_cmodel_plan.model_uuid == cmodel.main_model.model_uuid:
-                            if other_cmodel_plan.model_uuid not in cmodel2backendplans:
-                                cmodel2backendplans[other_cmodel_plan.model_uuid] = []
-                                cmodel2backendnames[other_cmodel_plan.model_uuid] = []
-
-                            for backend_plan in other_cmodel_plan.backend_plans:
-                                if (
-                                    backend_plan.backend_name
-                                    not in cmodel2backendnames[
-                                        other_cmodel_plan.model_uuid
-                                    ]
-                                ):
-                                    cmodel2backendnames[
-                                        other_cmodel_plan.model_uuid
-                                    ].append(backend_plan.backend_name)
-                                    cmodel2backendplans[
-                                        other_cmodel_plan.model_uuid
-                                    ].append(backend_plan)
-
-            if len(cmodels) == len(cmodel2backendplans):
+            cmodel_uuids = [
+                cmodel.main_model.model_uuid for cmodel in request.pipeline_info.models
+            ]
+
+            if all(
+                self.plan_store.get_cmodel_backend_names(cmodel_uuid)
+                for cmodel_uuid in cmodel_uuids
+            ):
                 # have enough models
-                self.scheduling_plans_dict[session_uuid] = []
-                for cmodel_uuid in cmodel2backendplans:
-                    # print(cmodel2backendplans[cmodel_uuid])
-                    new_cmodel_plan = NxsSimpleSchedulingPerCompositoryModelPlan(
-                        model_uuid=cmodel_uuid,
-                        session_uuid=session_uuid,
-                        backend_plans=cmodel2backendplans[cmodel_uuid],
-                    )
-                    self.scheduling_plans_dict[session_uuid].append(new_cmodel_plan)
+                for cmodel_uuid in cmodel_uuids:
+                    self._add_session_to_deployed_cmodel(session_uuid, cmodel_uuid)
 
     def _remove_cmodel_from_backend(
         self,
@@ -200,92 +311,64 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
         backend: BackendInfo,
         generate_unscheduling_plans=True,
     ):
-
-        to_remove_session_uuids = []
-        found_backend = False
+        cmodel_uuid = cmodel.main_model.model_uuid
+        backend_name = backend.backend_name
 
         # print("removing backend name: ", backend.backend_name)
 
-        for session_uuid in self.scheduling_plans_dict:
-            target_cmodel_plan: NxsSimpleSchedulingPerCompositoryModelPlan = None
-            cmodel_plans = self.scheduling_plans_dict[session_uuid]
-            for cmodel_plan in cmodel_plans:
-                if cmodel.main_model.model_uuid == cmodel_plan.model_uuid:
-                    target_cmodel_plan = cmodel_plan
-                    break
-
-            if target_cmodel_plan is None:
-                continue
-
-            new_backend_plans: List[NxsSimpleSchedulingPerBackendPlan] = []
-
-            for backend_plan in target_cmodel_plan.backend_plans:
-                if backend_plan.backend_name != backend.backend_name:
-                    new_backend_plans.append(backend_plan)
-                    continue
-                else:
-                    found_backend = True
-
-                    if generate_unscheduling_plans:
-                        if session_uuid not in self.unscheduling_plans_dict:
-                            self.unscheduling_plans_dict[session_uuid] = []
-                            self.unscheduling_plans_dict[session_uuid].append(
-                                NxsSimpleUnschedulingPerCompositoryModelPlan(
-                                    model_uuid=cmodel.main_model.model_uuid,
-                                    session_uuid=session_uuid,
-                                    backend_name=backend_plan.backend_name,
-                                )
-                            )
-
-            target_cmodel_plan.backend_plans = new_backend_plans
-
-            if not target_cmodel_plan.backend_plans:
-                # to_remove_session_uuids.append(session_uuid)
-
-                new_cmodel_plans: List[NxsSimpleSchedulingPerCompositoryModelPlan] = []
-
-                for cmodel_plan in self.scheduling_plans_dict[session_uuid]:
-                    if cmodel_plan.model_uuid != target_cmodel_plan.model_uuid:
-                        new_backend_plans.append(cmodel_plan)
+        session_uuids = list(
+            self.plan_store.get_deployment_session_uuids(cmodel_uuid, backend_name)
+        )
+        if not session_uuids:
+            return
 
-                self.scheduling_plans_dict[session_uuid] = new_cmodel_plans
+        # gpu memory is freed implicitly, usage is derived from the plans
+        for session_uuid in session_uuids:
+            self.plan_store.remove_backend_plan(session_uuid, cmodel_uuid, backend_name)
 
-                if not self.scheduling_plans_dict[session_uuid]:
-                    to_remove_session_uuids.append(session_uuid)
+            if generate_unscheduling_plans:
+                self._add_unscheduling_plan(session_uuid, cmodel_uuid, backend_name)
 
-        for session_uuid in to_remove_session_uuids:
-            self.scheduling_plans_dict.pop(session_uuid, None)
+    def _add_unscheduling_plan(
+        self, session_uuid: str, cmodel_uuid: str, backend_name: str
+    ):
+        if session_uuid not in self.unscheduling_plans_dict:
+            self.unscheduling_plans_dict[session_uuid] = []
 
-        if found_backend:
-            required_res = self._compute_required_resource_for_atomic_model(cmodel)
-            # print(
-            #     f"Returning {required_res.max_gpu_mem} MB from atomic model {cmodel.main_model.model_uuid} to backend {backend.backend_name}"
-            # )
-            self._return_resource_to_backend(backend, required_res)
+        self.unscheduling_plans_dict[session_uuid].append(
+            NxsSimpleUnschedulingPerCompositoryModelPlan(
+                model_uuid=cmodel_uuid,
+                session_uuid=session_uuid,
+                backend_name=backend_name,
+            )
+        )
 
     def _deploy_cmodel(self, cmodel_uuid: str, session_uuids: List[str]) -> BackendInfo:
         cmodel = self.cmodels_dict[cmodel_uuid]
         required_res = self._compute_required_resource_for_atomic_model(cmodel)
 
         # find potential backends
-        potential_backends = self._find_potential_backends(cmodel, required_res)
+        potential_backends = self._get_potential_backends(cmodel, required_res)
         if not potential_backends:
             return None
 
+        colocated_backends = self._get_colocated_backends(
+            cmodel_uuid, potential_backends
+        )
+        if colocated_backends:
+            potential_backends = colocated_backends
+
         best_backend = self._find_best_backend(potential_backends, required_res)
         if not best_backend:
             return None
 
-        self._take_resource_from_backend(best_backend, required_res)
-
-        for session_uuid in session_uuids:
-            self._add_scheduling_plan(session_uuid, cmodel, best_backend)
+        self._add_scheduling_plans(session_uuids, cmodel, best_backend)
 
         return best_backend
 
-    def _add_scheduling_plan(
+    def _add_scheduling_plans(
         self,
-        session_uuid: str,
+        session_uuids: List[str],
         cmodel: NxsCompositoryModel,
         backend: BackendInfo,
     ):
@@ -300,30 +383,58 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
                 )
             )
 
-        if session_uuid not in self.scheduling_plans_dict:
-            self.scheduling_plans_dict[session_uuid] = []
-
-        target_cmodel_plan = None
-        for cmodel_plan in self.scheduling_plans_dict[session_uuid]:
-            if cmodel_plan.model_uuid == cmodel.main_model.model_uuid:
-                target_cmodel_plan = cmodel_plan
-                break
+        # all sessions share the same deployment, hence the same backend plan
+        backend_plan = NxsSimpleSchedulingPerBackendPlan(
+            backend_name=backend.backend_name,
+            component_models_plan=component_model_plans,
+        )
 
-        if target_cmodel_plan is None:
-            target_cmodel_plan = NxsSimpleSchedulingPerCompositoryModelPlan(
-                model_uuid=cmodel.main_model.model_uuid,
-                session_uuid=session_uuid,
-                backend_plans=[],
+        for session_uuid in session_uuids:
+            self.plan_store.add_backend_plan(
+                session_uuid, cmodel.main_model.model_uuid, backend_plan
             )
-            self.scheduling_plans_dict[session_uuid].append(target_cmodel_plan)
 
-        target_cmodel_plan.backend_plans.append(
-            NxsSimpleSchedulingPerBackendPlan(
-                backend_name=backend.backend_name,
-                component_models_plan=component_model_plans,
-            )
+    def _compute_cmodel_neighbor_uuids(self) -> Dict[str, Set[str]]:
+        neighbor_uuids: Dict[str, Set[str]] = {}
+        for pipeline_info in self.pipelines_dict.values():
+            cmodel_uuids = [
+                cmodel.main_model.model_uuid for cmodel in pipeline_info.models
+            ]
+            for prev_uuid, next_uuid in zip(cmodel_uuids[:-1], cmodel_uuids[1:]):
+                if prev_uuid == next_uuid:
+                    continue
+                neighbor_uuids.setdefault(prev_uuid, set()).add(next_uuid)
+                neighbor_uuids.setdefault(next_uuid, set()).add(prev_uuid)
+        return neighbor_uuids
+
+    def _get_colocation_affinity(self, cmodel_uuid: str, backend_name: str) -> int:
+        # number of the cmodel's pipeline neighbors the backend already runs
+        if not self.prefer_colocated_stages:
+            return 0
+
+        neighbor_uuids = self.cmodel_neighbor_uuids.get(cmodel_uuid, set())
+        return len(
+            neighbor_uuids & self.plan_store.get_backend_cmodel_uuids(backend_name)
         )
 
+    def _get_colocated_backends(
+        self, cmodel_uuid: str, backends: List[BackendInfo]
+    ) -> List[BackendInfo]:
+        # backends running the most pipeline neighbors of the cmodel, empty if none
+        affinities = [
+            self._get_colocation_affinity(cmodel_uuid, backend.backend_name)
+            for backend in backends
+        ]
+        max_affinity = max(affinities, default=0)
+        if max_affinity <= 0:
+            return []
+
+        return [
+            backend
+            for backend, affinity in zip(backends, affinities)
+            if affinity == max_affinity
+        ]
+
     def _find_best_backend(
         self,
         potential_backends: List[BackendInfo],
@@ -333,30 +444,25 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
         use_gpu = required_res.max_gpu_mem > 0
 
         if use_gpu:
-            max_gpu_mem_available = 0
+            min_free_gpu_mem = math.inf
         else:
             min_num_deployed_models = self.MAX_MODELS_PER_BACKEND
 
         for backend in potential_backends:
             if use_gpu:
-                # find gpu-backend which has lowest-gpu-mem-usage
-                if backend.state.gpu_info.gpu_total_mem > max_gpu_mem_available:
-                    max_gpu_mem_available = backend.state.gpu_info.gpu_total_mem
+                # pack gpus: find gpu-backend with the least free memory that fits
+                free_gpu_mem = self._get_free_gpu_mem(backend)
+                if free_gpu_mem < min_free_gpu_mem:
+                    min_free_gpu_mem = free_gpu_mem
                     best_backend = backend
             else:
                 # find cpu-backend which is running least number of models
-                running_cmodel_uuids = []
-
-                for session_uuid in self.scheduling_plans_dict:
-                    cmodel_plans = self.scheduling_plans_dict[session_uuid]
-                    for cmodel_plan in cmodel_plans:
-                        for backend_plan in cmodel_plan.backend_plans:
-                            if backend.backend_name == backend_plan.backend_name:
-                                if cmodel_plan.model_uuid not in running_cmodel_uuids:
-                                    running_cmodel_uuids.append(cmodel_plan.model_uuid)
-
-                if len(running_cmodel_uuids) < min_num_deployed_models:
-                    min_num_deployed_models = len(running_cmodel_uuids)
+                num_deployed_models = len(
+                    self.plan_store.get_backend_cmodel_uuids(backend.backend_name)
+                )
+
+                if num_deployed_models < min_num_deployed_models:
+                    min_num_deployed_models = num_deployed_models
                     best_backend = backend
 
         return best_backend
@@ -367,30 +473,14 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
         use_gpu = required_res.max_gpu_mem > 0
         potential_backends = []
 
-        cmodel_uuid = cmodel.main_model.model_uuid
-
-        for backend_name in self.current_backends_dict:
-            is_deployed = False
-
-            for session_uuid in self.scheduling_plans_dict:
-                cmodel_plans = self.scheduling_plans_dict[session_uuid]
-
-                for cmodel_plan in cmodel_plans:
-                    if cmodel_plan.model_uuid != cmodel_uuid:
-                        continue
-
-                    for backend_plan in cmodel_plan.backend_plans:
-                        if backend_plan.backend_name == backend_name:
-                            is_deployed = True
-                            break
-
-                    if is_deployed:
-                        break
+        deployed_backend_names = self.plan_store.get_cmodel_backend_names(
+            cmodel.main_model.model_uuid
+        )
 
-            if is_deployed:
+        for backend_name, backend in self.current_backends_dict.items():
+            if backend_name in deployed_backend_names:
                 continue
 
-            backend = self.current_backends_dict[backend_name]
             has_gpu = backend.state.gpu_info != None
 
             if has_gpu != use_gpu:
@@ -400,58 +490,179 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
                 # TODO: if we need to limit how many models each cpu-backend should run - we should do it here
                 potential_backends.append(backend)
             else:
-                if backend.state.gpu_info.gpu_total_mem > required_res.max_gpu_mem:
+                if self._get_free_gpu_mem(backend) >= required_res.max_gpu_mem:
                     potential_backends.append(backend)
 
         return potential_backends
 
-    def _remove_expired_backends(self):
-        expired_backend_names: List[str] = []
+    def _get_potential_backends(
+        self, cmodel: NxsCompositoryModel, required_res: RequiredResouce
+    ) -> List[BackendInfo]:
+        potential_backends = self._find_potential_backends(cmodel, required_res)
+        if potential_backends or required_res.max_gpu_mem <= 0:
+            return potential_backends
 
-        for backend_name in self.last_backends_dict:
-            if backend_name not in self.current_backends_dict:
-                expired_backend_names.append(backend_name)
+        # all gpus are full, try to make room by evicting cold replicas
+        if self._make_room_for_cmodel(cmodel, required_res):
+            potential_backends = self._find_potential_backends(cmodel, required_res)
 
-        # print("expired_backend_names", expired_backend_names)
+        return potential_backends
 
-        # if not expired_backend_names:
-        #    return
+    def _get_cmodel_gpu_mem(self, cmodel_uuid: str) -> float:
+        if cmodel_uuid not in self.cmodel_gpu_mem:
+            required_res = self._compute_required_resource_for_atomic_model(
+                self.cmodels_dict[cmodel_uuid]
+            )
+            self.cmodel_gpu_mem[cmodel_uuid] = required_res.max_gpu_mem
+        return self.cmodel_gpu_mem[cmodel_uuid]
 
-        to_remove_session_uuids = []
-        for session_uuid in self.scheduling_plans_dict:
-            cmodel_plans = self.scheduling_plans_dict[session_uuid]
+    def _get_scheduled_gpu_mem(self, backend_name: str) -> float:
+        return sum(
+            self._get_cmodel_gpu_mem(cmodel_uuid)
+            for cmodel_uuid in self.plan_store.get_backend_cmodel_uuids(backend_name)
+        )
 
-            new_cmodel_plans = []
-            for cmodel_plan in cmodel_plans:
-                cmodel_uuid = cmodel_plan.model_uuid
+    def _get_free_gpu_mem(self, backend: BackendInfo) -> float:
+        # can be negative if the backend is over-committed
+        gpu_info = backend.state.gpu_info
+        usable_gpu_mem = gpu_info.gpu_total_mem * (1 - self.gpu_mem_safety_margin)
+        return (
+            usable_gpu_mem
+            - self.unaccounted_gpu_mem.get(backend.backend_name, 0)
+            - self._get_scheduled_gpu_mem(backend.backend_name)
+        )
 
-                new_backend_plans = []
-                for backend_plan in cmodel_plan.backend_plans:
-                    if backend_plan.backend_name not in expired_backend_names:
-                        new_backend_plans.append(backend_plan)
-                        continue
+    def _compute_unaccounted_gpu_mem(self) -> Dict[str, float]:
+        # compares what backends report (as of their last heartbeat) with what their
+        # scheduled cmodels should use. Cmodels that are still loading make the
+        # observed usage lower, which is clipped at 0, cmodels that were just removed
+        # are counted until the next heartbeat
+        unaccounted_gpu_mem: Dict[str, float] = {}
 
-                    if session_uuid not in self.unscheduling_plans_dict:
-                        self.unscheduling_plans_dict[session_uuid] = []
+        for backend_name, backend in self.current_backends_dict.items():
+            gpu_info = backend.state.gpu_info
+            if gpu_info is None:
+                continue
 
-                    self.unscheduling_plans_dict[session_uuid].append(
-                        NxsSimpleUnschedulingPerCompositoryModelPlan(
-                            model_uuid=cmodel_uuid,
-                            session_uuid=session_uuid,
-                            backend_name=backend_name,
-                        )
-                    )
+            observed_gpu_mem = gpu_info.gpu_total_mem - gpu_info.gpu_available_mem
+            unaccounted_gpu_mem[backend_name] = max(
+                0, observed_gpu_mem - self._get_scheduled_gpu_mem(backend_name)
+            )
 
-                cmodel_plan.backend_plans = new_backend_plans
-                if cmodel_plan.backend_plans:
-                    new_cmodel_plans.append(cmodel_plan)
+        return unaccounted_gpu_mem
 
-            self.scheduling_plans_dict[session_uuid] = new_cmodel_plans
-            if not self.scheduling_plans_dict[session_uuid]:
-                to_remove_session_uuids.append(session_uuid)
+    def _get_num_needed_replicas(self, cmodel_uuid: str) -> int:
+        fps = self._get_cmodel_fps(self.cmodels_dict[cmodel_uuid])
+        requested_fps = self.cmodel_requested_fps.get(cmodel_uuid, 0)
+        return max(1, math.ceil(requested_fps / fps))
 
-        for session_uuid in to_remove_session_uuids:
-            self.scheduling_plans_dict.pop(session_uuid)
+    def _get_duty_cycle(self, cmodel_uuid: str) -> float:
+        # share of gpu time each replica needs to serve its part of the requested fps
+        if cmodel_uuid not in self.cmodels_dict:
+            return 1.0
+
+        fps = self._get_cmodel_fps(self.cmodels_dict[cmodel_uuid])
+        num_replicas = len(self.plan_store.get_cmodel_backend_names(cmodel_uuid))
+        if fps <= 0 or num_replicas <= 0:
+            return 1.0
+
+        requested_fps = self.cmodel_requested_fps.get(cmodel_uuid, 0)
+        duty_cycle = requested_fps / (num_replicas * fps)
+        return min(1.0, max(self.min_duty_cycle, duty_cycle))
+
+    def _get_cold_cmodel_uuids(self, backend_name: str) -> List[str]:
+        # cmodels on this backend with more replicas than their requested fps needs,
+        # least utilized first. Removing them does not leave any session unserved
+        cold_cmodels = []
+
+        for cmodel_uuid in self.plan_store.get_backend_cmodel_uuids(backend_name):
+            num_replicas = len(self.plan_store.get_cmodel_backend_names(cmodel_uuid))
+            if num_replicas <= self._get_num_needed_replicas(cmodel_uuid):
+                continue
+
+            fps = self._get_cmodel_fps(self.cmodels_dict[cmodel_uuid])
+            utilization = self.cmodel_requested_fps.get(cmodel_uuid, 0) / (
+                num_replicas * fps
+            )
+            cold_cmodels.append((utilization, cmodel_uuid))
+
+        return [cmodel_uuid for _, cmodel_uuid in sorted(cold_cmodels)]
+
+    def _evict_cold_cmodels(
+        self, backend: BackendInfo, required_gpu_mem: float
+    ) -> bool:
+        # removes cold replicas until required_gpu_mem fits, nothing is removed if
+        # that is not possible
+        free_gpu_mem = self._get_free_gpu_mem(backend)
+
+        to_evict_cmodel_uuids = []
+        for cmodel_uuid in self._get_cold_cmodel_uuids(backend.backend_name):
+            if free_gpu_mem >= required_gpu_mem:
+                break
+            to_evict_cmodel_uuids.append(cmodel_uuid)
+            free_gpu_mem += self._get_cmodel_gpu_mem(cmodel_uuid)
+
+        if free_gpu_mem < required_gpu_mem:
+            return False
+
+        for cmodel_uuid in to_evict_cmodel_uuids:
+            self._remove_cmodel_from_backend(self.cmodels_dict[cmodel_uuid], backend)
+
+        return True
+
+    def _make_room_for_cmodel(
+        self, cmodel: NxsCompositoryModel, required_res: RequiredResouce
+    ) -> bool:
+        deployed_backend_names = self.plan_store.get_cmodel_backend_names(
+            cmodel.main_model.model_uuid
+        )
+
+        # backends that need the fewest evictions first
+        backends = [
+            backend
+            for backend_name, backend in self.current_backends_dict.items()
+            if backend.state.gpu_info is not None
+            and backend_name not in deployed_backend_names
+        ]
+        backends.sort(key=lambda backend: self._get_free_gpu_mem(backend), reverse=True)
+
+        for backend in backends:
+            if self._evict_cold_cmodels(backend, required_res.max_gpu_mem):
+                return True
+
+        return False
+
+    def _relieve_gpu_mem_pressure(self):
+        # backends can end up over-committed when cmodels turn out to use more memory
+        # than expected or other processes grow, evict cold replicas from them
+        for backend in self.current_backends_dict.values():
+            if backend.state.gpu_info is None:
+                continue
+            if self._get_free_gpu_mem(backend) < 0:
+                self._evict_cold_cmodels(backend, 0)
+
+    def _remove_expired_backends(self):
+        expired_backend_names: List[str] = []
+
+        for backend_name in self.last_backends_dict:
+            if backend_name not in self.current_backends_dict:
+                expired_backend_names.append(backend_name)
+
+        # print("expired_backend_names", expired_backend_names)
+
+        for backend_name in expired_backend_names:
+            cmodel_uuids = list(self.plan_store.get_backend_cmodel_uuids(backend_name))
+            for cmodel_uuid in cmodel_uuids:
+                session_uuids = list(
+                    self.plan_store.get_deployment_session_uuids(
+                        cmodel_uuid, backend_name
+                    )
+                )
+                for session_uuid in session_uuids:
+                    self.plan_store.remove_backend_plan(
+                        session_uuid, cmodel_uuid, backend_name
+                    )
+                    self._add_unscheduling_plan(session_uuid, cmodel_uuid, backend_name)
 
     def _remove_unused_sessions(self):
         to_remove_session_uuids = self._compute_unused_session_uuids()
@@ -465,43 +676,21 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
         if session_uuid not in self.unscheduling_plans_dict:
             self.unscheduling_plans_dict[session_uuid] = []
 
-        cmodel_plans = self.scheduling_plans_dict[session_uuid]
         to_remove = []
-        for cmodel_plan in cmodel_plans:
+        for cmodel_plan in self.plan_store.get_plans(session_uuid):
             cmodel_uuid = cmodel_plan.model_uuid
 
             for backend_plan in cmodel_plan.backend_plans:
                 backend_name = backend_plan.backend_name
 
                 if generate_unscheduling_plans:
-                    self.unscheduling_plans_dict[session_uuid].append(
-                        NxsSimpleUnschedulingPerCompositoryModelPlan(
-                            model_uuid=cmodel_uuid,
-                            session_uuid=session_uuid,
-                            backend_name=backend_name,
-                        )
-                    )
-
-                # check if any session running on this backend-end or not
-                has_other_sessions_running = False
-                for other_session_uuid in self.scheduling_plans_dict:
-                    if other_session_uuid == session_uuid:
-                        continue
+                    self._add_unscheduling_plan(session_uuid, cmodel_uuid, backend_name)
 
-                    other_cmodel_plans = self.scheduling_plans_dict[other_session_uuid]
-                    for other_cmodel_plan in other_cmodel_plans:
-                        for other_backend_plan in other_cmodel_plan.backend_plans:
-                            if other_backend_plan.backend_name == backend_name:
-                                has_other_sessions_running = True
-                                break
-
-                        if has_other_sessions_running:
-                            break
-
-                    if has_other_sessions_running:
-                        break
-
-                if not has_other_sessions_running:
+                # check if any other session is using this cmodel on this backend
+                session_uuids = self.plan_store.get_deployment_session_uuids(
+                    cmodel_uuid, backend_name
+                )
+                if session_uuids == {session_uuid}:
                     # has to remove cmodel from backend to retrieve back resources
                     to_remove.append(
                         (
@@ -513,12 +702,12 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
         for cmodel, backend in to_remove:
             self._remove_cmodel_from_backend(cmodel, backend, False)
 
-        self.scheduling_plans_dict.pop(session_uuid, None)
+        self.plan_store.remove_session(session_uuid)
 
     def _compute_unused_session_uuids(self):
         unused_session_uuids = []
 
-        for session_uuid in list(self.scheduling_plans_dict.keys()):
+        for session_uuid in self.plan_store.get_session_uuids():
             if session_uuid not in self.current_requests_dict:
                 unused_session_uuids.append(session_uuid)
 
@@ -531,7 +720,7 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
         last_cmodel_ref_count_dict = self._compute_last_requesting_cmodel_ref_count()
         # print("last_cmodel_ref_count_dict", last_cmodel_ref_count_dict)
 
-        to_add_pipeline_uuids = self._compute_pipeline_uuids_to_add()
+        to_add_pipeline_uuids = set(self._compute_pipeline_uuids_to_add())
         # print("to_add_pipeline_uuids", to_add_pipeline_uuids)
 
         # add all new pipeline's cmodels into last_cmodel_ref_count_dict to prevent undeploy unnecessary models
@@ -547,7 +736,7 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
 
         to_remove_cmodel_uuids = []
         for session_uuid in self.last_requests_dict:
-            if session_uuid not in self.scheduling_plans_dict:
+            if not self.plan_store.has_session(session_uuid):
                 continue
 
             request = self.last_requests_dict[session_uuid]
@@ -563,161 +752,59 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
                             # print(f"Add cmodel {cmodel_uuid} to remove list...")
 
         # return cmodel's resources back to backend
-        cmodel_uuid_2_session_uuids: Dict[str, List[str]] = {}
-        for session_uuid in self.scheduling_plans_dict:
-            cmodel_plans = self.scheduling_plans_dict[session_uuid]
-            for cmodel_plan in cmodel_plans:
-                cmodel_uuid = cmodel_plan.model_uuid
-                if cmodel_uuid in to_remove_cmodel_uuids:
-                    if cmodel_uuid not in cmodel_uuid_2_session_uuids:
-                        cmodel_uuid_2_session_uuids[cmodel_uuid] = []
-                    if session_uuid not in cmodel_uuid_2_session_uuids[cmodel_uuid]:
-                        cmodel_uuid_2_session_uuids[cmodel_uuid].append(session_uuid)
-
-        # print("cmodel_uuid_2_session_uuids", cmodel_uuid_2_session_uuids)
-
-        unscheduling_plans: List[NxsSimpleUnschedulingPerCompositoryModelPlan] = []
-        for cmodel_uuid in cmodel_uuid_2_session_uuids:
-            backend_names = []
-            session_uuids = cmodel_uuid_2_session_uuids[cmodel_uuid]
-
-            for session_uuid in session_uuids:
-                cmodel_plans = self.scheduling_plans_dict[session_uuid]
-                for cmodel_plan in cmodel_plans:
-                    if cmodel_plan.model_uuid != cmodel_uuid:
-                        continue
-
-                    for backend_plan in cmodel_plan.backend_plans:
-                        if backend_plan.backend_name not in backend_names:
-                            backend_names.append(backend_plan.backend_name)
-
-                        # unscheduling_plans.append(NxsSimpleUnschedulingPerCompositoryModelPlan(
-                        #     model_uuid = cmodel_uuid,
-                        #     session_uuid = session_uuid,
-                        #     backend_name = backend_plan.backend_name
-                        # ))
-
+        for cmodel_uuid in to_remove_cmodel_uuids:
+            backend_names = list(self.plan_store.get_cmodel_backend_names(cmodel_uuid))
             for backend_name in backend_names:
                 self._remove_cmodel_from_backend(
                     self.cmodels_dict[cmodel_uuid],
                     self.current_backends_dict[backend_name],
                 )
 
-        # print("unscheduling_plans", unscheduling_plans)
-
-        for unscheduling_plan in unscheduling_plans:
-            session_uuid = unscheduling_plan.session_uuid
-            if session_uuid not in self.unscheduling_plans_dict:
-                self.unscheduling_plans_dict[session_uuid] = []
-            self.unscheduling_plans_dict[session_uuid].append(unscheduling_plan)
-
         for session_uuid in list(self.last_requests_dict.keys()):
             request = self.last_requests_dict[session_uuid]
             pipeline_uuid = request.pipeline_info.pipeline_uuid
             if pipeline_uuid in to_remove_pipeline_uuids:
-                self.last_requests_dict.pop(pipeline_uuid, None)
+                self.last_requests_dict.pop(session_uuid, None)
 
     def _scale_sessions(self):
-        # compute fps per model
-        requesting_cmodeluuid2fps = {}
-        scheduled_cmodeluuid2fps = {}
-        cmodeluuid2fps = {}
-        cmodeluuid2sessionuuids: Dict[str, List[str]] = {}
-
-        for session_uuid in self.current_requests_dict:
-            request = self.current_requests_dict[session_uuid]
-            cmodels = request.pipeline_info.models
-            for cmodel in cmodels:
-                cmodel_uuid = cmodel.main_model.model_uuid
-
-                if cmodel_uuid not in requesting_cmodeluuid2fps:
-                    requesting_cmodeluuid2fps[cmodel_uuid] = 0
-
-                requesting_cmodeluuid2fps[cmodel_uuid] += request.requested_fps
-
-        counted_scheduled_cmodel_on_backends = []
-        for session_uuid in self.scheduling_plans_dict:
-            cmodel_plans = self.scheduling_plans_dict[session_uuid]
-            for cmodel_plan in cmodel_plans:
-                cmodel_uuid = cmodel_plan.model_uuid
-                cmodel = self.cmodels_dict[cmodel_uuid]
-
-                fps = 999999999999
-                for component_model in cmodel.component_models:
-                    best_profile = self._get_best_profile(component_model)
-                    fps = min(fps, best_profile.fps)
-
-                if cmodel_uuid not in cmodeluuid2sessionuuids:
-                    cmodeluuid2sessionuuids[cmodel_uuid] = []
-
-                if session_uuid not in cmodeluuid2sessionuuids[cmodel_uuid]:
-                    cmodeluuid2sessionuuids[cmodel_uuid].append(session_uuid)
-
-                if cmodel_uuid not in cmodeluuid2fps:
-                    cmodeluuid2fps[cmodel_uuid] = fps
-
-                if cmodel_uuid not in scheduled_cmodeluuid2fps:
-                    scheduled_cmodeluuid2fps[cmodel_uuid] = 0
-
-                for backend_plan in cmodel_plan.backend_plans:
-                    key = f"{cmodel_uuid}_{backend_plan.backend_name}"
-                    if key not in counted_scheduled_cmodel_on_backends:
-                        counted_scheduled_cmodel_on_backends.append(key)
-                        scheduled_cmodeluuid2fps[cmodel_uuid] += fps
-
-        for cmodel_uuid in requesting_cmodeluuid2fps:
-            if cmodel_uuid not in scheduled_cmodeluuid2fps:
+        for cmodel_uuid, requested_fps in self.cmodel_requested_fps.items():
+            backend_names = self.plan_store.get_cmodel_backend_names(cmodel_uuid)
+            if not backend_names:
                 # skip if this model was not scheduled
                 continue
 
-            session_uuids = cmodeluuid2sessionuuids[cmodel_uuid]
+            cmodel = self.cmodels_dict[cmodel_uuid]
+            fps = self._get_cmodel_fps(cmodel)
 
-            num_requesting_backends = math.ceil(
-                requesting_cmodeluuid2fps[cmodel_uuid] / cmodeluuid2fps[cmodel_uuid]
-            )
-            num_scheduled_backends = math.ceil(
-                scheduled_cmodeluuid2fps[cmodel_uuid] / cmodeluuid2fps[cmodel_uuid]
-            )
+            num_requesting_backends = math.ceil(requested_fps / fps)
+            num_scheduled_backends = len(backend_names)
 
             if num_scheduled_backends > num_requesting_backends:
                 # print(
-                #     f"SCALING DOWN - requesting {requesting_cmodeluuid2fps[cmodel_uuid]} - serving {scheduled_cmodeluuid2fps[cmodel_uuid]} fps"
+                #     f"SCALING DOWN - requesting {requested_fps} - serving {num_scheduled_backends * fps} fps"
                 # )
                 # need to scale down
                 delta = num_scheduled_backends - num_requesting_backends
                 for _ in range(delta):
-                    backend_names = []
-                    backends = []
-
-                    for session_uuid in list(self.scheduling_plans_dict.keys()):
-                        cmodel_plans = self.scheduling_plans_dict[session_uuid]
-                        for cmodel_plan in cmodel_plans:
-                            if cmodel_plan.model_uuid != cmodel_uuid:
-                                continue
-
-                            for backend_plan in cmodel_plan.backend_plans:
-                                if backend_plan.backend_name not in backend_names:
-                                    backend_names.append(backend_plan.backend_name)
-                                    backends.append(
-                                        self.current_backends_dict[
-                                            backend_plan.backend_name
-                                        ]
-                                    )
-
-                    # randomly remove backend
-                    if not backends:
+                    backend_names = self.plan_store.get_cmodel_backend_names(
+                        cmodel_uuid
+                    )
+                    if not backend_names:
                         break
 
-                    # print("to remove", backends[0])
+                    # any backend would do, pick one deterministically
                     self._remove_cmodel_from_backend(
-                        self.cmodels_dict[cmodel_uuid], backends[0]
+                        cmodel, self.current_backends_dict[min(backend_names)]
                     )
 
             elif num_requesting_backends > num_scheduled_backends:
                 # need to scale up
                 # print(
-                #     f"SCALING UP - requesting {requesting_cmodeluuid2fps[cmodel_uuid]} - serving {scheduled_cmodeluuid2fps[cmodel_uuid]} fps"
+                #     f"SCALING UP - requesting {requested_fps} - serving {num_scheduled_backends * fps} fps"
                 # )
+                session_uuids = list(
+                    self.plan_store.get_cmodel_session_uuids(cmodel_uuid)
+                )
                 delta = num_requesting_backends - num_scheduled_backends
                 for _ in range(delta):
                     backend = self._deploy_cmodel(cmodel_uuid, session_uuids)
@@ -750,14 +837,16 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
         all_requests.extend(requests)
         for request in all_requests:
             if request.pipeline_info.pipeline_uuid not in self.pipelines_dict:
-                self.pipelines_dict[
-                    request.pipeline_info.pipeline_uuid
-                ] = request.pipeline_info
+                self.pipelines_dict[request.pipeline_info.pipeline_uuid] = (
+                    request.pipeline_info
+                )
 
             for cmodel in request.pipeline_info.models:
                 if cmodel.main_model.model_uuid not in self.cmodels_dict:
                     self.cmodels_dict[cmodel.main_model.model_uuid] = cmodel
 
+        self.cmodel_neighbor_uuids = self._compute_cmodel_neighbor_uuids()
+
         self.current_requests_dict: Dict[str, NxsSchedulingRequest] = {}
         self.current_backends_dict: Dict[str, BackendInfo] = {}
 
@@ -767,33 +856,38 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
         for backend in backends:
             self.current_backends_dict[backend.backend_name] = backend
 
-        # print('_remove_expired_backends', self.scheduling_plans_dict)
+        self.cmodel_requested_fps = self._compute_requested_cmodel_fps()
+        # measured profiles may have changed since the last round
+        self.cmodel_gpu_mem = {}
+
+        # print('_remove_expired_backends', self.plan_store.session_plans)
         self._remove_expired_backends()
 
-        # print('_remove_unused_sessions', self.scheduling_plans_dict)
+        # what is left in the plans is what backends should be running now
+        self.unaccounted_gpu_mem = self._compute_unaccounted_gpu_mem()
+
+        # print('_remove_unused_sessions', self.plan_store.session_plans)
         self._remove_unused_sessions()
 
-        # print('_remove_unused_pipelines', self.scheduling_plans_dict)
+        # print('_remove_unused_pipelines', self.plan_store.session_plans)
         self._remove_unused_pipelines()
 
-        # print('_deploy_new_pipelines', self.scheduling_plans_dict)
+        self._relieve_gpu_mem_pressure()
+
+        # print('_deploy_new_pipelines', self.plan_store.session_plans)
         self._deploy_new_pipelines()
 
-        # print('_assign_backends_to_unscheduled_sessions', self.scheduling_plans_dict)
+        # print('_assign_backends_to_unscheduled_sessions', self.plan_store.session_plans)
         self._assign_backends_to_unscheduled_sessions()
 
         self._scale_sessions()
 
-        # print("final_scheduling", self.scheduling_plans_dict)
+        # print("final_scheduling", self.plan_store.session_plans)
         # print("final_unscheduling", self.unscheduling_plans_dict)
 
-        scheduling_plans: List[NxsSimpleSchedulingPerCompositoryModelPlan] = []
+        scheduling_plans = self.plan_store.get_all_plans()
         unscheduling_plans: List[NxsSimpleUnschedulingPerCompositoryModelPlan] = []
 
-        for session_uuid in self.scheduling_plans_dict:
-            plans = self.scheduling_plans_dict[session_uuid]
-            scheduling_plans.extend(plans)
-
         for session_uuid in self.unscheduling_plans_dict:
             plans = self.unscheduling_plans_dict[session_uuid]
             unscheduling_plans.extend(plans)
@@ -808,6 +902,10 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
 
         # convert planv1 to planv2
         backend_scheduling_data: Dict[str, NxsSchedulingPerBackendPlan] = {}
+        # (backend_name, cmodel_uuid) -> plan
+        cmodel_plans_v2: Dict[Tuple[str, str], NxsSchedulingPerCompositorymodelPlan] = (
+            {}
+        )
         for plan in scheduling_plans:
             session_uuid = plan.session_uuid.split("_")[-1]
             cmodel_uuid = plan.model_uuid
@@ -821,53 +919,53 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
                         duty_cyles=[],
                     )
 
-                cmodel_plan_v2: NxsSchedulingPerCompositorymodelPlan = None
-                for _cmodel_plan_v2 in backend_scheduling_data[
-                    backend_name
-                ].compository_model_plans:
-                    if _cmodel_plan_v2.model_uuid == cmodel_uuid:
-                        cmodel_plan_v2 = _cmodel_plan_v2
-
+                cmodel_plan_v2 = cmodel_plans_v2.get((backend_name, cmodel_uuid))
                 if not cmodel_plan_v2:
                     cmodel_plan_v2 = NxsSchedulingPerCompositorymodelPlan(
                         model_uuid=cmodel_uuid,
                         session_uuid_list=[],
                         component_model_plans=backend_plan.component_models_plan,
                     )
+                    cmodel_plans_v2[(backend_name, cmodel_uuid)] = cmodel_plan_v2
                     backend_scheduling_data[
                         backend_name
                     ].compository_model_plans.append(cmodel_plan_v2)
+                    # one duty cycle per cmodel plan, not per session
+                    backend_scheduling_data[backend_name].duty_cyles.append(
+                        self._get_duty_cycle(cmodel_uuid)
+                    )
 
                 cmodel_plan_v2.session_uuid_list.append(session_uuid)
-                backend_scheduling_data[backend_name].duty_cyles.append(1.0)
 
         # print("backend_scheduling_data", backend_scheduling_data)
         # print("")
 
         backend_unscheduling_data: Dict[str, NxsUnschedulingPerBackendPlan] = {}
+        # (backend_name, cmodel_uuid) -> plan
+        cmodel_unscheduling_plans: Dict[
+            Tuple[str, str], NxsUnschedulingPerCompositoryPlan
+        ] = {}
         for plan in unscheduling_plans:
             # print(plan)
             session_uuid = plan.session_uuid.split("_")[-1]
 
             if plan.backend_name not in backend_unscheduling_data:
-                backend_unscheduling_data[
-                    plan.backend_name
-                ] = NxsUnschedulingPerBackendPlan(
-                    backend_name=plan.backend_name, compository_model_plans=[]
+                backend_unscheduling_data[plan.backend_name] = (
+                    NxsUnschedulingPerBackendPlan(
+                        backend_name=plan.backend_name, compository_model_plans=[]
+                    )
                 )
 
-            cmodel_plan: NxsUnschedulingPerCompositoryPlan = None
-            for _cmodel_plan in backend_unscheduling_data[
-                plan.backend_name
-            ].compository_model_plans:
-                if _cmodel_plan.model_uuid == plan.model_uuid:
-                    cmodel_plan = _cmodel_plan
-                    break
-
+            cmodel_plan = cmodel_unscheduling_plans.get(
+                (plan.backend_name, plan.model_uuid)
+            )
             if not cmodel_plan:
                 cmodel_plan = NxsUnschedulingPerCompositoryPlan(
                     model_uuid=plan.model_uuid, session_uuid_list=[]
                 )
+                cmodel_unscheduling_plans[(plan.backend_name, plan.model_uuid)] = (
+                    cmodel_plan
+                )
                 backend_unscheduling_data[
                     plan.backend_name
                 ].compository_model_plans.append(cmodel_plan)
@@ -898,60 +996,55 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
 
     def _compute_pipeline_uuids_to_add(self) -> List[str]:
         to_add_pipeline_uuids = []
-        deployed_cmodel_ref_count_dict = self._compute_deployed_cmodel_ref_count()
+        checked_pipeline_uuids: Set[str] = set()
 
         for session_uuid in self.current_requests_dict:
-            request = self.current_requests_dict[session_uuid]
-            is_pipeline_deployed = True
+            pipeline_info = self.current_requests_dict[session_uuid].pipeline_info
+            if pipeline_info.pipeline_uuid in checked_pipeline_uuids:
+                continue
+            checked_pipeline_uuids.add(pipeline_info.pipeline_uuid)
 
-            for cmodel in request.pipeline_info.models:
+            is_pipeline_deployed = True
+            for cmodel in pipeline_info.models:
                 cmodel_uuid = cmodel.main_model.model_uuid
-                if cmodel_uuid not in deployed_cmodel_ref_count_dict:
+                if not self.plan_store.get_cmodel_backend_names(cmodel_uuid):
                     is_pipeline_deployed = False
                     break
 
-            if (
-                not is_pipeline_deployed
-                and request.pipeline_info.pipeline_uuid not in to_add_pipeline_uuids
-            ):
-                to_add_pipeline_uuids.append(request.pipeline_info.pipeline_uuid)
+            if not is_pipeline_deployed:
+                to_add_pipeline_uuids.append(pipeline_info.pipeline_uuid)
 
         return to_add_pipeline_uuids
 
-    def _compute_pipeline_uuids_to_remove(self) -> List[str]:
-        to_remove_pipeline_uuids = []
-
-        current_pipeline_uuids = []
+    def _compute_pipeline_uuids_to_remove(self) -> Set[str]:
+        current_pipeline_uuids: Set[str] = set()
         for session_uuid in self.current_requests_dict:
             current_request = self.current_requests_dict[session_uuid]
-            pipeline_uuid = current_request.pipeline_info.pipeline_uuid
-            if pipeline_uuid not in current_pipeline_uuids:
-                current_pipeline_uuids.append(pipeline_uuid)
+            current_pipeline_uuids.add(current_request.pipeline_info.pipeline_uuid)
 
+        to_remove_pipeline_uuids: Set[str] = set()
         for session_uuid in self.last_requests_dict:
             last_request = self.last_requests_dict[session_uuid]
             pipeline_uuid = last_request.pipeline_info.pipeline_uuid
             if pipeline_uuid not in current_pipeline_uuids:
-                if pipeline_uuid not in to_remove_pipeline_uuids:
-                    to_remove_pipeline_uuids.append(pipeline_uuid)
+                to_remove_pipeline_uuids.add(pipeline_uuid)
 
         return to_remove_pipeline_uuids
 
-    def _compute_deployed_cmodel_ref_count(self) -> Dict[str, int]:
-        ref_count_dict: Dict[str, int] = {}
+    def _compute_requested_cmodel_fps(self) -> Dict[str, float]:
+        requested_fps_dict: Dict[str, float] = {}
 
-        for session_name in self.scheduling_plans_dict:
-            cmodel_plans = self.scheduling_plans_dict[session_name]
-            for cmodel_plan in cmodel_plans:
-                if cmodel_plan.backend_plans:
-                    if cmodel_plan.model_uuid not in ref_count_dict:
-                        ref_count_dict[cmodel_plan.model_uuid] = 0
+        for session_uuid in self.current_requests_dict:
+            request = self.current_requests_dict[session_uuid]
+            for cmodel in request.pipeline_info.models:
+                cmodel_uuid = cmodel.main_model.model_uuid
 
-                    ref_count_dict[cmodel_plan.model_uuid] += len(
-                        cmodel_plan.backend_plans
-                    )
+                if cmodel_uuid not in requested_fps_dict:
+                    requested_fps_dict[cmodel_uuid] = 0
 
-        return ref_count_dict
+                requested_fps_dict[cmodel_uuid] += request.requested_fps
+
+        return requested_fps_dict
 
     def _compute_last_requesting_cmodel_ref_count(self) -> Dict[str, int]:
         ref_count_dict: Dict[str, int] = {}
@@ -968,19 +1061,6 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
 
         return ref_count_dict
 
-    def _take_resource_from_backend(
-        self, backend: BackendInfo, required_res: RequiredResouce
-    ):
-        if required_res.max_gpu_mem > 0:
-            backend.state.gpu_info.gpu_total_mem -= required_res.max_gpu_mem
-
-    def _return_resource_to_backend(
-        self, backend: BackendInfo, required_res: RequiredResouce
-    ):
-        if required_res.max_gpu_mem > 0:
-            # backend.gpu_info_extended.static_gpu_avaible_mem += required_res.max_gpu_mem
-            backend.state.gpu_info.gpu_total_mem += required_res.max_gpu_mem
-
     def _compute_required_resource_for_atomic_model(
         self, cmodel: NxsCompositoryModel
     ) -> RequiredResouce:
@@ -1002,14 +1082,51 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
 
         required_res = RequiredResouce()
         required_res.max_gpu_mem = best_profile.gpu_mem_usage
+        if component_model.use_gpu:
+            # every compute instance holds its own copy of the model
+            required_res.max_gpu_mem *= self._get_num_compute_instances(component_model)
 
         return required_res
 
+    def _get_num_compute_instances(self, component_model: NxsModel) -> int:
+        if component_model.num_compute_instances is None:
+            return 1
+        return max(1, component_model.num_compute_instances)
+
+    def _get_cmodel_fps(self, cmodel: NxsCompositoryModel) -> float:
+        # fps a single replica can serve, bounded by its slowest component
+        fps = 999999999999
+        for component_model in cmodel.component_models:
+            fps = min(fps, self._get_component_model_fps(component_model))
+        return fps
+
+    def _get_component_model_fps(self, component_model: NxsModel) -> float:
+        # profiles are measured with a single compute instance, cpu instances run on
+        # their own cores while gpu instances share the same device
+        fps = self._get_best_profile(component_model).fps
+        if not component_model.use_gpu:
+            fps *= self._get_num_compute_instances(component_model)
+        return fps
+
+    def _get_profile(self, component_model: NxsModel) -> List[ProfileUnit]:
+        # prefer numbers measured on the hardware the model would run on
+        backend_type = NxsBackendType.CPU
+        if component_model.use_gpu:
+            backend_type = NxsBackendType.GPU
+
+        measured_profile = self.measured_profiles.get(backend_type.value, {}).get(
+            component_model.model_uuid
+        )
+        if measured_profile:
+            return measured_profile
+
+        return component_model.profile
+
     def _get_best_profile(self, component_model: NxsModel) -> ProfileUnit:
         best_profile_unit = None
 
         fps = 0
-        for profile_unit in component_model.profile:
+        for profile_unit in self._get_profile(component_model):
             if profile_unit.fps > fps:
                 fps = profile_unit.fps
                 best_profile_unit = profile_unit
@@ -1017,4 +1134,11 @@ class SimpleSchedulingPolicyv2(BaseSchedulingPolicy):
         return best_profile_unit
 
     def update_backend_runtime_stats(self, backend_name: str, backend_states: Dict):
-        pass
+        measured_profiles = backend_states.get("measured_profiles", {})
+        if not measured_profiles:
+            return
+
+        backend_type = backend_states.get("backend_type", NxsBackendType.CPU.value)
+        profiles = self.measured_profiles.setdefault(backend_type, {})
+        for model_uuid, profile in measured_profiles.items():
+            profiles[model_uuid] = [ProfileUnit(**unit) for unit in profile]
@@ -0,0 +1,263 @@
+import math
+import time
+from typing import Dict, List, Tuple
+
+from nxs_libs.interface.scheduling_policy.simple_policy_v2 import (
+    SimpleSchedulingPolicyv2,
+)
+from nxs_types.backend import BackendInfo
+from nxs_types.log import NxsBackendCmodelThroughputLog
+from nxs_types.model import NxsCompositoryModel
+
+
+# Sizes and places cmodel replicas using what backends measure instead of the static
+# profiles alone. Each backend's utilization is the sum, over the cmodels it runs, of
+# measured fps / capacity (best profile fps, measured on that hardware if available),
+# new replicas go to the fullest backend that still has room for their expected load
+# (best fit), or to the least utilized one if none has.
+#
+# Replicas are added when the requested fps needs more than target_utilization of the
+# deployed capacity, or when a replica misses its latency SLO (too many requests past
+# their deadline, or mean latency above latency_slo_ms if set). A replica is removed
+# only after the remaining ones would have stayed below scale_down_utilization for
+# scale_down_delay_secs, one at a time, so short dips do not cause churn.
+class SlaAwareSchedulingPolicy(SimpleSchedulingPolicyv2):
+    def __init__(
+        self,
+        target_utilization: float = 0.8,
+        scale_down_utilization: float = 0.5,
+        max_sla_miss_rate: float = 0.05,
+        latency_slo_ms: float = 0,
+        scale_up_cooldown_secs: float = 30,
+        scale_down_delay_secs: float = 120,
+        stats_expiration_secs: float = 60,
+        gpu_mem_safety_margin: float = 0.1,
+        min_duty_cycle: float = 0.05,
+        prefer_colocated_stages: bool = True,
+    ) -> None:
+        super().__init__(
+            gpu_mem_safety_margin=gpu_mem_safety_margin,
+            min_duty_cycle=min_duty_cycle,
+            prefer_colocated_stages=prefer_colocated_stages,
+        )
+
+        self.target_utilization = target_utilization
+        self.scale_down_utilization = scale_down_utilization
+        self.max_sla_miss_rate = max_sla_miss_rate
+        self.latency_slo_ms = latency_slo_ms
+        self.scale_up_cooldown_secs = scale_up_cooldown_secs
+        self.scale_down_delay_secs = scale_down_delay_secs
+        self.stats_expiration_secs = stats_expiration_secs
+
+        # backend_name -> cmodel_uuid -> (last reported log, timestamp)
+        self.cmodel_logs: Dict[
+            str, Dict[str, Tuple[NxsBackendCmodelThroughputLog, float]]
+        ] = {}
+
+        # cmodel_uuid -> last time a replica was added because of SLO violations
+        self.last_slo_scale_up_ts: Dict[str, float] = {}
+        # cmodel_uuid -> since when it has had more replicas than needed
+        self.over_provisioned_ts: Dict[str, float] = {}
+
+    def update_backend_runtime_stats(self, backend_name: str, backend_states: Dict):
+        super().update_backend_runtime_stats(backend_name, backend_states)
+
+        cmodel_logs = self.cmodel_logs.setdefault(backend_name, {})
+        for log in backend_states.get("cmodel_logs", []):
+            log = NxsBackendCmodelThroughputLog(**log)
+            cmodel_logs[log.model_uuid] = (log, time.time())
+
+    def _get_cmodel_log(
+        self, backend_name: str, cmodel_uuid: str
+    ) -> NxsBackendCmodelThroughputLog:
+        # returns None if the backend did not report this cmodel recently
+        log, ts = self.cmodel_logs.get(backend_name, {}).get(cmodel_uuid, (None, 0))
+        if time.time() - ts > self.stats_expiration_secs:
+            return None
+        return log
+
+    def _get_cmodel_capacity(self, cmodel: NxsCompositoryModel) -> float:
+        return self._get_cmodel_fps(cmodel)
+
+    def _get_num_needed_replicas(self, cmodel_uuid: str) -> int:
+        # replicas beyond this are cold and may be evicted for other cmodels
+        capacity = self._get_cmodel_capacity(self.cmodels_dict[cmodel_uuid])
+        requested_fps = self._get_requested_fps(cmodel_uuid)
+        return max(1, math.ceil(requested_fps / (capacity * self.target_utilization)))
+
+    def _get_duty_cycle(self, cmodel_uuid: str) -> float:
+        # leave the same headroom as when sizing replicas
+        num_replicas = len(self.plan_store.get_cmodel_backend_names(cmodel_uuid))
+        if cmodel_uuid not in self.cmodels_dict or num_replicas <= 0:
+            return 1.0
+
+        load = self._get_expected_load(cmodel_uuid, num_replicas)
+        duty_cycle = load / self.target_utilization
+        return min(1.0, max(self.min_duty_cycle, duty_cycle))
+
+    def _get_requested_fps(self, cmodel_uuid: str) -> float:
+        return self.cmodel_requested_fps.get(cmodel_uuid, 0)
+
+    def _get_cmodel_backend_names(self, cmodel_uuid: str) -> List[str]:
+        return sorted(self.plan_store.get_cmodel_backend_names(cmodel_uuid))
+
+    def _get_cmodel_session_uuids(self, cmodel_uuid: str) -> List[str]:
+        return list(self.plan_store.get_cmodel_session_uuids(cmodel_uuid))
+
+    def _get_expected_load(self, cmodel_uuid: str, num_replicas: int) -> float:
+        # utilization a replica should see if requests are spread evenly
+        cmodel = self.cmodels_dict[cmodel_uuid]
+        capacity = self._get_cmodel_capacity(cmodel)
+        if capacity <= 0 or num_replicas <= 0:
+            return 1.0
+        return self._get_requested_fps(cmodel_uuid) / num_replicas / capacity
+
+    def _get_backend_utilization(self, backend_name: str) -> float:
+        utilization = 0
+        for cmodel_uuid in self.plan_store.get_backend_cmodel_uuids(backend_name):
+            backend_names = self.plan_store.get_cmodel_backend_names(cmodel_uuid)
+
+            log = self._get_cmodel_log(backend_name, cmodel_uuid)
+            if log is None:
+                # nothing measured yet (e.g. just deployed), use what it should get
+                utilization += self._get_expected_load(cmodel_uuid, len(backend_names))
+                continue
+
+            capacity = self._get_cmodel_capacity(self.cmodels_dict[cmodel_uuid])
+            if capacity > 0:
+                utilization += log.fps / capacity
+
+        return utilization
+
+    def _find_best_fit_backend(
+        self, cmodel_uuid: str, potential_backends: List[BackendInfo], load: float
+    ) -> BackendInfo:
+        # among backends with room for the load, prefer the ones already running
+        # pipeline neighbors of the cmodel, then the most utilized one
+        best_fit_backend = None
+        best_fit_key = (-1, -1)
+        least_utilized_backend = None
+        least_utilization = math.inf
+
+        for backend in potential_backends:
+            utilization = self._get_backend_utilization(backend.backend_name)
+            affinity = self._get_colocation_affinity(cmodel_uuid, backend.backend_name)
+
+            if (
+                utilization + load <= self.target_utilization
+                and (affinity, utilization) > best_fit_key
+            ):
+                best_fit_backend = backend
+                best_fit_key = (affinity, utilization)
+
+            if utilization < least_utilization:
+                least_utilized_backend = backend
+                least_utilization = utilization
+
+        if best_fit_backend is not None:
+            return best_fit_backend
+
+        return least_utilized_backend
+
+    def _deploy_cmodel(self, cmodel_uuid: str, session_uuids: List[str]) -> BackendInfo:
+        cmodel = self.cmodels_dict[cmodel_uuid]
+        required_res = self._compute_required_resource_for_atomic_model(cmodel)
+
+        potential_backends = self._get_potential_backends(cmodel, required_res)
+        if not potential_backends:
+            return None
+
+        num_replicas = len(self._get_cmodel_backend_names(cmodel_uuid)) + 1
+        load = self._get_expected_load(cmodel_uuid, num_replicas)
+
+        best_backend = self._find_best_fit_backend(
+            cmodel_uuid, potential_backends, load
+        )
+        if not best_backend:
+            return None
+
+        self._add_scheduling_plans(session_uuids, cmodel, best_backend)
+
+        return best_backend
+
+    def _is_violating_slo(self, log: NxsBackendCmodelThroughputLog) -> bool:
+        if log.sla_miss_rate > self.max_sla_miss_rate:
+            return True
+        # latency is reported in secs
+        if self.latency_slo_ms > 0 and log.latency_mean * 1000 > self.latency_slo_ms:
+            return True
+        return False
+
+    def _scale_sessions(self):
+        cur_ts = time.time()
+
+        for cmodel_uuid, cmodel in self.cmodels_dict.items():
+            backend_names = self._get_cmodel_backend_names(cmodel_uuid)
+            if not backend_names:
+                # skip if this model was not scheduled
+                continue
+
+            requested_fps = self._get_requested_fps(cmodel_uuid)
+            if requested_fps <= 0:
+                continue
+
+            capacity = self._get_cmodel_capacity(cmodel)
+            if capacity <= 0:
+                continue
+
+            logs: Dict[str, NxsBackendCmodelThroughputLog] = {}
+            for backend_name in backend_names:
+                log = self._get_cmodel_log(backend_name, cmodel_uuid)
+                if log is not None:
+                    logs[backend_name] = log
+
+            is_violating_slo = any(self._is_violating_slo(log) for log in logs.values())
+
+            num_replicas = len(backend_names)
+            num_needed_replicas = math.ceil(
+                requested_fps / (capacity * self.target_utilization)
+            )
+
+            if is_violating_slo and (
+                cur_ts - self.last_slo_scale_up_ts.get(cmodel_uuid, 0)
+                > self.scale_up_cooldown_secs
+            ):
+                # give the previous replica time to absorb load before adding more
+                num_needed_replicas = max(num_needed_replicas, num_replicas + 1)
+                self.last_slo_scale_up_ts[cmodel_uuid] = cur_ts
+
+            if num_needed_replicas > num_replicas:
+                self.over_provisioned_ts.pop(cmodel_uuid, None)
+                session_uuids = self._get_cmodel_session_uuids(cmodel_uuid)
+                for _ in range(num_needed_replicas - num_replicas):
+                    if not self._deploy_cmodel(cmodel_uuid, session_uuids):
+                        break
+                continue
+
+            if num_replicas <= 1 or is_violating_slo:
+                self.over_provisioned_ts.pop(cmodel_uuid, None)
+                continue
+
+            # measured load if all replicas reported, the requested one otherwise
+            load_fps = requested_fps
+            if len(logs) == num_replicas:
+                load_fps = sum(log.fps for log in logs.values())
+
+            utilization = load_fps / (capacity * (num_replicas - 1))
+            if utilization > self.scale_down_utilization:
+                self.over_provisioned_ts.pop(cmodel_uuid, None)
+                continue
+
+            since_ts = self.over_provisioned_ts.setdefault(cmodel_uuid, cur_ts)
+            if cur_ts - since_ts < self.scale_down_delay_secs:
+                continue
+
+            # remove the least loaded replica, then wait again before the next one
+            backend_name = min(
+                backend_names,
+                key=lambda name: logs[name].fps if name in logs else 0,
+            )
+            self._remove_cmodel_from_backend(
+                cmodel, self.current_backends_dict[backend_name]
+            )
+            self.over_provisioned_ts.pop(cmodel_uuid, None)
@@ -0,0 +1,187 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+from nxs_types.message import NxsMsgApplyPlanDelta
+from nxs_types.scheduling_data import (
+    NxsSchedulingPerBackendPlan,
+    NxsSchedulingPerCompositorymodelPlan,
+    NxsUnschedulingPerBackendPlan,
+    NxsUnschedulingPerCompositoryPlan,
+)
+
+
+# Tracks what a backend has been told to run so the scheduler only sends what changed.
+# Every non-empty delta gets the next version number, backends ack versions once
+# applied. Deltas are idempotent on the backend (adding a running session or removing
+# a missing one is a no-op), so if an ack does not come back in time the tracker falls
+# back to the last acked state and the next delta resends everything since then.
+# Duty cycles only change how a backend time-slices its gpu, a cmodel is resent for
+# them only if its duty cycle moved by more than duty_cycle_tolerance.
+class NxsBackendPlanTracker:
+    def __init__(
+        self,
+        backend_name: str,
+        ack_timeout_secs: float = 30,
+        duty_cycle_tolerance: float = 0.1,
+    ) -> None:
+        self.backend_name = backend_name
+        self.ack_timeout_secs = ack_timeout_secs
+        self.duty_cycle_tolerance = duty_cycle_tolerance
+
+        self.version = 0  # last version sent
+        self.acked_version = 0
+
+        # cmodel_uuid -> (plan, duty_cycle), as of acked_version
+        self.acked_state: Dict[
+            str, Tuple[NxsSchedulingPerCompositorymodelPlan, float]
+        ] = {}
+        # cmodel_uuid -> (plan, duty_cycle), once all sent deltas are applied
+        self.expected_state: Dict[
+            str, Tuple[NxsSchedulingPerCompositorymodelPlan, float]
+        ] = {}
+        # version -> (expected state, sent ts) of deltas not acked yet
+        self.pending_versions: Dict[int, Tuple[Dict, float]] = {}
+
+    def reset(self):
+        # backend (re)started without any model
+        self.acked_version = self.version
+        self.acked_state = {}
+        self.expected_state = {}
+        self.pending_versions = {}
+
+    def ack(self, version: int) -> bool:
+        if version not in self.pending_versions:
+            # stale ack, e.g. sent before a timeout or a reset
+            return False
+
+        self.acked_version = version
+        self.acked_state = self.pending_versions[version][0]
+        for pending_version in list(self.pending_versions.keys()):
+            if pending_version <= version:
+                self.pending_versions.pop(pending_version)
+
+        return True
+
+    def has_pending_deltas(self) -> bool:
+        return len(self.pending_versions) > 0
+
+    def generate_delta(
+        self, plan: Optional[NxsSchedulingPerBackendPlan]
+    ) -> Optional[NxsMsgApplyPlanDelta]:
+        # returns None if the backend already runs (or will run) exactly this plan
+        self._check_ack_timeout()
+
+        new_state = self._get_state(plan)
+
+        scheduling_plans = self._compute_scheduling_plans(new_state)
+        unscheduling_plans = self._compute_unscheduling_plans(new_state)
+        if not scheduling_plans and not unscheduling_plans:
+            return None
+
+        self.version += 1
+        self.expected_state = new_state
+        self.pending_versions[self.version] = (new_state, time.time())
+
+        return NxsMsgApplyPlanDelta(
+            version=self.version,
+            scheduling=NxsSchedulingPerBackendPlan(
+                backend_name=self.backend_name,
+                compository_model_plans=[plan for plan, _ in scheduling_plans],
+                duty_cyles=[duty_cycle for _, duty_cycle in scheduling_plans],
+            ),
+            unscheduling=NxsUnschedulingPerBackendPlan(
+                backend_name=self.backend_name,
+                compository_model_plans=unscheduling_plans,
+            ),
+        )
+
+    def _check_ack_timeout(self):
+        if not self.pending_versions:
+            return
+
+        oldest_sent_ts = min(ts for _, ts in self.pending_versions.values())
+        if time.time() - oldest_sent_ts > self.ack_timeout_secs:
+            self.expected_state = self.acked_state
+            self.pending_versions = {}
+
+    def _get_state(
+        self, plan: Optional[NxsSchedulingPerBackendPlan]
+    ) -> Dict[str, Tuple[NxsSchedulingPerCompositorymodelPlan, float]]:
+        state = {}
+        if plan is None:
+            return state
+
+        for idx, cmodel_plan in enumerate(plan.compository_model_plans):
+            duty_cycle = 1.0
+            if idx < len(plan.duty_cyles):
+                duty_cycle = plan.duty_cyles[idx]
+            state[cmodel_plan.model_uuid] = (cmodel_plan, duty_cycle)
+
+        return state
+
+    def _compute_scheduling_plans(
+        self, new_state: Dict
+    ) -> List[Tuple[NxsSchedulingPerCompositorymodelPlan, float]]:
+        scheduling_plans = []
+
+        for cmodel_uuid, (cmodel_plan, duty_cycle) in new_state.items():
+            if cmodel_uuid not in self.expected_state:
+                # new cmodel, the whole plan is needed to deploy it
+                scheduling_plans.append((cmodel_plan, duty_cycle))
+                continue
+
+            last_cmodel_plan, last_duty_cycle = self.expected_state[cmodel_uuid]
+            last_session_uuids = set(last_cmodel_plan.session_uuid_list)
+            new_session_uuids = [
+                session_uuid
+                for session_uuid in cmodel_plan.session_uuid_list
+                if session_uuid not in last_session_uuids
+            ]
+
+            if abs(duty_cycle - last_duty_cycle) <= self.duty_cycle_tolerance:
+                # small changes are not sent, remember what the backend has so they
+                # cannot add up unnoticed
+                duty_cycle = last_duty_cycle
+                new_state[cmodel_uuid] = (cmodel_plan, duty_cycle)
+                if not new_session_uuids:
+                    continue
+
+            scheduling_plans.append(
+                (
+                    NxsSchedulingPerCompositorymodelPlan(
+                        model_uuid=cmodel_uuid,
+                        session_uuid_list=new_session_uuids,
+                        component_model_plans=cmodel_plan.component_model_plans,
+                        extra_info=cmodel_plan.extra_info,
+                    ),
+                    duty_cycle,
+                )
+            )
+
+        return scheduling_plans
+
+    def _compute_unscheduling_plans(
+        self, new_state: Dict
+    ) -> List[NxsUnschedulingPerCompositoryPlan]:
+        unscheduling_plans = []
+
+        for cmodel_uuid, (last_cmodel_plan, _) in self.expected_state.items():
+            session_uuids = set()
+            if cmodel_uuid in new_state:
+                session_uuids = set(new_state[cmodel_uuid][0].session_uuid_list)
+
+            removed_session_uuids = [
+                session_uuid
+                for session_uuid in last_cmodel_plan.session_uuid_list
+                if session_uuid not in session_uuids
+            ]
+            if not removed_session_uuids:
+                continue
+
+            unscheduling_plans.append(
+                NxsUnschedulingPerCompositoryPlan(
+                    model_uuid=cmodel_uuid, session_uuid_list=removed_session_uuids
+                )
+            )
+
+        return unscheduling_plans
@@ -21,6 +21,7 @@ class NxsQueueExceptionInternalError(Exception):
 
 class NxsQueueType(str, Enum):
     REDIS = "redis"
+    REDIS_ASYNC = "redis_async"
     AZURE_QUEUE = "azure_queue"
 
 
@@ -65,6 +66,10 @@ class NxsQueuePusher(ABC):
     def push_to_session(self, topic: str, session_uuid: str, data) -> None:
         raise NotImplementedError
 
+    def push_many(self, topic: str, items: List) -> None:
+        for data in items:
+            self.push(topic, data)
+
     @abstractmethod
     def delete_topic(self, topic: str) -> None:
         raise NotImplementedError
@@ -83,6 +88,12 @@ class NxsQueuePullerFactory:
             )
 
             return NxsRedisQueuePuller(**kwargs)
+        elif type == NxsQueueType.REDIS_ASYNC:
+            from nxs_libs.queue.nxs_redis_queue_async import (
+                NxsAsyncRedisQueuePuller,
+            )
+
+            return NxsAsyncRedisQueuePuller(**kwargs)
         elif type == NxsQueueType.AZURE_QUEUE:
             from nxs_libs.queue.nxs_azure_queue import (
                 NxsAzureQueuePuller,
@@ -102,6 +113,12 @@ class NxsQueuePusherFactory:
             )
 
             return NxsRedisQueuePusher(**kwargs)
+        elif type == NxsQueueType.REDIS_ASYNC:
+            from nxs_libs.queue.nxs_redis_queue_async import (
+                NxsAsyncRedisQueuePusher,
+            )
+
+            return NxsAsyncRedisQueuePusher(**kwargs)
         elif type == NxsQueueType.AZURE_QUEUE:
             from nxs_libs.queue.nxs_azure_queue import (
                 NxsAzureQueuePusher,
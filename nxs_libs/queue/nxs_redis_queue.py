@@ -1,10 +1,13 @@
 import pickle
 import time
-from threading import Thread
+from multiprocessing import Pipe
+from threading import Lock, Thread
 from typing import Any, Dict, List
 
 import numpy as np
+from redis.exceptions import ResponseError
 from nxs_libs.queue import NxsQueuePuller, NxsQueuePusher
+from nxs_libs.serialization import nxs_dumps, nxs_loads
 from nxs_utils.logging import NxsLogLevel, write_log
 from nxs_utils.nxs_helper import init_redis_client
 
@@ -54,6 +57,11 @@ class NxsRedisQueuePuller(NxsQueuePuller):
         self._max_timeout_secs = 1  # maximum timeout for each thread to read data
         self._check_topic_period_secs = 3
 
+        # after a blocking pop succeeds, drain up to this many items with one
+        # LPOP <key> <count> round trip (requires redis >= 6.2)
+        self._max_items_per_pull = 32
+        self._is_lpop_count_supported = True
+
         # spawn threads to read data
         self._reader_threads: List[Thread] = []
         self._reader_thread_alive_flags: List[
@@ -137,6 +145,12 @@ class NxsRedisQueuePuller(NxsQueuePuller):
                 _, d = data
                 # d = pickle.loads(d)
                 self._buf.append(d)
+
+                num_items = min(
+                    self._max_items_per_pull - 1, self._buf_size - len(self._buf)
+                )
+                if num_items > 0 and self._is_lpop_count_supported:
+                    self._buf.extend(self._lpop_many(client, topic, num_items))
             except:
                 time.sleep(0.01)
                 client = init_redis_client(
@@ -147,6 +161,19 @@ class NxsRedisQueuePuller(NxsQueuePuller):
             f"Reader thread {thread_id} / {self._num_partitions} is being terminated!!!"
         )
 
+    def _lpop_many(self, client, topic: str, count: int) -> List:
+        try:
+            data = client.execute_command("LPOP", topic, count)
+        except ResponseError:
+            self._log("LPOP with count is not supported, draining one item at a time")
+            self._is_lpop_count_supported = False
+            return []
+
+        if data is None:
+            return []
+
+        return data
+
     def _monitor_thread_fn(self):
         self._log("Monitoring thread was created!!!")
 
@@ -204,15 +231,12 @@ class NxsRedisQueuePuller(NxsQueuePuller):
         return 1
 
     def pull(self) -> List:
-        results = []
-
+        # reader threads only append, so slicing off the head is safe
         cur_buf_size = len(self._buf)
-        for _ in range(cur_buf_size):
-            data = self._buf.pop(0)
-            data = pickle.loads(data)
-            results.append(data)
+        items = self._buf[:cur_buf_size]
+        del self._buf[:cur_buf_size]
 
-        return results
+        return [nxs_loads(data) for data in items]
 
     def pull_buffered_and_close(self) -> List:
         # stop receiving data
@@ -237,6 +261,10 @@ class NxsRedisQueuePuller(NxsQueuePuller):
         assert timeout_secs >= 0.001, "timeout_secs should be at least 1ms!!!"
         self._max_timeout_secs = timeout_secs
 
+    def update_max_items_per_pull(self, max_items: int):
+        assert max_items >= 1, "max_items should be at least 1!!!"
+        self._max_items_per_pull = max_items
+
     def update_check_num_partition_period(self, period_secs: float):
         assert period_secs >= 1, "period_secs should be at least 1 second!!!"
         self._check_num_partitions_period_secs = period_secs
@@ -259,6 +287,354 @@ class NxsRedisQueuePuller(NxsQueuePuller):
         self._set_with_retry(self._topic, pickle.dumps(num_partitions))
 
 
+# Pulls many topics (e.g. all session topics of a cmodel) with a small fixed pool of
+# reader threads and connections instead of threads and connections per topic. Each
+# reader blocks on all partition keys assigned to it with one multi-key BLPOP, starting
+# from a different key every time so a busy key cannot starve the others, then drains
+# up to _max_items_per_pull items of the key that had data. Every topic has its own
+# buffer of at most buf_size items, keys of full topics are not polled until the topic
+# is pulled. Topics can be added and removed at any time, readers pick up new keys once
+# their current BLPOP returns (within _max_timeout_secs).
+class NxsRedisMultiTopicQueuePuller(NxsQueuePuller):
+    def __init__(
+        self,
+        address: str,
+        port: int,
+        password: str,
+        is_using_ssl: bool,
+        num_threads: int = 2,
+        **kwargs,
+    ) -> None:
+        super().__init__()
+
+        self._address = address
+        self._port = port
+        self._password = password
+        self._is_using_ssl = is_using_ssl
+
+        self._client = init_redis_client(
+            self._address, self._port, self._password, self._is_using_ssl
+        )
+
+        self._log_level = NxsLogLevel.INFO
+        self._logging_prefix = "NxsRedisMultiTopicQueuePuller"
+
+        self._lock = Lock()
+        self._topic2num_partitions: Dict[str, int] = {}
+        self._topic2buf: Dict[str, List] = {}
+
+        self._buf_size = 1  # per topic
+        self._max_timeout_secs = 1
+        self._max_items_per_pull = 32
+        self._is_lpop_count_supported = True
+        # a redis cluster refuses multi-key commands over keys in different slots
+        self._is_multi_key_blpop_supported = True
+
+        self._check_num_partitions_period_secs = 3
+
+        # readers write a byte when a buffer gets new items, so the consumer can block
+        # on the read end instead of polling the buffers
+        self._notify_reader, self._notify_writer = Pipe(duplex=False)
+        self._is_notified = False
+
+        self._num_threads = max(1, num_threads)
+        self._reader_thread_alive_flag = True
+        self._reader_threads: List[Thread] = []
+        for tid in range(self._num_threads):
+            t = Thread(target=self._reader_thread_fn, args=(tid,))
+            self._reader_threads.append(t)
+            t.start()
+
+        self._monitor_thread = Thread(target=self._monitor_thread_fn, args=())
+        self._monitor_thread_alive_flag = True
+        self._monitor_thread.start()
+
+    def _recreate_client(self):
+        try:
+            self._client = init_redis_client(
+                self._address, self._port, self._password, self._is_using_ssl
+            )
+        except:
+            pass
+
+    def _set_with_retry(self, topic: str, data: Any):
+        while True:
+            try:
+                self._client.set(topic, data)
+                break
+            except:
+                time.sleep(0.01)
+                self._recreate_client()
+
+    def _get_many_with_retry(self, topics: List[str]) -> List:
+        while True:
+            try:
+                pipe = self._client.pipeline(transaction=False)
+                for topic in topics:
+                    pipe.get(topic)
+                return pipe.execute()
+            except:
+                time.sleep(0.01)
+                self._recreate_client()
+
+    def add_topic(self, topic: str, num_partitions: int = 0):
+        # num_partitions is read from the topic key if not given
+        if num_partitions <= 0:
+            num_partitions = self._get_topics_num_partitions([topic])[0]
+
+        with self._lock:
+            self._topic2num_partitions[topic] = num_partitions
+            self._topic2buf.setdefault(topic, [])
+
+    def remove_topic(self, topic: str) -> List:
+        # returns what was buffered for the topic, readers stop polling it
+        with self._lock:
+            self._topic2num_partitions.pop(topic, None)
+            items = self._topic2buf.pop(topic, [])
+
+        return [nxs_loads(data) for data in items]
+
+    def get_topic_num_buffered_items(self, topic: str) -> int:
+        with self._lock:
+            return len(self._topic2buf.get(topic, []))
+
+    def pull_topic(self, topic: str) -> List:
+        with self._lock:
+            buf = self._topic2buf.get(topic)
+            if not buf:
+                return []
+            items = buf[:]
+            del buf[:]
+
+        return [nxs_loads(data) for data in items]
+
+    def get_wait_handle(self):
+        # ready once any topic got new items since the last clear_notification()
+        return self._notify_reader
+
+    def clear_notification(self):
+        with self._lock:
+            while self._notify_reader.poll():
+                self._notify_reader.recv_bytes()
+            self._is_notified = False
+
+    def set_topic_num_partitions(self, topic: str, num_partitions: int):
+        self._set_with_retry(topic, pickle.dumps(num_partitions))
+        with self._lock:
+            if topic in self._topic2num_partitions:
+                self._topic2num_partitions[topic] = num_partitions
+
+    def _get_reader_keys(self, thread_id: int) -> Dict[str, str]:
+        # partition key -> topic, for the keys this reader polls
+        key2topic = {}
+        with self._lock:
+            for topic, num_partitions in self._topic2num_partitions.items():
+                if len(self._topic2buf[topic]) >= self._buf_size:
+                    continue
+
+                for partition_idx in range(num_partitions):
+                    key = f"{topic}_{partition_idx}"
+                    if hash(key) % self._num_threads == thread_id:
+                        key2topic[key] = topic
+
+        return key2topic
+
+    def _get_num_free_slots(self, topic: str) -> int:
+        with self._lock:
+            if topic not in self._topic2buf:
+                return 0
+            return self._buf_size - len(self._topic2buf[topic])
+
+    def _add_to_buf(self, client, topic: str, key: str, items: List):
+        with self._lock:
+            if topic in self._topic2buf:
+                self._topic2buf[topic].extend(items)
+                if not self._is_notified:
+                    self._notify_writer.send_bytes(b"1")
+                    self._is_notified = True
+                return
+
+        # topic was removed meanwhile, put the items back in their original order
+        self._log(f"Pushing {len(items)} items of removed topic {topic} back")
+        client.lpush(key, *reversed(items))
+
+    def _reader_thread_fn(self, thread_id: int):
+        self._log(f"Reader thread {thread_id} was created")
+
+        # reader thread should use its own client
+        client = init_redis_client(
+            self._address, self._port, self._password, self._is_using_ssl
+        )
+
+        offset = 0
+        while self._reader_thread_alive_flag:
+            key2topic = self._get_reader_keys(thread_id)
+            if not key2topic:
+                time.sleep(0.01)
+                continue
+
+            # rotate the keys so every key gets to be checked first
+            keys = list(key2topic.keys())
+            offset = (offset + 1) % len(keys)
+            keys = keys[offset:] + keys[:offset]
+
+            try:
+                if self._is_multi_key_blpop_supported or len(keys) == 1:
+                    has_data = self._blpop(client, keys, key2topic)
+                else:
+                    has_data = self._sweep(client, keys, key2topic)
+
+                if not has_data:
+                    time.sleep(0.001)
+            except:
+                time.sleep(0.01)
+                client = init_redis_client(
+                    self._address, self._port, self._password, self._is_using_ssl
+                )
+
+        self._log(f"Reader thread {thread_id} is being terminated")
+
+    def _blpop(self, client, keys: List[str], key2topic: Dict[str, str]) -> bool:
+        try:
+            data = client.blpop(keys, timeout=self._max_timeout_secs)
+        except ResponseError:
+            self._log("Multi-key BLPOP is not supported, sweeping keys instead")
+            self._is_multi_key_blpop_supported = False
+            return False
+
+        if data is None:
+            return False
+
+        key, d = data
+        if isinstance(key, bytes):
+            key = key.decode()
+        topic = key2topic[key]
+
+        items = [d]
+        num_items = min(
+            self._max_items_per_pull - 1, self._get_num_free_slots(topic) - 1
+        )
+        if num_items > 0 and self._is_lpop_count_supported:
+            items.extend(self._lpop_many(client, key, num_items))
+
+        self._add_to_buf(client, topic, key, items)
+        return True
+
+    def _sweep(self, client, keys: List[str], key2topic: Dict[str, str]) -> bool:
+        # one round trip popping an item of every key
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.lpop(key)
+        results = pipe.execute()
+
+        has_data = False
+        for key, d in zip(keys, results):
+            if d is None:
+                continue
+            self._add_to_buf(client, key2topic[key], key, [d])
+            has_data = True
+
+        return has_data
+
+    def _lpop_many(self, client, key: str, count: int) -> List:
+        try:
+            data = client.execute_command("LPOP", key, count)
+        except ResponseError:
+            self._log("LPOP with count is not supported, draining one item at a time")
+            self._is_lpop_count_supported = False
+            return []
+
+        if data is None:
+            return []
+
+        return data
+
+    def _monitor_thread_fn(self):
+        self._log("Monitoring thread was created!!!")
+
+        t0 = time.time()
+        while self._monitor_thread_alive_flag:
+            if time.time() - t0 < self._check_num_partitions_period_secs:
+                time.sleep(0.1)
+                continue
+
+            # one round trip for all topics
+            with self._lock:
+                topics = list(self._topic2num_partitions.keys())
+            if topics:
+                num_partitions_list = self._get_topics_num_partitions(topics)
+                with self._lock:
+                    for topic, num_partitions in zip(topics, num_partitions_list):
+                        if topic in self._topic2num_partitions:
+                            self._topic2num_partitions[topic] = num_partitions
+
+            t0 = time.time()
+
+        self._log("Monitoring thread is being terminated!!!")
+
+    def _get_topics_num_partitions(self, topics: List[str]) -> List[int]:
+        num_partitions_list = []
+        for data in self._get_many_with_retry(topics):
+            num_partitions = 1
+            if data is not None:
+                num_partitions = pickle.loads(data)
+            num_partitions_list.append(num_partitions)
+
+        return num_partitions_list
+
+    def pull(self) -> List:
+        with self._lock:
+            topics = list(self._topic2buf.keys())
+
+        items = []
+        for topic in topics:
+            items.extend(self.pull_topic(topic))
+
+        return items
+
+    def stop(self):
+        # buffered items can still be pulled afterwards
+        self._monitor_thread_alive_flag = False
+        self._reader_thread_alive_flag = False
+
+        self._monitor_thread.join()
+        for t in self._reader_threads:
+            t.join()
+
+    def pull_buffered_and_close(self) -> List:
+        self.stop()
+        return self.pull()
+
+    def update_max_timeout(self, timeout_secs: float):
+        assert timeout_secs >= 0.001, "timeout_secs should be at least 1ms!!!"
+        self._max_timeout_secs = timeout_secs
+
+    def update_max_items_per_pull(self, max_items: int):
+        assert max_items >= 1, "max_items should be at least 1!!!"
+        self._max_items_per_pull = max_items
+
+    def change_log_level(self, level: NxsLogLevel):
+        self._log_level = level
+
+    def _log(self, log):
+        write_log(self._logging_prefix, log, self._log_level)
+
+    def set_buf_size(self, size: int):
+        if size > 0:
+            self._buf_size = size
+
+    def get_num_buffered_items(self):
+        with self._lock:
+            return sum(len(buf) for buf in self._topic2buf.values())
+
+    def set_num_partitions(self, num_partitions: int):
+        with self._lock:
+            topics = list(self._topic2num_partitions.keys())
+
+        for topic in topics:
+            self.set_topic_num_partitions(topic, num_partitions)
+
+
 class NxsRedisQueuePusher(NxsQueuePusher):
     def __init__(
         self,
@@ -325,6 +701,28 @@ class NxsRedisQueuePusher(NxsQueuePusher):
                 time.sleep(0.01)
                 self._recreate_client()
 
+    def _push_many_with_retry(
+        self, topic2items: Dict[str, List], expiration_duration_secs: int
+    ):
+        while True:
+            try:
+                pipe = self._client.pipeline(transaction=False)
+                expired_topics = []
+                for topic, items in topic2items.items():
+                    pipe.rpush(topic, *items)
+                    t0 = self._topic2expiration.get(topic, time.time())
+                    if time.time() - t0 > self._expiration_duration_secs / 2:
+                        pipe.expire(topic, expiration_duration_secs)
+                        expired_topics.append(topic)
+                pipe.execute()
+
+                for topic in expired_topics:
+                    self._topic2expiration[topic] = time.time()
+                break
+            except:
+                time.sleep(0.01)
+                self._recreate_client()
+
     def _get_with_retry(self, topic: str):
         while True:
             try:
@@ -341,7 +739,7 @@ class NxsRedisQueuePusher(NxsQueuePusher):
         self._topic2timestamp[topic] = time.time()
         self._topic2partitionIdx[topic] = 0
 
-    def push(self, topic: str, data):
+    def _refresh_topic_num_partitions(self, topic: str):
         if (not topic in self._topic2timestamp) or (
             time.time() - self._topic2timestamp[topic]
             > self._check_num_partitions_period_secs
@@ -351,22 +749,41 @@ class NxsRedisQueuePusher(NxsQueuePusher):
             self._topic2partitionIdx[topic] = 0
             self._topic2timestamp[topic] = time.time()
 
+    def _next_partitioned_topic(self, topic: str) -> str:
         # chosen_partition_idx = np.random.randint(self._topic2partitions[topic])
         chosen_partition_idx = self._topic2partitionIdx[topic]
         self._topic2partitionIdx[topic] = (
             self._topic2partitionIdx[topic] + 1
         ) % self._topic2partitions[topic]
 
-        partitioned_topic = self._get_partitioned_topic_name(
-            topic, chosen_partition_idx
-        )
+        return self._get_partitioned_topic_name(topic, chosen_partition_idx)
+
+    def push(self, topic: str, data):
+        self._refresh_topic_num_partitions(topic)
+        partitioned_topic = self._next_partitioned_topic(topic)
 
         # self._client.rpush(partitioned_topic, pickle.dumps(data))
         # self._client.expire(partitioned_topic, self._expiration_duration_secs)
         self._push_with_retry(
-            partitioned_topic, pickle.dumps(data), self._expiration_duration_secs
+            partitioned_topic, nxs_dumps(data), self._expiration_duration_secs
         )
 
+    def push_many(self, topic: str, items: List):
+        if not items:
+            return
+
+        self._refresh_topic_num_partitions(topic)
+
+        # spread items across partitions and send everything in one pipeline
+        topic2items: Dict[str, List] = {}
+        for data in items:
+            partitioned_topic = self._next_partitioned_topic(topic)
+            if partitioned_topic not in topic2items:
+                topic2items[partitioned_topic] = []
+            topic2items[partitioned_topic].append(nxs_dumps(data))
+
+        self._push_many_with_retry(topic2items, self._expiration_duration_secs)
+
     def push_to_session(self, topic: str, session_uuid: str, data) -> None:
         new_topic = f"{topic}_{session_uuid}"
         return self.push(new_topic, data)
@@ -0,0 +1,350 @@
+import asyncio
+import pickle
+import time
+from typing import Dict, List
+
+from nxs_libs.queue import (
+    NxsQueueExceptionInternalError,
+    NxsQueuePuller,
+    NxsQueuePusher,
+)
+from nxs_libs.serialization import nxs_dumps, nxs_loads
+from nxs_utils.logging import NxsLogLevel, write_log
+from nxs_utils.nxs_helper import import_async_redis, init_async_redis_client
+
+aioredis = import_async_redis()
+
+# asyncio counterparts of NxsRedisQueuePuller / NxsRedisQueuePusher. They share the
+# same partitioning scheme ("topic" stores the number of partitions, data lives in
+# topic_0, topic_1, ...) so they interoperate with the threaded implementations.
+# All data-path methods are coroutines and must be awaited from the event loop.
+
+
+class NxsAsyncRedisQueuePuller(NxsQueuePuller):
+    def __init__(
+        self,
+        address: str,
+        port: int,
+        password: str,
+        is_using_ssl: bool,
+        topic: str,
+        **kwargs,
+    ) -> None:
+        super().__init__()
+
+        self._address = address
+        self._port = port
+        self._password = password
+        self._is_using_ssl = is_using_ssl
+        self._session_uuid = ""
+        if "session_uuid" in kwargs:
+            self._session_uuid: str = kwargs["session_uuid"]
+        self._topic = (
+            f"{topic}_{self._session_uuid}" if self._session_uuid != "" else topic
+        )
+        self._max_connections = kwargs.get("max_connections", 8)
+
+        self._client = init_async_redis_client(
+            self._address,
+            self._port,
+            self._password,
+            self._is_using_ssl,
+            self._max_connections,
+        )
+
+        self._log_level = NxsLogLevel.INFO
+        self._logging_prefix = f"NxsAsyncRedisQueuePuller_{self._topic}"
+
+        self._check_num_partitions_period_secs = 3
+        self._check_num_partitions_t0: float = 0
+        self._num_partitions = 1
+
+        self._buf_size = 1
+        self._max_timeout_secs = 1  # maximum time a pull() blocks on redis
+        self._max_items_per_pull = 64
+        self._is_lpop_count_supported = True
+        self._is_closed = False
+
+    async def _recreate_client(self):
+        old_client = self._client
+        try:
+            self._client = init_async_redis_client(
+                self._address,
+                self._port,
+                self._password,
+                self._is_using_ssl,
+                self._max_connections,
+            )
+        except Exception as e:
+            self._log(f"Failed to recreate redis client: {e}")
+            return
+
+        # the pool of the old client would otherwise keep its connections open
+        try:
+            await old_client.close(close_connection_pool=True)
+        except Exception as e:
+            self._log(f"Failed to close redis client: {e}")
+
+    async def _refresh_num_partitions(self):
+        if (
+            time.time() - self._check_num_partitions_t0
+            < self._check_num_partitions_period_secs
+        ):
+            return
+
+        data = await self._client.get(self._topic)
+        self._num_partitions = pickle.loads(data) if data is not None else 1
+        self._check_num_partitions_t0 = time.time()
+
+    async def pull(self) -> List:
+        if self._is_closed:
+            return []
+
+        try:
+            await self._refresh_num_partitions()
+
+            # a single BLPOP covers all partitions of the topic
+            keys = [f"{self._topic}_{idx}" for idx in range(self._num_partitions)]
+            data = await self._client.blpop(keys, timeout=self._max_timeout_secs)
+        except Exception:
+            await asyncio.sleep(0.01)
+            await self._recreate_client()
+            return []
+
+        if data is None:
+            return []
+
+        key, d = data
+        items = [d]
+
+        # drain whatever else is queued on that partition in one round trip
+        if self._max_items_per_pull > 1 and self._is_lpop_count_supported:
+            try:
+                remains = await self._client.execute_command(
+                    "LPOP", key, self._max_items_per_pull - 1
+                )
+                if remains:
+                    items.extend(remains)
+            except aioredis.ResponseError:
+                self._is_lpop_count_supported = False
+            except Exception:
+                pass
+
+        # decode items one by one so a malformed one does not drop the others
+        results = []
+        for d in items:
+            try:
+                results.append(nxs_loads(d))
+            except Exception as e:
+                self._log(f"Dropped an item that failed to decode: {e}")
+
+        return results
+
+    async def pull_buffered_and_close(self) -> List:
+        # nothing is buffered locally, every pull() goes to redis
+        self._is_closed = True
+        await self._client.close(close_connection_pool=True)
+        return []
+
+    def set_buf_size(self, size: int):
+        if size > 0:
+            self._buf_size = size
+
+    def get_num_buffered_items(self):
+        return 0
+
+    async def set_num_partitions(self, num_partitions: int):
+        await self._client.set(self._topic, pickle.dumps(num_partitions))
+
+    def update_max_timeout(self, timeout_secs: float):
+        assert timeout_secs >= 0.001, "timeout_secs should be at least 1ms!!!"
+        self._max_timeout_secs = timeout_secs
+
+    def update_max_items_per_pull(self, max_items: int):
+        assert max_items >= 1, "max_items should be at least 1!!!"
+        self._max_items_per_pull = max_items
+
+    def update_check_num_partition_period(self, period_secs: float):
+        assert period_secs >= 1, "period_secs should be at least 1 second!!!"
+        self._check_num_partitions_period_secs = period_secs
+
+    def change_log_level(self, level: NxsLogLevel):
+        self._log_level = level
+
+    def _log(self, log):
+        write_log(self._logging_prefix, log, self._log_level)
+
+
+class NxsAsyncRedisQueuePusher(NxsQueuePusher):
+    def __init__(
+        self,
+        address: str,
+        port: int,
+        password: str,
+        is_using_ssl: bool,
+        **kwargs,
+    ) -> None:
+        super().__init__()
+
+        self._address = address
+        self._port = port
+        self._password = password
+        self._is_using_ssl = is_using_ssl
+        self._max_connections = kwargs.get("max_connections", 64)
+
+        self._client = init_async_redis_client(
+            self._address,
+            self._port,
+            self._password,
+            self._is_using_ssl,
+            self._max_connections,
+        )
+
+        self._log_level = NxsLogLevel.INFO
+        self._logging_prefix = f"NxsAsyncRedisQueuePusher"
+
+        self._topic2partitions: dict[str, int] = {}
+        self._topic2partitionIdx: dict[str, int] = {}
+        self._topic2timestamp: dict[str, float] = {}
+        self._topic2expiration: dict[str, float] = {}
+
+        self._check_num_partitions_period_secs = 3
+        self._new_topic_num_partitions = 1
+        self._expiration_duration_secs: int = 3600
+        self._max_retries = 3
+
+    async def _recreate_client(self):
+        old_client = self._client
+        try:
+            self._client = init_async_redis_client(
+                self._address,
+                self._port,
+                self._password,
+                self._is_using_ssl,
+                self._max_connections,
+            )
+        except Exception as e:
+            self._log(f"Failed to recreate redis client: {e}")
+            return
+
+        # the pool of the old client would otherwise keep its connections open
+        try:
+            await old_client.close(close_connection_pool=True)
+        except Exception as e:
+            self._log(f"Failed to close redis client: {e}")
+
+    async def _execute_with_retry(self, fn):
+        # unlike the threaded pusher we never spin forever on the event loop
+        for _ in range(self._max_retries):
+            client = self._client
+            try:
+                return await fn()
+            except Exception as e:
+                self._log(f"Redis error: {e}")
+                await asyncio.sleep(0.01)
+                if self._client is client:
+                    # concurrent pushes failing together recreate it only once
+                    await self._recreate_client()
+
+        raise NxsQueueExceptionInternalError("redis is not reachable")
+
+    async def _push_with_retry(self, topic2items: Dict[str, List]):
+        async def _push():
+            # all rpush calls and the occasional expire share a single round trip
+            pipe = self._client.pipeline(transaction=False)
+            for topic, items in topic2items.items():
+                pipe.rpush(topic, *items)
+
+                t0 = self._topic2expiration.get(topic, 0)
+                if time.time() - t0 > self._expiration_duration_secs / 2:
+                    pipe.expire(topic, self._expiration_duration_secs)
+                    self._topic2expiration[topic] = time.time()
+
+            await pipe.execute()
+
+        await self._execute_with_retry(_push)
+
+    async def _get_topic_num_partitions(self, topic) -> int:
+        async def _get():
+            return await self._client.get(topic)
+
+        data = await self._execute_with_retry(_get)
+
+        if not isinstance(data, type(None)):
+            return pickle.loads(data)
+
+        return 1
+
+    async def _get_partitioned_topic(self, topic: str) -> str:
+        if (not topic in self._topic2timestamp) or (
+            time.time() - self._topic2timestamp[topic]
+            > self._check_num_partitions_period_secs
+        ):
+            # set timestamp first so concurrent pushes don't all refresh at once
+            self._topic2timestamp[topic] = time.time()
+            self._topic2partitions.setdefault(topic, 1)
+            self._topic2partitionIdx.setdefault(topic, 0)
+            num_partitions = await self._get_topic_num_partitions(topic)
+            self._topic2partitions[topic] = num_partitions
+            self._topic2partitionIdx[topic] = 0
+
+        chosen_partition_idx = self._topic2partitionIdx[topic]
+        self._topic2partitionIdx[topic] = (
+            self._topic2partitionIdx[topic] + 1
+        ) % self._topic2partitions[topic]
+
+        return self._get_partitioned_topic_name(topic, chosen_partition_idx)
+
+    async def create_topic(self, topic: str):
+        num_partitions = self._new_topic_num_partitions
+
+        async def _set():
+            await self._client.set(topic, pickle.dumps(num_partitions))
+
+        await self._execute_with_retry(_set)
+        self._topic2partitions[topic] = num_partitions
+        self._topic2timestamp[topic] = time.time()
+        self._topic2partitionIdx[topic] = 0
+
+    async def push(self, topic: str, data):
+        partitioned_topic = await self._get_partitioned_topic(topic)
+        await self._push_with_retry({partitioned_topic: [nxs_dumps(data)]})
+
+    async def push_many(self, topic: str, items: List):
+        topic2items: Dict[str, List] = {}
+        for data in items:
+            partitioned_topic = await self._get_partitioned_topic(topic)
+            if partitioned_topic not in topic2items:
+                topic2items[partitioned_topic] = []
+            topic2items[partitioned_topic].append(nxs_dumps(data))
+
+        if topic2items:
+            await self._push_with_retry(topic2items)
+
+    async def push_to_session(self, topic: str, session_uuid: str, data) -> None:
+        new_topic = f"{topic}_{session_uuid}"
+        return await self.push(new_topic, data)
+
+    async def delete_topic(self, topic: str):
+        pass
+
+    def update_check_num_partition_period(self, period_secs: float):
+        self._check_num_partitions_period_secs = period_secs
+
+    def update_new_topic_num_partitions(self, num_partitions: int):
+        assert num_partitions >= 1, "num_partitions should be larger than 0 !!!"
+        self._new_topic_num_partitions = num_partitions
+
+    def update_expiration_duration_secs(self, duration_secs: float):
+        assert duration_secs >= 30, "duration_secs should be larger than 30 !!!"
+        self._expiration_duration_secs = int(duration_secs)
+
+    def _get_partitioned_topic_name(self, topic: str, partition_idx: int):
+        return f"{topic}_{partition_idx}"
+
+    def update_config(self, config: dict = {}):
+        if "num_partitions" in config:
+            self._new_topic_num_partitions = config["num_partitions"]
+
+    def _log(self, log):
+        write_log(self._logging_prefix, log, self._log_level)
@@ -0,0 +1,37 @@
+import pickle
+
+from nxs_libs.serialization.wire_format import decode, encode, is_wire_format
+from nxs_types.infer import NxsInferRequest, NxsTensorsInferRequest
+from nxs_types.infer_result import NxsInferResult
+
+
+def nxs_dumps(data) -> bytes:
+    # infer requests/results use the binary envelope, everything else (control
+    # messages, internal batches) is still pickled
+    if isinstance(data, (NxsInferRequest, NxsInferResult, NxsTensorsInferRequest)):
+        return encode(data)
+
+    return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def nxs_loads(data):
+    if is_wire_format(data):
+        return decode(data)
+
+    return pickle.loads(data)
+
+
+def encode_if_supported(data):
+    # used on inter-process queues: requests/results travel as wire bytes while
+    # other items are left to the queue's own pickling
+    if isinstance(data, (NxsInferRequest, NxsInferResult, NxsTensorsInferRequest)):
+        return encode(data)
+
+    return data
+
+
+def decode_if_encoded(data):
+    if isinstance(data, bytes) and is_wire_format(data):
+        return decode(data)
+
+    return data
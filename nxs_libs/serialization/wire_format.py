@@ -0,0 +1,299 @@
+import json
+import struct
+from enum import IntEnum
+from typing import Dict, List, Optional, Union
+
+from nxs_types.infer import (
+    NxsInferInput,
+    NxsInferInputType,
+    NxsInferRequest,
+    NxsInferStatus,
+    NxsTensorsInferRequest,
+)
+from nxs_types.infer_result import NxsInferResult, NxsInferResultWithMetadata
+
+# Layout of an envelope (all integers little-endian):
+#
+#     magic       3 bytes  b"NXW"
+#     version     u8
+#     kind        u8       NxsWireKind
+#     reserved    3 bytes
+#     header_len  u32
+#     num_frames  u32
+#     frame_lens  u64 * num_frames
+#     header      header_len bytes of utf-8 json
+#     frames      raw buffers, each starting at a FRAME_ALIGNMENT boundary
+#
+# The json header carries everything needed to route a message (task/session uuid,
+# remaining pipeline, status) so peek_header() never touches the frames. Frames are
+# handed back as memoryviews over the received buffer, e.g. tensors can be read with
+# np.frombuffer(frame, dtype).reshape(shape) without copying.
+#
+# Decoded requests are built with construct(), so their input data stays a memoryview
+# and they cannot be pickled. Forward them with nxs_dumps()/encode_if_supported(),
+# which re-encode them; NxsInferRequest(**decoded.dict()) validates and makes a
+# standalone copy when one is really needed.
+
+NXS_WIRE_MAGIC = b"NXW"
+NXS_WIRE_VERSION = 1
+FRAME_ALIGNMENT = 64
+
+_PREFIX = struct.Struct("<3sBB3xII")
+
+
+class NxsWireExceptionInvalidFormat(Exception):
+    pass
+
+
+class NxsWireExceptionUnsupportedVersion(Exception):
+    pass
+
+
+class NxsWireKind(IntEnum):
+    INFER_REQUEST = 1
+    INFER_RESULT = 2
+    TENSORS_INFER_REQUEST = 3
+
+
+class NxsWireHeader:
+    def __init__(self, kind: NxsWireKind, header: Dict, frame_offsets: List) -> None:
+        self.kind = kind
+        self.header = header
+        self.frame_offsets = frame_offsets  # list of (offset, length)
+
+    @property
+    def task_uuid(self) -> str:
+        return self.header.get("task_uuid", "")
+
+    @property
+    def session_uuid(self) -> str:
+        return self.header.get("session_uuid", "")
+
+    @property
+    def exec_pipelines(self) -> List[str]:
+        return self.header.get("exec_pipelines", [])
+
+    @property
+    def status(self) -> str:
+        return self.header.get("status", "")
+
+
+def is_wire_format(buf) -> bool:
+    return len(buf) >= _PREFIX.size and bytes(buf[:3]) == NXS_WIRE_MAGIC
+
+
+def _aligned(size: int) -> int:
+    return (size + FRAME_ALIGNMENT - 1) // FRAME_ALIGNMENT * FRAME_ALIGNMENT
+
+
+def _pack(kind: NxsWireKind, header: Dict, frames: List) -> bytes:
+    header_bytes = json.dumps(header).encode("utf-8")
+    frames = [memoryview(f).cast("B") for f in frames]
+
+    prefix = _PREFIX.pack(
+        NXS_WIRE_MAGIC, NXS_WIRE_VERSION, int(kind), len(header_bytes), len(frames)
+    )
+    frame_lens = struct.pack(f"<{len(frames)}Q", *[f.nbytes for f in frames])
+
+    parts = [prefix, frame_lens, header_bytes]
+    pos = len(prefix) + len(frame_lens) + len(header_bytes)
+    for f in frames:
+        padding = _aligned(pos) - pos
+        if padding:
+            parts.append(bytes(padding))
+        parts.append(f)
+        pos += padding + f.nbytes
+
+    return b"".join(parts)
+
+
+def peek_header(buf) -> NxsWireHeader:
+    buf = memoryview(buf).cast("B")
+    if len(buf) < _PREFIX.size:
+        raise NxsWireExceptionInvalidFormat
+
+    magic, version, kind, header_len, num_frames = _PREFIX.unpack_from(buf, 0)
+    if magic != NXS_WIRE_MAGIC:
+        raise NxsWireExceptionInvalidFormat
+    if version != NXS_WIRE_VERSION:
+        raise NxsWireExceptionUnsupportedVersion(version)
+
+    pos = _PREFIX.size
+    frame_lens = struct.unpack_from(f"<{num_frames}Q", buf, pos)
+    pos += 8 * num_frames
+
+    header = json.loads(bytes(buf[pos : pos + header_len]))
+    pos += header_len
+
+    frame_offsets = []
+    for frame_len in frame_lens:
+        pos = _aligned(pos)
+        frame_offsets.append((pos, frame_len))
+        pos += frame_len
+
+    if pos > len(buf):
+        raise NxsWireExceptionInvalidFormat
+
+    return NxsWireHeader(NxsWireKind(kind), header, frame_offsets)
+
+
+def _add_frame(frames: List, data) -> Optional[int]:
+    if data is None:
+        return None
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    frames.append(data)
+    return len(frames) - 1
+
+
+def _get_frame(buf: memoryview, wire_header: NxsWireHeader, idx: Optional[int]):
+    if idx is None:
+        return None
+    offset, length = wire_header.frame_offsets[idx]
+    return buf[offset : offset + length]
+
+
+def _encode_inputs(inputs: List[NxsInferInput], frames: List) -> List[Dict]:
+    return [
+        {
+            "name": input.name,
+            "type": NxsInferInputType(input.type).value,
+            "frame": _add_frame(frames, input.data),
+            "dtype": input.dtype,
+            "shape": input.shape,
+        }
+        for input in inputs
+    ]
+
+
+def _decode_inputs(
+    buf: memoryview, wire_header: NxsWireHeader, inputs: List[Dict]
+) -> List[NxsInferInput]:
+    # construct() skips validation so the data stays a memoryview over buf
+    return [
+        NxsInferInput.construct(
+            name=input["name"],
+            type=NxsInferInputType(input["type"]),
+            data=_get_frame(buf, wire_header, input["frame"]),
+            dtype=input.get("dtype"),
+            shape=input.get("shape"),
+        )
+        for input in inputs
+    ]
+
+
+def encode_infer_request(request: NxsInferRequest) -> bytes:
+    frames = []
+    header = {
+        "task_uuid": request.task_uuid,
+        "session_uuid": request.session_uuid,
+        "exec_pipelines": request.exec_pipelines,
+        "status": NxsInferStatus(request.status).value,
+        "extra_preproc_params": request.extra_preproc_params,
+        "extra_transform_params": request.extra_transform_params,
+        "extra_postproc_params": request.extra_postproc_params,
+        "extra_params": _add_frame(frames, request.extra_params),
+        "carry_over_extras": _add_frame(frames, request.carry_over_extras),
+    }
+    header["inputs"] = _encode_inputs(request.inputs, frames)
+
+    return _pack(NxsWireKind.INFER_REQUEST, header, frames)
+
+
+def _decode_infer_request(buf: memoryview, wire_header: NxsWireHeader):
+    header = wire_header.header
+
+    def _small_frame(idx):
+        frame = _get_frame(buf, wire_header, idx)
+        return bytes(frame) if frame is not None else None
+
+    return NxsInferRequest.construct(
+        task_uuid=header["task_uuid"],
+        session_uuid=header["session_uuid"],
+        exec_pipelines=header["exec_pipelines"],
+        status=NxsInferStatus(header["status"]),
+        extra_preproc_params=header["extra_preproc_params"],
+        extra_transform_params=header["extra_transform_params"],
+        extra_postproc_params=header["extra_postproc_params"],
+        extra_params=_small_frame(header["extra_params"]),
+        carry_over_extras=_small_frame(header["carry_over_extras"]),
+        inputs=_decode_inputs(buf, wire_header, header["inputs"]),
+    )
+
+
+def encode_tensors_infer_request(request: NxsTensorsInferRequest) -> bytes:
+    frames = []
+    header = {
+        "pipeline_uuid": request.pipeline_uuid,
+        "session_uuid": request.session_uuid,
+        "extra_preproc_params": request.extra_preproc_params,
+        "extra_transform_params": request.extra_transform_params,
+        "extra_postproc_params": request.extra_postproc_params,
+        "infer_timeout": request.infer_timeout,
+    }
+    header["inputs"] = _encode_inputs(request.inputs, frames)
+
+    return _pack(NxsWireKind.TENSORS_INFER_REQUEST, header, frames)
+
+
+def _decode_tensors_infer_request(buf: memoryview, wire_header: NxsWireHeader):
+    header = wire_header.header
+
+    return NxsTensorsInferRequest.construct(
+        pipeline_uuid=header["pipeline_uuid"],
+        session_uuid=header["session_uuid"],
+        extra_preproc_params=header["extra_preproc_params"],
+        extra_transform_params=header["extra_transform_params"],
+        extra_postproc_params=header["extra_postproc_params"],
+        infer_timeout=header["infer_timeout"],
+        inputs=_decode_inputs(buf, wire_header, header["inputs"]),
+    )
+
+
+def encode_infer_result(result: NxsInferResult) -> bytes:
+    frames = []
+    header = json.loads(result.json(exclude={"metadata"}))
+    header["metadata"] = _add_frame(frames, getattr(result, "metadata", None))
+    header["with_metadata"] = isinstance(result, NxsInferResultWithMetadata)
+
+    return _pack(NxsWireKind.INFER_RESULT, header, frames)
+
+
+def _decode_infer_result(buf: memoryview, wire_header: NxsWireHeader):
+    header = dict(wire_header.header)
+    metadata_idx = header.pop("metadata", None)
+
+    if not header.pop("with_metadata", False):
+        return NxsInferResult(**header)
+
+    metadata = _get_frame(buf, wire_header, metadata_idx)
+    result = NxsInferResultWithMetadata(**header)
+    result.metadata = bytes(metadata) if metadata is not None else None
+    return result
+
+
+def encode(
+    data: Union[NxsInferRequest, NxsInferResult, NxsTensorsInferRequest]
+) -> bytes:
+    if isinstance(data, NxsInferRequest):
+        return encode_infer_request(data)
+    elif isinstance(data, NxsInferResult):
+        return encode_infer_result(data)
+    elif isinstance(data, NxsTensorsInferRequest):
+        return encode_tensors_infer_request(data)
+
+    raise NxsWireExceptionInvalidFormat
+
+
+def decode(buf) -> Union[NxsInferRequest, NxsInferResult, NxsTensorsInferRequest]:
+    buf = memoryview(buf).cast("B")
+    wire_header = peek_header(buf)
+
+    if wire_header.kind == NxsWireKind.INFER_REQUEST:
+        return _decode_infer_request(buf, wire_header)
+    elif wire_header.kind == NxsWireKind.INFER_RESULT:
+        return _decode_infer_result(buf, wire_header)
+    elif wire_header.kind == NxsWireKind.TENSORS_INFER_REQUEST:
+        return _decode_tensors_infer_request(buf, wire_header)
+
+    raise NxsWireExceptionInvalidFormat
@@ -0,0 +1,284 @@
+import os
+import queue
+import time
+from multiprocessing import Array, Queue
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# A fixed-size pool of slots carved out of one SharedMemory block. Producers copy a
+# dict of tensors into a free slot and only send a small NxsSharedMemorySlotDescriptor
+# through the mp queue, consumers map numpy views over the slot and release it once
+# done. Each slot records who is responsible for it:
+#
+#     0           free (or being handed back to the free list)
+#     pid > 0     held by that process (producer filling it / consumer reading it)
+#     IN_FLIGHT   descriptor sent, not yet picked up by any consumer
+#
+# so slots held by a process that died can be put back on the free list, and
+# in-flight slots are put back once every registered consumer is gone.
+
+SLOT_FREE = 0
+SLOT_IN_FLIGHT = -1
+
+TENSOR_ALIGNMENT = 64
+MAX_NUM_CONSUMERS = 32
+
+
+class NxsSharedMemoryArenaExceptionInvalidSlot(Exception):
+    pass
+
+
+def _aligned(size: int) -> int:
+    return (size + TENSOR_ALIGNMENT - 1) // TENSOR_ALIGNMENT * TENSOR_ALIGNMENT
+
+
+def _is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    # crashed children stay around as zombies until the parent reaps them
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+        return stat[stat.rfind(")") + 2] != "Z"
+    except:
+        return True
+
+
+class NxsSharedMemorySlotDescriptor:
+    def __init__(
+        self,
+        slot: int,
+        tensors: Dict[str, Tuple[int, str, Tuple]],
+        inline_data: Dict,
+    ) -> None:
+        self.slot = slot
+        self.tensors = tensors  # name -> (offset in slot, dtype str, shape)
+        self.inline_data = inline_data  # values that could not be placed in the slot
+
+
+class NxsSharedMemoryBatch(dict):
+    # dict of tensor views over an arena slot, the slot is recycled by release()
+    def __init__(self, arena: "NxsSharedMemoryArena", slot: int, data: Dict) -> None:
+        super().__init__(data)
+        self._arena = arena
+        self._slot = slot
+
+    def release(self):
+        if self._slot is not None:
+            self._arena.release(self._slot)
+            self._slot = None
+
+
+def release_if_shared(data):
+    if isinstance(data, NxsSharedMemoryBatch):
+        data.release()
+
+
+class NxsSharedMemoryArena:
+    def __init__(
+        self, num_slots: int, slot_size: int, acquire_timeout_secs: float = 1.0
+    ) -> None:
+        assert num_slots > 0, "num_slots should be larger than 0 !!!"
+
+        self.num_slots = num_slots
+        self.slot_size = _aligned(slot_size)
+        self.acquire_timeout_secs = acquire_timeout_secs
+        self.reclaim_period_secs = 0.1
+
+        self.shm = SharedMemory(create=True, size=self.num_slots * self.slot_size)
+        self.free_slots = Queue()
+        for slot in range(self.num_slots):
+            self.free_slots.put(slot)
+        self.slot_owners = Array("i", [SLOT_FREE] * self.num_slots)
+        self.consumer_pids = Array("i", [0] * MAX_NUM_CONSUMERS)
+
+        self._creator_pid = os.getpid()
+
+    @property
+    def buf(self) -> memoryview:
+        return self.shm.buf
+
+    def register_consumer(self):
+        pid = os.getpid()
+        with self.consumer_pids.get_lock():
+            for idx in range(MAX_NUM_CONSUMERS):
+                if self.consumer_pids[idx] in [0, pid]:
+                    self.consumer_pids[idx] = pid
+                    return
+
+    def acquire(self) -> Optional[int]:
+        # blocks while all slots are in use, returns None if none frees up in time
+        t0 = time.time()
+        while True:
+            try:
+                slot = self.free_slots.get(block=True, timeout=self.reclaim_period_secs)
+                self.slot_owners[slot] = os.getpid()
+                return slot
+            except queue.Empty:
+                pass
+
+            self.reclaim()
+
+            if time.time() - t0 > self.acquire_timeout_secs:
+                return None
+
+    def release(self, slot: int):
+        if slot < 0 or slot >= self.num_slots:
+            raise NxsSharedMemoryArenaExceptionInvalidSlot(slot)
+
+        with self.slot_owners.get_lock():
+            if self.slot_owners[slot] == SLOT_FREE:
+                return
+            self.slot_owners[slot] = SLOT_FREE
+        self.free_slots.put(slot)
+
+    def reclaim(self) -> int:
+        consumers = [pid for pid in self.consumer_pids if pid > 0]
+        no_consumer_alive = consumers and not any(
+            _is_process_alive(pid) for pid in consumers
+        )
+
+        reclaimed_slots = []
+        with self.slot_owners.get_lock():
+            for slot in range(self.num_slots):
+                owner = self.slot_owners[slot]
+                if owner == SLOT_FREE:
+                    continue
+                if owner == SLOT_IN_FLIGHT:
+                    if not no_consumer_alive:
+                        continue
+                elif _is_process_alive(owner):
+                    continue
+
+                self.slot_owners[slot] = SLOT_FREE
+                reclaimed_slots.append(slot)
+
+        for slot in reclaimed_slots:
+            self.free_slots.put(slot)
+
+        return len(reclaimed_slots)
+
+    def _get_tensor_specs(self, data: Dict) -> Tuple[Dict, Dict]:
+        # splits data into tensors that can live in a slot (name -> (dtype, shape)) and
+        # everything else, which travels inline with the descriptor
+        specs = {}
+        inline_data = {}
+
+        for name, value in data.items():
+            if isinstance(value, list) and value and isinstance(value[0], np.ndarray):
+                first = value[0]
+                if all(
+                    isinstance(v, np.ndarray)
+                    and v.shape == first.shape
+                    and v.dtype == first.dtype
+                    for v in value
+                ):
+                    shape = (len(value),) + first.shape
+                    dtype = first.dtype
+                else:
+                    inline_data[name] = value
+                    continue
+            elif isinstance(value, np.ndarray):
+                shape = value.shape
+                dtype = value.dtype
+            else:
+                inline_data[name] = value
+                continue
+
+            if dtype.hasobject:
+                inline_data[name] = value
+                continue
+
+            specs[name] = (dtype.str, shape)
+
+        return specs, inline_data
+
+    def _map_views(self, slot: int, layout: Dict) -> Dict[str, np.ndarray]:
+        base = slot * self.slot_size
+        views = {}
+        for name, (offset, dtype, shape) in layout.items():
+            views[name] = np.ndarray(
+                shape, dtype=np.dtype(dtype), buffer=self.buf, offset=base + offset
+            )
+        return views
+
+    def allocate(self, specs: Dict[str, Tuple[str, Tuple]]) -> Optional[Tuple]:
+        # reserves a slot for tensors given as name -> (dtype, shape), returns
+        # (slot, layout, views) so callers can fill the views in place, or None if
+        # they do not fit into a slot or no slot is available
+        layout = {}
+        pos = 0
+        for name, (dtype, shape) in specs.items():
+            layout[name] = (pos, dtype, tuple(shape))
+            pos = _aligned(pos + int(np.prod(shape)) * np.dtype(dtype).itemsize)
+
+        if not layout or pos > self.slot_size:
+            return None
+
+        slot = self.acquire()
+        if slot is None:
+            return None
+
+        return slot, layout, self._map_views(slot, layout)
+
+    def send(
+        self, slot: int, layout: Dict, inline_data: Dict = {}
+    ) -> NxsSharedMemorySlotDescriptor:
+        # hands an allocated and filled slot over to the consumers
+        self.slot_owners[slot] = SLOT_IN_FLIGHT
+        return NxsSharedMemorySlotDescriptor(slot, layout, inline_data)
+
+    def write(self, data: Dict) -> Optional[NxsSharedMemorySlotDescriptor]:
+        # returns None if data does not fit into a slot or no slot is available
+        specs, inline_data = self._get_tensor_specs(data)
+
+        allocation = self.allocate(specs)
+        if allocation is None:
+            return None
+        slot, layout, views = allocation
+
+        for name, dst in views.items():
+            value = data[name]
+            if isinstance(value, list):
+                for idx, v in enumerate(value):
+                    dst[idx] = v
+            else:
+                dst[...] = value
+
+        return self.send(slot, layout, inline_data)
+
+    def read(self, desc: NxsSharedMemorySlotDescriptor) -> NxsSharedMemoryBatch:
+        self.slot_owners[desc.slot] = os.getpid()
+
+        data = dict(desc.inline_data)
+        data.update(self._map_views(desc.slot, desc.tensors))
+
+        return NxsSharedMemoryBatch(self, desc.slot, data)
+
+    def close(self):
+        try:
+            self.shm.close()
+        except:
+            pass
+
+    def unlink(self):
+        self.close()
+        if os.getpid() == self._creator_pid:
+            try:
+                self.shm.unlink()
+            except:
+                pass
+
+
+def get_tensor_nbytes(shape: List[int], dtype: str) -> int:
+    # returns -1 if any non-batch dimension is dynamic
+    if any(dim <= 0 for dim in shape[1:]):
+        return -1
+    return int(np.prod(shape[1:])) * np.dtype(dtype).itemsize
@@ -24,6 +24,9 @@ class NxsAzureBlobStorage(NxsStorage):
         self._blob_service_client = blob_service_client
         self._container_name = container_name
 
+        # number of ranged requests download_to_file runs in parallel per blob
+        self._max_download_concurrency = 8
+
     def upload(self, source_file_path, dest_dir_path, overwrite=True):
         if not os.path.exists(source_file_path):
             raise NxsStorageExceptionNonExistingFile
@@ -66,10 +69,12 @@ class NxsAzureBlobStorage(NxsStorage):
     def download_to_file(self, path, dst_path):
         try:
             blob_client = self._get_blob_client(path)
-            stream = blob_client.download_blob()
+            # chunks are fetched with parallel ranged gets and written as they arrive
+            stream = blob_client.download_blob(
+                max_concurrency=self._max_download_concurrency
+            )
             with open(dst_path, "wb") as f:
-                for chunk in stream.chunks():
-                    f.write(chunk)
+                stream.readinto(f)
         except AzureCoreException.ResourceNotFoundError:
             raise NxsStorageExceptionNonExistingFile("File not found in blobstore.")
         except AzureCoreException.HttpResponseError as e:
@@ -117,6 +122,10 @@ class NxsAzureBlobStorage(NxsStorage):
     def close(self):
         pass
 
+    def update_max_download_concurrency(self, max_concurrency: int):
+        assert max_concurrency >= 1, "max_concurrency should be at least 1!!!"
+        self._max_download_concurrency = max_concurrency
+
     def _get_blob_client(self, blob_path: str):
         return self._blob_service_client.get_blob_client(
             container=self._container_name, blob=blob_path
@@ -33,7 +33,7 @@ class NxsLocalStorage(NxsStorage):
         return data
 
     def download_to_file(self, path, dst_path):
-        shutil.copy(path, dst_path)
+        shutil.copy(os.path.join(self.local_store_dir_path, path), dst_path)
 
     def delete(self, path):
         real_dest_dir_path = os.path.join(self.local_store_dir_path, path)
@@ -1,10 +1,21 @@
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from enum import Enum
+import fcntl
+import hashlib
+import json
 import os
+import threading
+import time
 from typing import Dict
 from collections import OrderedDict
 from nxs_libs.storage import NxsStorage
-from nxs_utils.common import generate_uuid, delete_and_create_dir
+from nxs_utils.common import (
+    generate_uuid,
+    delete_and_create_dir,
+    delete_dir,
+    link_or_copy_file,
+)
 
 
 class NxsBaseStorageCache(ABC):
@@ -16,6 +27,20 @@ class NxsBaseStorageCache(ABC):
     def get_model_path(self, model_uuid: str) -> str:
         raise NotImplementedError
 
+    def copy_artifact(self, path_in_store: str, dst_path: str):
+        # places a file from the store (e.g., preprocessing fns) at dst_path
+        data = self.model_store.download(path_in_store)
+        with open(dst_path, "wb") as f:
+            f.write(data)
+
+    def acquire_model_dir(self, model_uuid: str, dir_path: str) -> bool:
+        # moves a previously unpacked copy of the model to dir_path if there is one
+        return False
+
+    def release_model_dir(self, model_uuid: str, dir_path: str):
+        # called once the model deployed from dir_path is stopped
+        delete_dir(dir_path)
+
 
 class NxsLocalStorageCache(NxsBaseStorageCache):
     def __init__(self, model_store: NxsStorage, max_cache_size: int = 50) -> None:
@@ -43,10 +68,7 @@ class NxsLocalStorageCache(NxsBaseStorageCache):
 
         # FIXME: how to determine model_path_in_store
         model_path_in_store = f"models/{model_uuid}"
-        data = self.model_store.download(model_path_in_store)
-
-        with open(model_path, "wb") as f:
-            f.write(data)
+        self.model_store.download_to_file(model_path_in_store, model_path)
 
         self.model_cache[model_uuid] = model_path
         self.model_cache.move_to_end(model_uuid)
@@ -59,3 +81,205 @@ class NxsLocalStorageCache(NxsBaseStorageCache):
                 os.remove(least_used_model_path)
 
         return model_path
+
+
+# Artifact cache that survives backend restarts and is shared by backends of a node:
+#
+#     <cache_dir>/blobs/<sha256>        artifacts, stored once per content
+#     <cache_dir>/index.json            path in store -> sha256, size, last use
+#     <cache_dir>/warm/<model_uuid>/    unpacked model dirs of stopped models
+#
+# Blobs are evicted least recently used first once they take more than
+# max_cache_size_bytes and are re-hashed the first time a process uses them. Model
+# dirs get hardlinks to the blobs, so evicting a blob never breaks a running model.
+# A blob is never evicted while it is still linked from a model dir, nor within
+# pin_secs of being handed out, since the caller may not have linked or unpacked it
+# yet; the cache can exceed its cap until those blobs are unpinned.
+# Stopped models are moved to the warm pool (at most max_num_warm_models of them) and
+# moved back on redeploy instead of being unpacked again.
+class NxsPersistentStorageCache(NxsBaseStorageCache):
+    def __init__(
+        self,
+        model_store: NxsStorage,
+        cache_dir: str = "./tmp/model_cache",
+        max_cache_size_bytes: int = 20 * 1024 * 1024 * 1024,
+        max_num_warm_models: int = 8,
+        pin_secs: float = 600,
+    ) -> None:
+        super().__init__(model_store)
+        self.cache_dir = cache_dir
+        self.max_cache_size_bytes = max_cache_size_bytes
+        self.max_num_warm_models = max_num_warm_models
+        self.pin_secs = pin_secs
+
+        self.blobs_dir = os.path.join(cache_dir, "blobs")
+        self.warm_dir = os.path.join(cache_dir, "warm")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock_path = os.path.join(cache_dir, "index.lock")
+        for dir_path in [self.blobs_dir, self.warm_dir]:
+            os.makedirs(dir_path, exist_ok=True)
+
+        # blobs whose checksum was checked by this process
+        self.verified_blobs = set()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def _locked_index(self):
+        with self.lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                index = self._load_index()
+                yield index
+                self._save_index(index)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_index(self) -> Dict:
+        index = {}
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+        except:
+            pass
+        index.setdefault("artifacts", {})
+        index.setdefault("warm", {})
+        return index
+
+    def _save_index(self, index: Dict):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _get_blob_path(self, sha256: str) -> str:
+        return os.path.join(self.blobs_dir, sha256)
+
+    def _compute_sha256(self, file_path: str) -> str:
+        h = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(4 * 1024 * 1024), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _is_valid_blob(self, entry: Dict) -> bool:
+        blob_path = self._get_blob_path(entry["sha256"])
+        if not os.path.exists(blob_path):
+            return False
+        if os.path.getsize(blob_path) != entry["size"]:
+            return False
+        if entry["sha256"] not in self.verified_blobs:
+            if self._compute_sha256(blob_path) != entry["sha256"]:
+                return False
+            self.verified_blobs.add(entry["sha256"])
+        return True
+
+    def _evict_blobs(self, index: Dict, keep_sha256: str):
+        artifacts: Dict = index["artifacts"]
+
+        # sha256 -> (size, last use of any path pointing to it)
+        blobs = {}
+        for entry in artifacts.values():
+            _, last_used = blobs.get(entry["sha256"], (0, 0))
+            blobs[entry["sha256"]] = (entry["size"], max(last_used, entry["last_used"]))
+        total_size = sum(size for size, _ in blobs.values())
+
+        now = time.time()
+        for sha256 in sorted(blobs.keys(), key=lambda k: blobs[k][1]):
+            if total_size <= self.max_cache_size_bytes:
+                break
+
+            size, last_used = blobs[sha256]
+            if sha256 == keep_sha256 or now - last_used < self.pin_secs:
+                continue
+
+            blob_path = self._get_blob_path(sha256)
+            try:
+                if os.stat(blob_path).st_nlink > 1:
+                    # still linked from a model dir, removing it would free nothing
+                    continue
+                os.remove(blob_path)
+            except OSError:
+                pass
+
+            for path in [p for p, e in artifacts.items() if e["sha256"] == sha256]:
+                artifacts.pop(path)
+            self.verified_blobs.discard(sha256)
+            total_size -= size
+
+    def get_artifact_path(self, path_in_store: str) -> str:
+        with self._locked_index() as index:
+            entry = index["artifacts"].get(path_in_store)
+
+        if entry is not None and self._is_valid_blob(entry):
+            with self._locked_index() as index:
+                if path_in_store in index["artifacts"]:
+                    index["artifacts"][path_in_store]["last_used"] = time.time()
+            return self._get_blob_path(entry["sha256"])
+
+        # stream to disk outside of the lock, other artifacts can be served meanwhile
+        tmp_path = os.path.join(self.blobs_dir, f"{generate_uuid()}.tmp")
+        try:
+            self.model_store.download_to_file(path_in_store, tmp_path)
+            sha256 = self._compute_sha256(tmp_path)
+            size = os.path.getsize(tmp_path)
+            blob_path = self._get_blob_path(sha256)
+            os.replace(tmp_path, blob_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.verified_blobs.add(sha256)
+
+        with self._locked_index() as index:
+            index["artifacts"][path_in_store] = {
+                "sha256": sha256,
+                "size": size,
+                "last_used": time.time(),
+            }
+            self._evict_blobs(index, keep_sha256=sha256)
+
+        return blob_path
+
+    def get_model_path(self, model_uuid: str) -> str:
+        return self.get_artifact_path(f"models/{model_uuid}")
+
+    def copy_artifact(self, path_in_store: str, dst_path: str):
+        link_or_copy_file(self.get_artifact_path(path_in_store), dst_path)
+
+    def acquire_model_dir(self, model_uuid: str, dir_path: str) -> bool:
+        warm_path = os.path.join(self.warm_dir, model_uuid)
+
+        with self._locked_index() as index:
+            index["warm"].pop(model_uuid, None)
+            if not os.path.isdir(warm_path):
+                return False
+
+            delete_dir(dir_path)
+            try:
+                os.rename(warm_path, dir_path)
+            except OSError:
+                delete_dir(warm_path)
+                return False
+
+        return True
+
+    def release_model_dir(self, model_uuid: str, dir_path: str):
+        if not os.path.isdir(dir_path):
+            return
+
+        warm_path = os.path.join(self.warm_dir, model_uuid)
+
+        with self._locked_index() as index:
+            delete_dir(warm_path)
+            try:
+                os.rename(dir_path, warm_path)
+            except OSError:
+                # warm pool is on another filesystem, moving would be a full copy
+                delete_dir(dir_path)
+                return
+            index["warm"][model_uuid] = time.time()
+
+            warm_models = sorted(index["warm"].keys(), key=lambda k: index["warm"][k])
+            num_to_evict = len(warm_models) - self.max_num_warm_models
+            for warm_model_uuid in warm_models[: max(0, num_to_evict)]:
+                index["warm"].pop(warm_model_uuid)
+                delete_dir(os.path.join(self.warm_dir, warm_model_uuid))
@@ -2,6 +2,7 @@ from enum import Enum
 from typing import Dict, List, Optional
 
 import numpy as np
+from pydantic import validator
 
 from nxs_types import DataModel
 
@@ -72,7 +73,16 @@ class NxsInferSingleInputFromAzureBlobstore(NxsInferInputBase):
 class NxsInferInput(DataModel):
     name: str
     type: NxsInferInputType
-    data: bytes  # tensor should be pickled
+    data: bytes  # raw buffer for NUMPY_TENSOR, pickled bytes for PICKLED_DATA
+    dtype: Optional[str] = None  # numpy dtype string, NUMPY_TENSOR only
+    shape: Optional[List[int]] = None  # NUMPY_TENSOR only
+
+    @validator("data", pre=True)
+    def _copy_memoryview(cls, v):
+        # decoded wire messages hold memoryviews, validating makes a standalone copy
+        if isinstance(v, memoryview):
+            return v.tobytes()
+        return v
 
 
 class NxsInferRequestMetadata(DataModel):
@@ -18,6 +18,7 @@ class NxsBackendCmodelThroughputLog(DataModel):
     latency_mean: float = 0
     latency_min: float = 0
     latency_max: float = 0
+    sla_miss_rate: float = 0
     extra: Dict[str, str] = {}
 
 
@@ -28,6 +28,8 @@ class NxsMsgType(int, Enum):
     REPORT_BACKEND_STATS = 11
     PIN_WORKLOADS = 12
     UNPIN_WORKLOADS = 13
+    APPLY_PLAN_DELTA = 14
+    ACK_PLAN_DELTA = 15
 
 
 class NxsMsgReportInputWorkloads(DataModel):
@@ -84,6 +86,20 @@ class NxsMsgUnschedulePlans(DataModel):
     plan: NxsUnschedulingPerBackendPlan
 
 
+class NxsMsgApplyPlanDelta(DataModel):
+    # changes since the previous version sent to the backend, unscheduling first
+    type: NxsMsgType = NxsMsgType.APPLY_PLAN_DELTA
+    version: int
+    scheduling: NxsSchedulingPerBackendPlan
+    unscheduling: NxsUnschedulingPerBackendPlan
+
+
+class NxsMsgAckPlanDelta(DataModel):
+    type: NxsMsgType = NxsMsgType.ACK_PLAN_DELTA
+    backend_name: str
+    version: int
+
+
 class NxsMsgBackendStatsReport(DataModel):
     type: NxsMsgType = NxsMsgType.REPORT_BACKEND_STATS
     backend_name: str
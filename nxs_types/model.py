@@ -47,6 +47,13 @@ class W4ModelType(str, Enum):
     DETECTOR = "detector"
 
 
+class OnnxOptimizationLevel(str, Enum):
+    DISABLE_ALL = "disable_all"
+    ENABLE_BASIC = "enable_basic"
+    ENABLE_EXTENDED = "enable_extended"
+    ENABLE_ALL = "enable_all"
+
+
 class ModelStatus(str, Enum):
     VALID = "valid"
     INVALID = "invalid"
@@ -101,6 +108,18 @@ class ModelOutput(DataModel):
     dtype: Optional[TensorType] = TensorType.FLOAT32
 
 
+class OnnxSessionOptions(DataModel):
+    intra_op_num_threads: int = 0  # 0 lets onnxruntime decide
+    inter_op_num_threads: int = 0
+    graph_optimization_level: OnnxOptimizationLevel = OnnxOptimizationLevel.ENABLE_ALL
+    cache_optimized_model: bool = False  # keep the optimized graph on local disk
+    enable_cpu_mem_arena: bool = True
+    enable_mem_pattern: bool = True
+    arena_extend_strategy: str = "kNextPowerOfTwo"  # or "kSameAsRequested"
+    gpu_mem_limit_mb: int = 0  # 0 means no limit
+    use_io_binding: bool = True
+
+
 class ModelDescription(DataModel):
     inputs: List[ModelInput]
     outputs: List[ModelOutput]
@@ -126,6 +145,7 @@ class NxsBaseModel(DataModel):
     cross_requests_batching: bool = True
     is_public: bool = False
     is_custom_model: bool = False
+    onnx_session_options: Optional[OnnxSessionOptions] = None
 
 
 class NxsModel(NxsBaseModel):
@@ -138,6 +158,7 @@ class NxsModel(NxsBaseModel):
     num_request_pullers: Optional[int] = 1
     num_preprocessors: Optional[int] = 1
     num_postprocessors: Optional[int] = 1
+    num_compute_instances: Optional[int] = 1
 
 
 class NxsModelRegistrationRequest(NxsBaseModel):
@@ -149,6 +170,7 @@ class NxsModelRegistrationRequest(NxsBaseModel):
     num_request_pullers: Optional[int] = 1
     num_preprocessors: Optional[int] = 1
     num_postprocessors: Optional[int] = 1
+    num_compute_instances: Optional[int] = 1
 
 
 class NxsColocatedModels(DataModel):
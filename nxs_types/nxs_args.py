@@ -45,6 +45,7 @@ class NxsApiArgs(NxsBaseArgs):
     enable_v1_api: bool = False
     enable_scaling: bool = False
     wait_for_models: bool = True
+    enable_async_redis_queue: bool = False
 
 
 class NxsSchedulerArgs(NxsBaseArgs):
@@ -52,13 +53,25 @@ class NxsSchedulerArgs(NxsBaseArgs):
     model_timeout_secs: float = 180
     backend_timeout_secs: float = 30
     epoch_scheduling_interval_secs: float = 10
+    plan_ack_timeout_secs: float = 30
     enable_multi_models: bool = True
     enable_instant_scheduling: bool = True
+    scheduling_policy: str = "simple"
 
 
 class NxsBackendArgs(NxsBaseArgs):
     backend_name: str
     force_cpu: bool = False
+    model_cache_dir: str = "./tmp/model_cache"
+    model_cache_size_gb: float = 20
+    num_warm_models: int = 8
+    process_start_method: str = "forkserver"
+    forkserver_preload: str = "numpy,cv2,onnxruntime"
+    enable_self_profiling: bool = True
+    enable_gpu_time_slicing: bool = True
+    gpu_time_slice_period_ms: float = 100
+    in_flight_budget_ms: float = 1000
+    enable_local_short_circuit: bool = True
 
 
 class NxsBackendMonitorArgs(NxsBaseArgs):
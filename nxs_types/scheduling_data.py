@@ -22,6 +22,8 @@ class NxsSchedulingPerComponentModelPlan(DataModel):
     model_uuid: str
     batch_size: int
     extra_info: str = "{}"
+    enable_batcher: bool = False  # run a dedicated batcher stage before compute
+    batcher_max_wait_ms: float = 0  # 0 means half of max batch size latency
 
 
 class NxsSchedulingPerCompositorymodelPlan(DataModel):
@@ -26,3 +26,12 @@ def delete_file(file_path):
     if os.path.exists(file_path):
         os.remove(file_path)
         
+
+def link_or_copy_file(src_path, dst_path):
+    # hardlinks share the data and page cache with src, copy across filesystems
+    if os.path.lexists(dst_path):
+        os.remove(dst_path)
+    try:
+        os.link(src_path, dst_path)
+    except OSError:
+        shutil.copy(src_path, dst_path)
@@ -58,6 +58,41 @@ def init_redis_client(address: str, port: int, password: str, is_using_ssl=False
     return None
 
 
+def import_async_redis():
+    # redis-py >= 4.2 ships the asyncio client, older installs need aioredis 2.x
+    # (same api)
+    try:
+        import redis.asyncio as aioredis
+    except ImportError:
+        import aioredis
+
+    return aioredis
+
+
+def init_async_redis_client(
+    address: str, port: int, password: str, is_using_ssl=False, max_connections=64
+):
+    # cluster mode is not supported on the async path
+    aioredis = import_async_redis()
+
+    connection_kwargs = {}
+    if is_using_ssl:
+        connection_kwargs["connection_class"] = aioredis.SSLConnection
+        connection_kwargs["ssl_cert_reqs"] = "none"
+
+    pool = aioredis.BlockingConnectionPool(
+        host=f"{address}",
+        port=port,
+        password=password,
+        socket_timeout=10,
+        socket_connect_timeout=10,
+        max_connections=max_connections,
+        **connection_kwargs,
+    )
+
+    return aioredis.Redis(connection_pool=pool)
+
+
 def create_db_from_args(args: NxsBaseArgs, type: NxsDbType) -> NxsDb:
     if type == NxsDbType.MONGODB:
         return NxsDbFactory.create_db(
@@ -108,9 +143,9 @@ def create_simple_key_value_db_from_args(
 def create_queue_pusher_from_args(
     args: NxsBaseArgs, type: NxsQueueType
 ) -> NxsQueuePusher:
-    if type == NxsQueueType.REDIS:
+    if type in [NxsQueueType.REDIS, NxsQueueType.REDIS_ASYNC]:
         return NxsQueuePusherFactory.create_queue_pusher(
-            NxsQueueType.REDIS,
+            type,
             address=args.job_redis_queue_address,
             port=args.job_redis_queue_port,
             password=args.job_redis_queue_password,
@@ -128,9 +163,9 @@ def create_queue_pusher_from_args(
 def create_queue_puller_from_args(
     args: NxsBaseArgs, type: NxsQueueType, topic
 ) -> NxsQueuePuller:
-    if type == NxsQueueType.REDIS:
+    if type in [NxsQueueType.REDIS, NxsQueueType.REDIS_ASYNC]:
         return NxsQueuePullerFactory.create_queue_puller(
-            NxsQueueType.REDIS,
+            type,
             address=args.job_redis_queue_address,
             port=args.job_redis_queue_port,
             password=args.job_redis_queue_password,
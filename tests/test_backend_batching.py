@@ -0,0 +1,74 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from main_processes.backend.batching import BackendDeadlineBatcher
+from nxs_types.model import LatencyMeasurement, ProfileUnit
+
+
+def _create_profile_unit(batch_size: int, latency_ms: float) -> ProfileUnit:
+    return ProfileUnit(
+        batch_size=batch_size,
+        fps=batch_size * 1000 / latency_ms,
+        latency_e2e=LatencyMeasurement(
+            mean=latency_ms, std=0, min=latency_ms, max=latency_ms
+        ),
+        gpu_mem_usage=0,
+    )
+
+
+def _create_batcher(max_wait_secs: float = 0) -> BackendDeadlineBatcher:
+    # sparse profile, only batch sizes 1 and 8 were measured
+    component_model = SimpleNamespace(
+        model_uuid="model",
+        profile=[_create_profile_unit(1, 5), _create_profile_unit(8, 20)],
+    )
+    component_model_plan = SimpleNamespace(batch_size=8)
+    return BackendDeadlineBatcher(
+        component_model, component_model_plan, ["input"], max_wait_secs=max_wait_secs
+    )
+
+
+def _add_best_effort_samples(batcher: BackendDeadlineBatcher, num_samples: int):
+    batch = {"input": np.zeros((num_samples, 3), dtype=np.float32)}
+    batch_metadata = [{"extra": {"model": {}}} for _ in range(num_samples)]
+    batcher.add(batch, batch_metadata)
+
+
+def test_flush_runs_backlog_as_one_batch():
+    batcher = _create_batcher()
+    _add_best_effort_samples(batcher, 7)
+
+    batches = batcher.pop_ready_batches(flush_all=True)
+
+    assert [len(samples) for samples in batches] == [7]
+    assert batcher.get_num_pending() == 0
+    for sample in batches[0]:
+        assert sample.metadata["extra"]["model"]["batch_size"] == 7
+
+
+def test_expired_wait_runs_backlog_as_one_batch():
+    batcher = _create_batcher(max_wait_secs=0.001)
+    _add_best_effort_samples(batcher, 7)
+    time.sleep(0.01)
+
+    batches = batcher.pop_ready_batches()
+
+    assert [len(samples) for samples in batches] == [7]
+
+
+def test_full_batches_are_capped_at_planned_batch_size():
+    batcher = _create_batcher()
+    _add_best_effort_samples(batcher, 11)
+
+    batches = batcher.pop_ready_batches(flush_all=True)
+
+    assert [len(samples) for samples in batches] == [8, 3]
+
+
+def test_latency_uses_next_profiled_batch_size():
+    batcher = _create_batcher()
+
+    assert batcher._get_latency(7) == 0.02
+    assert batcher._get_latency(1) == 0.005
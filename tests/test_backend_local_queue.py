@@ -0,0 +1,106 @@
+import time
+from multiprocessing import Manager
+
+import numpy as np
+
+from nxs_libs.interface.backend.input import BackendInputFromLocalQueue
+from nxs_libs.interface.backend.output import BackendOutputToLocalFirst
+from nxs_types.infer import NxsInferInput, NxsInferInputType, NxsInferRequest
+
+
+def _create_tensor_request(session_uuid: str, value: np.ndarray) -> NxsInferRequest:
+    # same as BackendOutputProcess._create_infer_input, memoryviews are not picklable
+    return NxsInferRequest(
+        task_uuid="task",
+        session_uuid=session_uuid,
+        inputs=[
+            NxsInferInput.construct(
+                name="input",
+                type=NxsInferInputType.NUMPY_TENSOR,
+                data=memoryview(value).cast("B"),
+                dtype=value.dtype.str,
+                shape=list(value.shape),
+            )
+        ],
+    )
+
+
+def _get_batch(input: BackendInputFromLocalQueue, num_items: int, timeout_secs=5):
+    batch = []
+    t0 = time.time()
+    while len(batch) < num_items and time.time() - t0 < timeout_secs:
+        batch.extend(input.get_batch())
+        time.sleep(0.01)
+    return batch
+
+
+class _RedisOutputRecorder:
+    def __init__(self) -> None:
+        self.items = []
+
+    def put_batch(self, topic, batch, external_data={}):
+        self.items.extend((topic, item) for item in batch)
+
+
+def test_tensor_request_round_trip():
+    with Manager() as manager:
+        local_queue = manager.Queue(maxsize=2)
+        local_input_queues = manager.dict({"cmodel": local_queue})
+        local_session_topics = manager.dict({"cmodel_session": "cmodel"})
+
+        output = BackendOutputToLocalFirst(
+            local_session_topics,
+            local_input_queues,
+            address="localhost",
+            port=6379,
+            password=None,
+            is_using_ssl=False,
+        )
+        output.redis_output = _RedisOutputRecorder()
+        input = BackendInputFromLocalQueue(local_queue)
+
+        values = [np.random.rand(2, 3).astype(np.float32) for _ in range(3)]
+        output.put_batch(
+            "cmodel_session",
+            [_create_tensor_request("session", value) for value in values],
+        )
+
+        batch = _get_batch(input, len(values))
+        input.close_and_get_remains()
+
+        assert not output.redis_output.items
+        assert len(batch) == len(values)
+        for request, value in zip(batch, values):
+            assert isinstance(request, NxsInferRequest)
+            assert request.session_uuid == "session"
+            tensor = request.inputs[0]
+            assert tensor.type == NxsInferInputType.NUMPY_TENSOR
+            data = np.frombuffer(tensor.data, dtype=tensor.dtype).reshape(tensor.shape)
+            assert np.array_equal(data, value)
+
+
+def test_full_local_queue_falls_back_to_redis():
+    with Manager() as manager:
+        local_queue = manager.Queue(maxsize=1)
+        local_input_queues = manager.dict({"cmodel": local_queue})
+        local_session_topics = manager.dict({"cmodel_session": "cmodel"})
+
+        output = BackendOutputToLocalFirst(
+            local_session_topics,
+            local_input_queues,
+            address="localhost",
+            port=6379,
+            password=None,
+            is_using_ssl=False,
+        )
+        output.redis_output = _RedisOutputRecorder()
+
+        value = np.arange(4, dtype=np.int64)
+        output.put_batch("cmodel_session", [_create_tensor_request("session", value)])
+        output.put_batch("cmodel_session", [_create_tensor_request("session", value)])
+
+        assert local_queue.qsize() == 1
+        assert len(output.redis_output.items) == 1
+        topic, request = output.redis_output.items[0]
+        assert topic == "cmodel_session"
+        assert isinstance(request, NxsInferRequest)
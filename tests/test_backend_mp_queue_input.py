@@ -0,0 +1,32 @@
+import queue
+import time
+from multiprocessing import Pipe
+
+from nxs_libs.interface.backend.input import BackendInputFromMultiprocessingQueue
+
+
+class _StuckQueue:
+    # qsize() still counts items a killed producer never flushed into the pipe
+    def __init__(self, items) -> None:
+        self.items = list(items)
+        self._reader, self._writer = Pipe(duplex=False)
+
+    def get_nowait(self):
+        if not self.items:
+            raise queue.Empty
+        return self.items.pop(0)
+
+    def qsize(self) -> int:
+        return len(self.items) + 1
+
+
+def test_close_and_get_remains_gives_up_on_stuck_queue():
+    input = BackendInputFromMultiprocessingQueue(
+        _StuckQueue(["a", "b"]), max_drain_secs=0.2
+    )
+
+    t0 = time.time()
+    remains = input.close_and_get_remains()
+
+    assert remains == ["a", "b"]
+    assert time.time() - t0 < 2
@@ -0,0 +1,45 @@
+import os
+from types import SimpleNamespace
+
+from nxs_libs.storage_cache import NxsPersistentStorageCache
+
+
+def _create_cache(tmp_path, max_cache_size_bytes: int) -> NxsPersistentStorageCache:
+    def download_to_file(path, dst_path):
+        with open(dst_path, "wb") as f:
+            f.write(path.encode().ljust(10, b"\0"))
+
+    model_store = SimpleNamespace(download_to_file=download_to_file)
+    return NxsPersistentStorageCache(
+        model_store,
+        cache_dir=str(tmp_path / "cache"),
+        max_cache_size_bytes=max_cache_size_bytes,
+        pin_secs=0,
+    )
+
+
+def test_never_evicts_inserted_blob(tmp_path):
+    cache = _create_cache(tmp_path, max_cache_size_bytes=5)
+    blob_path = cache.get_model_path("a")
+    assert os.path.exists(blob_path)
+
+
+def test_evicts_lru_blob(tmp_path):
+    cache = _create_cache(tmp_path, max_cache_size_bytes=15)
+    blob_path_a = cache.get_model_path("a")
+    blob_path_b = cache.get_model_path("b")
+    assert not os.path.exists(blob_path_a)
+    assert os.path.exists(blob_path_b)
+
+
+def test_keeps_linked_and_pinned_blobs(tmp_path):
+    cache = _create_cache(tmp_path, max_cache_size_bytes=15)
+    blob_path_a = cache.get_model_path("a")
+    os.link(blob_path_a, str(tmp_path / "model_a"))
+    cache.get_model_path("b")
+    assert os.path.exists(blob_path_a)
+
+    cache.pin_secs = 600
+    blob_path_b = cache.get_model_path("b")
+    cache.get_model_path("c")
+    assert os.path.exists(blob_path_b)
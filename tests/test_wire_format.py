@@ -0,0 +1,68 @@
+import pickle
+
+import numpy as np
+
+from nxs_libs.serialization import nxs_dumps, nxs_loads
+from nxs_types.infer import (
+    NxsInferInput,
+    NxsInferInputType,
+    NxsInferRequest,
+    NxsInferStatus,
+)
+
+
+def _create_request() -> NxsInferRequest:
+    value = np.arange(6, dtype=np.float32).reshape(2, 3)
+    return NxsInferRequest(
+        task_uuid="task",
+        session_uuid="session",
+        exec_pipelines=["pipeline"],
+        extra_preproc_params='{"a": "1"}',
+        extra_params=b'{"b": 2}',
+        status=NxsInferStatus.PROCESSING,
+        inputs=[
+            NxsInferInput(
+                name="tensor",
+                type=NxsInferInputType.NUMPY_TENSOR,
+                data=value.tobytes(),
+                dtype=value.dtype.str,
+                shape=list(value.shape),
+            ),
+            NxsInferInput(
+                name="pickled",
+                type=NxsInferInputType.PICKLED_DATA,
+                data=pickle.dumps({"c": 3}),
+            ),
+        ],
+    )
+
+
+def test_infer_request_round_trip():
+    request = _create_request()
+    decoded = nxs_loads(nxs_dumps(request))
+
+    assert decoded.task_uuid == "task"
+    assert decoded.session_uuid == "session"
+    assert decoded.exec_pipelines == ["pipeline"]
+    assert decoded.extra_preproc_params == '{"a": "1"}'
+    assert decoded.extra_params == b'{"b": 2}'
+    assert decoded.carry_over_extras is None
+    assert decoded.status == NxsInferStatus.PROCESSING
+
+    tensor = decoded.inputs[0]
+    value = np.frombuffer(tensor.data, tensor.dtype).reshape(tensor.shape)
+    assert np.array_equal(value, np.arange(6, dtype=np.float32).reshape(2, 3))
+    assert pickle.loads(decoded.inputs[1].data) == {"c": 3}
+
+
+def test_decoded_infer_request_can_be_forwarded():
+    request = _create_request()
+    decoded = nxs_loads(nxs_dumps(request))
+
+    # re-encoding keeps the payload intact
+    assert nxs_loads(nxs_dumps(decoded)).dict() == request.dict()
+
+    # validating makes a standalone copy that can be pickled
+    copied = NxsInferRequest(**decoded.dict())
+    assert copied == request
+    assert pickle.loads(pickle.dumps(copied)) == request